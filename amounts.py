@@ -0,0 +1,190 @@
+# amounts.py
+# Parses free-text `amount_raised` values ("$23m", "€20M", "$1.2 billion") into numbers, currencies and USD.
+
+import os
+import re
+import json
+
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError:  # Only the bulk pass needs them; per-record parsing is pure Python.
+    np = pd = None
+
+FX_RATES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fx_rates.json")
+
+# --- PATTERNS ---
+
+CURRENCY_CODES = ['USD', 'EUR', 'GBP', 'CHF', 'SEK', 'NOK', 'DKK', 'CAD', 'AUD', 'NZD', 'SGD', 'HKD',
+                  'JPY', 'CNY', 'RMB', 'KRW', 'INR', 'ILS', 'BRL', 'ZAR']
+CURRENCY_TOKENS = {
+    '$': 'USD', 'us$': 'USD', 'c$': 'CAD', 'ca$': 'CAD', 'a$': 'AUD', 'au$': 'AUD', 's$': 'SGD',
+    'hk$': 'HKD', 'nz$': 'NZD', 'r$': 'BRL', '€': 'EUR', '£': 'GBP', '¥': 'JPY', '₹': 'INR',
+    '₩': 'KRW', '₪': 'ILS', 'rmb': 'CNY',
+    'dollar': 'USD', 'dollars': 'USD', 'euro': 'EUR', 'euros': 'EUR', 'pound': 'GBP', 'pounds': 'GBP',
+    'yen': 'JPY', 'rupees': 'INR', 'francs': 'CHF',
+}
+UNIT_MULTIPLIERS = {'k': 1e3, 'thousand': 1e3, 'm': 1e6, 'mm': 1e6, 'mn': 1e6, 'million': 1e6,
+                    'b': 1e9, 'bn': 1e9, 'billion': 1e9}
+
+_CODES = '|'.join(CURRENCY_CODES)
+# One pattern shared by the per-record parser and the vectorized pandas pass.
+AMOUNT_PATTERN = re.compile(
+    r'(?P<prefix>(?:US|CA|AU|HK|NZ|[CASR])?\$|[€£¥₹₩₪]|\b(?:' + _CODES + r')\b)?\s*'
+    r'(?P<number>\d[\d,]*(?:\.\d+)?)\s*'
+    r'(?P<unit>thousand|million|billion|mm|mn|bn|k|m|b)?\b\s*'
+    r'(?P<suffix>\b(?:' + _CODES + r'|dollars?|euros?|pounds?|yen|rupees|francs)\b)?',
+    re.IGNORECASE,
+)
+# Amounts with no unit below this are read as millions ("23" from the model means $23m, not $23).
+BARE_MILLIONS_BELOW = 1000
+
+
+# --- FX TABLE ---
+
+_fx_cache = {}
+
+def load_fx_rates(path=FX_RATES_FILE):
+    """Returns (version, {currency: USD per unit}). Cached per path."""
+    if path not in _fx_cache:
+        with open(path, 'r', encoding='utf-8') as f:
+            table = json.load(f)
+        rates = {code.upper(): float(rate) for code, rate in table['rates'].items()}
+        rates.setdefault('RMB', rates.get('CNY'))
+        _fx_cache[path] = (table['version'], rates)
+    return _fx_cache[path]
+
+def _currency_for(prefix, suffix):
+    token = (prefix or suffix or '$').lower()
+    return CURRENCY_TOKENS.get(token, token.upper())
+
+
+# --- PER-RECORD PARSING ---
+
+def parse_amount(text):
+    """
+    Parses one amount string.
+
+    Returns:
+        tuple: (value, currency code), e.g. (23000000.0, 'USD'), or (None, None) if `text`
+               holds no number. Amounts with no currency marker are assumed to be USD.
+    """
+    if not text or not isinstance(text, str):
+        return None, None
+    match = AMOUNT_PATTERN.search(text)
+    if not match:
+        return None, None
+    value = float(match.group('number').replace(',', ''))
+    unit = (match.group('unit') or '').lower()
+    if unit:
+        value *= UNIT_MULTIPLIERS[unit]
+    elif value < BARE_MILLIONS_BELOW:
+        value *= 1e6
+    return value, _currency_for(match.group('prefix'), match.group('suffix'))
+
+def to_usd(value, currency, fx_path=FX_RATES_FILE):
+    if value is None:
+        return None
+    _, rates = load_fx_rates(fx_path)
+    rate = rates.get(currency)
+    return round(value * rate, 2) if rate is not None else None
+
+def normalize_record(deal, fx_path=FX_RATES_FILE):
+    """Adds `amount_value`, `amount_currency`, `amount_usd` and `fx_version` to a deal dict in place."""
+    version, _ = load_fx_rates(fx_path)
+    value, currency = parse_amount(deal.get('amount_raised'))
+    deal['amount_value'] = value
+    deal['amount_currency'] = currency
+    deal['amount_usd'] = to_usd(value, currency, fx_path)
+    deal['fx_version'] = version if value is not None else None
+    return deal
+
+
+# --- VECTORIZED BULK PASS ---
+
+def normalize_amounts(amounts, fx_path=FX_RATES_FILE):
+    """
+    Vectorized version of `parse_amount` + `to_usd` over a whole column.
+
+    Args:
+        amounts: A pandas Series (or any sequence) of raw `amount_raised` strings.
+
+    Returns:
+        pandas.DataFrame: Columns `amount_value`, `amount_currency`, `amount_usd`, aligned to the input.
+    """
+    if pd is None:
+        raise ImportError("normalize_amounts needs numpy and pandas: pip install numpy pandas")
+    series = amounts if isinstance(amounts, pd.Series) else pd.Series(amounts, dtype='object')
+    # Amount strings repeat heavily ("$10m", "$5m"...), so parse each distinct value once.
+    codes, uniques = pd.factorize(series.astype('string'), use_na_sentinel=True)
+    parts = pd.Series(uniques, dtype='string').str.extract(AMOUNT_PATTERN)
+
+    number = pd.to_numeric(parts['number'].str.replace(',', '', regex=False), errors='coerce').to_numpy(dtype='float64')
+    multiplier = parts['unit'].str.lower().map(UNIT_MULTIPLIERS).astype('float64').to_numpy(na_value=np.nan)
+    multiplier = np.where(np.isnan(multiplier), np.where(number < BARE_MILLIONS_BELOW, 1e6, 1.0), multiplier)
+    value = number * multiplier
+
+    token = parts['prefix'].fillna(parts['suffix']).fillna('$').str.lower()
+    currency = np.array(token.map(lambda t: CURRENCY_TOKENS.get(t, t.upper())), dtype='object')
+    currency[np.isnan(value)] = None
+
+    _, rates = load_fx_rates(fx_path)
+    usd = np.round(value * np.array([rates.get(c, np.nan) if c else np.nan for c in currency], dtype='float64'), 2)
+
+    # Broadcast the per-distinct-value results back to every row (code -1 marks a missing input).
+    present = codes >= 0
+    result_value = np.full(len(codes), np.nan)
+    result_currency = np.full(len(codes), None, dtype='object')
+    result_usd = np.full(len(codes), np.nan)
+    result_value[present] = value[codes[present]]
+    result_currency[present] = currency[codes[present]]
+    result_usd[present] = usd[codes[present]]
+    return pd.DataFrame({
+        'amount_value': result_value,
+        'amount_currency': result_currency,
+        'amount_usd': result_usd,
+    }, index=series.index)
+
+def renormalize_store(store, fx_path=FX_RATES_FILE, chunk_size=200_000):
+    """Re-derives the numeric amount columns for every deal in a DealStore (e.g. after an FX-table update)."""
+    version, _ = load_fx_rates(fx_path)
+    cursor = store.conn.cursor()
+    cursor.row_factory = None  # plain tuples; sqlite3.Row is slow at this volume
+    total, last_id = 0, 0
+    while True:
+        rows = cursor.execute("SELECT id, amount_raised FROM deals WHERE id > ? ORDER BY id LIMIT ?",
+                              (last_id, chunk_size)).fetchall()
+        if not rows:
+            break
+        ids, raw_amounts = zip(*rows)
+        normalized = normalize_amounts(pd.Series(raw_amounts, dtype='object'), fx_path)
+        value = [None if v != v else v for v in normalized['amount_value'].tolist()]  # NaN -> NULL
+        usd = [None if v != v else v for v in normalized['amount_usd'].tolist()]
+        currency = [c if isinstance(c, str) else None for c in normalized['amount_currency'].tolist()]
+        versions = [version if v is not None else None for v in value]
+        with store.conn:
+            # Only rows whose values change are written, and each one moves to the end of the change feed.
+            store.conn.executemany(
+                """UPDATE deals SET amount_value = ?1, amount_currency = ?2, amount_usd = ?3, fx_version = ?4,
+                       seq = (SELECT COALESCE(MAX(seq), 0) + 1 FROM deals)
+                   WHERE id = ?5 AND (amount_value IS NOT ?1 OR amount_currency IS NOT ?2 OR amount_usd IS NOT ?3
+                                      OR fx_version IS NOT ?4)""",
+                zip(value, currency, usd, versions, ids),
+            )
+        total += len(rows)
+        last_id = ids[-1]
+    print(f"💱 Re-normalized {total} amounts with FX table {version}.")
+    return total
+
+
+if __name__ == "__main__":
+    import argparse
+    import storage
+
+    parser = argparse.ArgumentParser(description="Re-normalize every stored amount to numeric USD.")
+    parser.add_argument("--db", default=storage.DB_FILE)
+    parser.add_argument("--fx", default=FX_RATES_FILE)
+    args = parser.parse_args()
+
+    with storage.open_store(args.db) as store:
+        renormalize_store(store, args.fx)
@@ -0,0 +1,215 @@
+# analytics.py
+# Rollup tables over the deal store, kept current by SQLite triggers, plus a cached query API and CLI.
+
+import threading
+import collections
+
+# --- ROLLUP SCHEMA ---
+# Each rollup holds a count and a USD sum per key. Triggers on `deals` apply +1/-1 deltas, so a
+# rollup is never recomputed from scratch except once, when it is first installed.
+
+ROLLUPS = {
+    # rollup table: SQL expression for the key, evaluated against NEW./OLD. deal rows
+    'rollup_stage': "COALESCE({row}.funding_stage, 'Not Specified')",
+    'rollup_month': "COALESCE(substr({row}.date, 1, 7), 'Unknown')",
+    'rollup_subsector': "COALESCE({row}.subsector, 'Not Specified')",
+}
+
+def _rollup_ddl(table, key_sql):
+    new_key, old_key = key_sql.format(row='NEW'), key_sql.format(row='OLD')
+    return f"""
+    CREATE TABLE IF NOT EXISTS {table} (
+        key TEXT PRIMARY KEY,
+        deal_count INTEGER NOT NULL DEFAULT 0,
+        total_usd REAL NOT NULL DEFAULT 0
+    ) WITHOUT ROWID;
+    CREATE TRIGGER IF NOT EXISTS {table}_insert AFTER INSERT ON deals BEGIN
+        INSERT INTO {table} (key, deal_count, total_usd) VALUES ({new_key}, 1, COALESCE(NEW.amount_usd, 0))
+        ON CONFLICT (key) DO UPDATE SET deal_count = deal_count + 1, total_usd = total_usd + excluded.total_usd;
+    END;
+    CREATE TRIGGER IF NOT EXISTS {table}_delete AFTER DELETE ON deals BEGIN
+        UPDATE {table} SET deal_count = deal_count - 1, total_usd = total_usd - COALESCE(OLD.amount_usd, 0)
+        WHERE key = {old_key};
+    END;
+    CREATE TRIGGER IF NOT EXISTS {table}_update AFTER UPDATE ON deals BEGIN
+        UPDATE {table} SET deal_count = deal_count - 1, total_usd = total_usd - COALESCE(OLD.amount_usd, 0)
+        WHERE key = {old_key};
+        INSERT INTO {table} (key, deal_count, total_usd) VALUES ({new_key}, 1, COALESCE(NEW.amount_usd, 0))
+        ON CONFLICT (key) DO UPDATE SET deal_count = deal_count + 1, total_usd = total_usd + excluded.total_usd;
+    END;
+    """
+
+# Investors need one row per name across lead_investor and the other_investors JSON list.
+_INVESTOR_ROWS = """
+    SELECT {row}.lead_investor AS name, 1 AS is_lead WHERE {row}.lead_investor IS NOT NULL
+    UNION SELECT value, 0 FROM json_each(COALESCE({row}.other_investors, '[]'))
+        WHERE value IS NOT NULL AND value IS NOT {row}.lead_investor
+"""
+INVESTOR_DDL = f"""
+CREATE TABLE IF NOT EXISTS rollup_investor (
+    key TEXT PRIMARY KEY,
+    deal_count INTEGER NOT NULL DEFAULT 0,
+    lead_count INTEGER NOT NULL DEFAULT 0,
+    total_usd REAL NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS rollup_investor_insert AFTER INSERT ON deals BEGIN
+    INSERT INTO rollup_investor (key, deal_count, lead_count, total_usd)
+        SELECT name, 1, is_lead, COALESCE(NEW.amount_usd, 0) FROM ({_INVESTOR_ROWS.format(row='NEW')}) WHERE true
+    ON CONFLICT (key) DO UPDATE SET deal_count = deal_count + 1, lead_count = lead_count + excluded.lead_count,
+                                    total_usd = total_usd + excluded.total_usd;
+END;
+CREATE TRIGGER IF NOT EXISTS rollup_investor_delete AFTER DELETE ON deals BEGIN
+    UPDATE rollup_investor SET deal_count = deal_count - 1,
+        lead_count = lead_count - (key IS OLD.lead_investor), total_usd = total_usd - COALESCE(OLD.amount_usd, 0)
+    WHERE key IN (SELECT name FROM ({_INVESTOR_ROWS.format(row='OLD')}));
+END;
+CREATE TRIGGER IF NOT EXISTS rollup_investor_update AFTER UPDATE ON deals BEGIN
+    UPDATE rollup_investor SET deal_count = deal_count - 1,
+        lead_count = lead_count - (key IS OLD.lead_investor), total_usd = total_usd - COALESCE(OLD.amount_usd, 0)
+    WHERE key IN (SELECT name FROM ({_INVESTOR_ROWS.format(row='OLD')}));
+    INSERT INTO rollup_investor (key, deal_count, lead_count, total_usd)
+        SELECT name, 1, is_lead, COALESCE(NEW.amount_usd, 0) FROM ({_INVESTOR_ROWS.format(row='NEW')}) WHERE true
+    ON CONFLICT (key) DO UPDATE SET deal_count = deal_count + 1, lead_count = lead_count + excluded.lead_count,
+                                    total_usd = total_usd + excluded.total_usd;
+END;
+"""
+
+# A single counter bumped on every change to `deals`; it keys the query cache.
+VERSION_DDL = """
+CREATE TABLE IF NOT EXISTS rollup_version (id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL);
+INSERT OR IGNORE INTO rollup_version (id, version) VALUES (1, 0);
+CREATE TRIGGER IF NOT EXISTS rollup_version_insert AFTER INSERT ON deals BEGIN
+    UPDATE rollup_version SET version = version + 1 WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS rollup_version_update AFTER UPDATE ON deals BEGIN
+    UPDATE rollup_version SET version = version + 1 WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS rollup_version_delete AFTER DELETE ON deals BEGIN
+    UPDATE rollup_version SET version = version + 1 WHERE id = 1;
+END;
+"""
+
+ALL_ROLLUP_TABLES = list(ROLLUPS) + ['rollup_investor']
+
+
+def install_rollups(conn):
+    """Creates the rollup tables and triggers if missing, back-filling them once from `deals`."""
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    with conn:
+        for table, key_sql in ROLLUPS.items():
+            conn.executescript(_rollup_ddl(table, key_sql))
+        conn.executescript(INVESTOR_DDL)
+        conn.executescript(VERSION_DDL)
+    if not all(table in existing for table in ALL_ROLLUP_TABLES):
+        rebuild_rollups(conn)
+
+def rebuild_rollups(conn):
+    """Full recompute. Only needed on first install or to repair drift; inserts keep rollups current."""
+    with conn:
+        for table, key_sql in ROLLUPS.items():
+            key = key_sql.format(row='deals')
+            conn.execute(f"DELETE FROM {table}")
+            conn.execute(f"""INSERT INTO {table} (key, deal_count, total_usd)
+                             SELECT {key}, COUNT(*), COALESCE(SUM(amount_usd), 0) FROM deals GROUP BY 1""")
+        conn.execute("DELETE FROM rollup_investor")
+        conn.execute("""INSERT INTO rollup_investor (key, deal_count, lead_count, total_usd)
+                        SELECT name, COUNT(*), SUM(is_lead), COALESCE(SUM(amount_usd), 0) FROM (
+                            SELECT id, lead_investor AS name, 1 AS is_lead, amount_usd
+                            FROM deals WHERE lead_investor IS NOT NULL
+                            UNION
+                            SELECT deals.id, investor.value, 0, deals.amount_usd
+                            FROM deals, json_each(COALESCE(deals.other_investors, '[]')) AS investor
+                            WHERE investor.value IS NOT NULL AND investor.value IS NOT deals.lead_investor)
+                        GROUP BY 1""")
+        conn.execute("UPDATE rollup_version SET version = version + 1 WHERE id = 1")
+
+
+# --- CACHED QUERY API ---
+
+QUERIES = {
+    'by_stage': "SELECT key, deal_count, total_usd FROM rollup_stage WHERE deal_count > 0 ORDER BY total_usd DESC LIMIT ?",
+    'by_month': "SELECT key, deal_count, total_usd FROM rollup_month WHERE deal_count > 0 ORDER BY key DESC LIMIT ?",
+    'by_subsector': "SELECT key, deal_count, total_usd FROM rollup_subsector WHERE deal_count > 0 ORDER BY total_usd DESC LIMIT ?",
+    'top_investors': "SELECT key, deal_count, lead_count, total_usd FROM rollup_investor WHERE deal_count > 0 ORDER BY deal_count DESC, total_usd DESC LIMIT ?",
+    'top_lead_investors': "SELECT key, deal_count, lead_count, total_usd FROM rollup_investor WHERE lead_count > 0 ORDER BY lead_count DESC, total_usd DESC LIMIT ?",
+}
+
+CACHE_SIZE = 512
+_cache = collections.OrderedDict()   # (db file, data version, query name, limit) -> rows, least recently used first
+_cache_lock = threading.Lock()
+
+def _conn(source):
+    return getattr(source, 'conn', source)
+
+def _db_path(conn):
+    """The main database's file, or None for an in-memory database."""
+    return next((row[2] for row in conn.execute("PRAGMA database_list") if row[1] == 'main'), None) or None
+
+def data_version(source):
+    return _conn(source).execute("SELECT version FROM rollup_version WHERE id = 1").fetchone()[0]
+
+def query(source, name, limit=-1):
+    """
+    Runs a named rollup query against a DealStore (or sqlite3 connection), LRU-cached until the data changes.
+
+    The cache is keyed on the database file and its data version, which is stored in the database and
+    bumped by every write to `deals`, so every connection to the same file shares (and invalidates) it.
+    """
+    conn = _conn(source)
+    db_path = _db_path(conn)
+    if db_path is None:  # in-memory databases have nothing to share a cache entry with
+        return tuple(tuple(row) for row in conn.execute(QUERIES[name], (limit,)))
+    key = (db_path, data_version(conn), name, limit)
+    with _cache_lock:
+        rows = _cache.get(key)
+        if rows is not None:
+            _cache.move_to_end(key)
+            return rows
+    rows = tuple(tuple(row) for row in conn.execute(QUERIES[name], (limit,)))
+    with _cache_lock:
+        _cache[key] = rows
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return rows
+
+def by_stage(source, limit=-1):
+    return query(source, 'by_stage', limit)
+
+def by_month(source, limit=-1):
+    return query(source, 'by_month', limit)
+
+def by_subsector(source, limit=20):
+    return query(source, 'by_subsector', limit)
+
+def top_investors(source, limit=20):
+    return query(source, 'top_investors', limit)
+
+def top_lead_investors(source, limit=20):
+    return query(source, 'top_lead_investors', limit)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    import storage
+
+    parser = argparse.ArgumentParser(description="Query the precomputed deal rollups.")
+    parser.add_argument("report", choices=sorted(QUERIES) + ['rebuild'])
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--db", default=storage.DB_FILE)
+    args = parser.parse_args()
+
+    with storage.open_store(args.db) as store:
+        if args.report == 'rebuild':
+            rebuild_rollups(store.conn)
+            print("✅ Rollups rebuilt.")
+        else:
+            started = time.perf_counter()
+            rows = query(store, args.report, args.limit)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            for row in rows:
+                key, *values = row
+                total_usd = values[-1]
+                counts = " ".join(str(v) for v in values[:-1])
+                print(f"{key[:50]:<50} {counts:>12} ${total_usd / 1e6:>12,.1f}m")
+            print(f"\n({len(rows)} rows in {elapsed_ms:.2f} ms)")
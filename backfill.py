@@ -0,0 +1,386 @@
+# backfill.py
+# Historical backfill: enumerates the whole CTVC newsletter archive and works through it with bounded concurrency, resumably, under a spend cap.
+
+import time
+import sqlite3
+import datetime
+import argparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+
+import main
+import dedup
+import sinks
+import retry
+import prompts
+import storage
+import sources
+import url_index
+import llm_backends
+import content_hashes
+import deal_segmenter
+
+ARCHIVE_URL = "https://www.ctvc.co/tag/newsletter/"
+MAX_ARCHIVE_PAGES = 1000    # safety stop for enumeration; the archive has a few dozen pages
+MAX_ATTEMPTS = 3            # an issue that failed this often is left alone until --retry-failed
+REPORT_EVERY = 30.0         # seconds between progress lines
+RETRY_BUDGET = 5000         # retries for the whole backfill (a normal run gets retry.RetryBudget's 200)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS backfill_issues (
+    url TEXT PRIMARY KEY,
+    archive_page INTEGER NOT NULL,  -- the archive page it was listed on (1 = newest)
+    status TEXT NOT NULL,           -- 'pending', 'done', 'failed' or 'skipped' (processed by a normal run)
+    attempts INTEGER NOT NULL DEFAULT 0,
+    issue_date TEXT,                -- the newsletter's publish date, given to each of its deals
+    deal_lines INTEGER,
+    new_deals INTEGER,
+    error TEXT,
+    updated TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS backfill_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+# How deal lines become extraction dicts: one LLM call per newsletter, one call per line, or no LLM at all.
+EXTRACTORS = {
+    'batch': main.extract_ctvc_deals_batch,
+    'concurrent': main.extract_ctvc_deals_concurrently,
+    'rules': lambda deal_strings: [deal_segmenter.parse_deal_text(text) for text in deal_strings],
+}
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+
+def _duration(seconds):
+    """'3h05m', '12m40s' or '35s'."""
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+def archive_page_url(page):
+    return ARCHIVE_URL if page == 1 else f"{ARCHIVE_URL}page/{page}/"
+
+
+# --- ISSUE QUEUE ---
+
+class IssueQueue:
+    """
+    The backfill's progress, in SQLite next to the deals: every newsletter found in the archive
+    and whether it is done. An issue only becomes 'done' once its deals are in the store, so an
+    interrupted backfill picks up where it stopped and never processes an issue twice.
+    """
+
+    def __init__(self, path=storage.DB_FILE, busy_timeout=30.0):
+        self.conn = sqlite3.connect(path, timeout=busy_timeout)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        if 'issue_date' not in {row[1] for row in self.conn.execute("PRAGMA table_info(backfill_issues)")}:
+            self.conn.execute("ALTER TABLE backfill_issues ADD COLUMN issue_date TEXT")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def get_state(self, key):
+        row = self.conn.execute("SELECT value FROM backfill_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, key, value):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO backfill_state (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def add(self, urls, archive_page, seen_urls):
+        """Adds newly listed issues; ones a normal run already processed are recorded as 'skipped'. Returns how many were new."""
+        now = _now()
+        with self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO backfill_issues (url, archive_page, status, updated) VALUES (?, ?, ?, ?)",
+                [(url, archive_page, 'skipped' if url in seen_urls else 'pending', now) for url in urls])
+            return self.conn.total_changes - before
+
+    def pending(self, limit=None):
+        """Issues still to do, oldest archive page first (failed ones until MAX_ATTEMPTS)."""
+        return [url for (url,) in self.conn.execute(
+            "SELECT url FROM backfill_issues WHERE status = 'pending' OR (status = 'failed' AND attempts < ?) "
+            "ORDER BY archive_page DESC, url LIMIT ?", (MAX_ATTEMPTS, -1 if limit is None else limit))]
+
+    def mark_done(self, url, issue_date, deal_lines, new_deals, error=None):
+        """Records a processed issue; with an `error` (some lines failed) it stays queued as 'failed' for those lines."""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE backfill_issues SET status = ?, attempts = attempts + 1, issue_date = ?, "
+                "deal_lines = ?, new_deals = COALESCE(new_deals, 0) + ?, error = ?, updated = ? WHERE url = ?",
+                ('failed' if error else 'done', issue_date, deal_lines, new_deals, error, _now(), url))
+
+    def mark_failed(self, url, error):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE backfill_issues SET status = 'failed', attempts = attempts + 1, error = ?, updated = ? WHERE url = ?",
+                (error, _now(), url))
+
+    def retry_failed(self):
+        """Gives every failed issue its attempts back."""
+        with self.conn:
+            return self.conn.execute("UPDATE backfill_issues SET attempts = 0 WHERE status = 'failed'").rowcount
+
+    def counts(self):
+        counts = {'pending': 0, 'done': 0, 'failed': 0, 'skipped': 0}
+        counts.update(self.conn.execute("SELECT status, COUNT(*) FROM backfill_issues GROUP BY status"))
+        counts['deals'] = self.conn.execute("SELECT COALESCE(SUM(new_deals), 0) FROM backfill_issues").fetchone()[0]
+        return counts
+
+
+# --- ENUMERATION ---
+
+def enumerate_archive(queue, seen_urls, max_pages=MAX_ARCHIVE_PAGES):
+    """
+    Lists every newsletter in the archive (`/tag/newsletter/page/N/`, plain HTTP, no browser) into the queue.
+
+    The first walk goes until the archive runs out. Later calls only walk from page 1 until a page
+    adds nothing (issues published since), then finish a first walk that was interrupted. New issues
+    push older ones to later pages, never earlier ones, so nothing is missed by resuming.
+    """
+    print("🗂️  Enumerating the CTVC newsletter archive...")
+    complete = queue.get_state('archive_complete') == '1'
+    resume_page = int(queue.get_state('archive_next_page') or 1)
+    page, added_total = 1, 0
+    while page <= max_pages:
+        try:
+            response = retry.get(archive_page_url(page), timeout=20)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                complete = True  # past the last archive page
+                break
+            raise
+        urls = [article['url'] for article in sources.parse_ctvc_listing(response.content)]
+        if not urls:
+            complete = True
+            break
+        added = queue.add(urls, page, seen_urls)
+        added_total += added
+        print(f"   -> Archive page {page}: {len(urls)} issues, {added} new.")
+        if not complete and page >= resume_page:
+            queue.set_state('archive_next_page', page + 1)
+        if added == 0:
+            if complete:
+                break
+            page = max(page + 1, resume_page)
+            continue
+        page += 1
+    if complete:
+        queue.set_state('archive_complete', 1)
+    print(f"   -> {added_total} new issues queued.\n")
+    return added_total
+
+
+# --- BACKFILL ---
+
+class _Progress:
+    """Throughput, spend and ETA of this session, from the issues finished so far."""
+
+    def __init__(self, remaining, backend):
+        self.remaining = remaining
+        self.backend = backend
+        self.start_cost = backend.usage()['cost_usd']
+        self.started = time.monotonic()
+        self.last_report = self.started
+        self.issues = self.lines = self.new_deals = 0
+
+    def spent_usd(self):
+        return self.backend.usage()['cost_usd'] - self.start_cost
+
+    def cost_per_issue(self):
+        return self.spent_usd() / self.issues if self.issues else 0.0
+
+    def line(self):
+        elapsed = time.monotonic() - self.started
+        rate = self.issues / elapsed if elapsed else 0.0
+        left = self.remaining - self.issues
+        eta = _duration(left / rate) if rate else '?'
+        return (f"⏱️  {self.issues}/{self.remaining} issues, {rate * 60:.1f}/min, {self.lines} deal lines, "
+                f"{self.new_deals} new deals, ${self.spent_usd():.4f} spent "
+                f"(~${self.spent_usd() + left * self.cost_per_issue():.4f} for all), ETA {eta}")
+
+    def maybe_report(self, every=REPORT_EVERY):
+        if time.monotonic() - self.last_report >= every:
+            self.last_report = time.monotonic()
+            print(self.line())
+
+
+def _fetch(url):
+    """
+    The newsletter's publish date and segmented deal records, each dated with it. Raises on a failed
+    download, or when the page gives no date (its deals would be undated), so the issue is retried later.
+    """
+    response = retry.get(url, timeout=20)
+    _, deal_records = sources.parse_ctvc_article(response.content)
+    issue_date = deal_records[0]['date'] if deal_records else None
+    if deal_records and issue_date is None:
+        raise ValueError("no publish date on the page")
+    for deal in deal_records:
+        deal['date'] = issue_date
+    return issue_date, deal_records
+
+def _extract(extractor, deal_records):
+    extractions = extractor([deal['text'] for deal in deal_records])
+    if not any(extractions):
+        raise RuntimeError("every extraction failed")
+    return extractions
+
+
+def run_backfill(queue, extractor='batch', workers=4, max_cost=None, limit=None):
+    """
+    Works through the pending issues, `workers` at a time: each one is fetched and segmented,
+    lines already known from another source are merged without an LLM call, and the rest are
+    extracted and saved. Stops when the queue is empty, `limit` issues are done, or the next issues
+    would take the LLM spend of this session past `max_cost` USD. Ctrl-C stops cleanly; issues in
+    flight stay pending.
+
+    Returns:
+        int: New deals found.
+    """
+    todo = queue.pending(limit)
+    progress = _Progress(len(todo), main.backend)
+    print(f"📚 Backfilling {len(todo)} issues with {workers} workers ({extractor} extraction)"
+          + (f", spend cap ${max_cost:.2f}" if max_cost is not None else "") + ".")
+
+    seen_urls = url_index.open_seen_index()
+    page_hashes = content_hashes.ContentHashIndex()
+    store = storage.open_store()
+    deal_sink = sinks.DatabaseSink(store, flush_every=50, flush_interval=60.0)
+    deduplicator = dedup.DealDeduplicator.from_store(store)
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='backfill')
+    in_flight = {}  # future -> (url, stage, (issue date, deal records), lines to extract)
+    todo = iter(todo)
+
+    def submit_next():
+        if max_cost is not None and progress.spent_usd() + (len(in_flight) + 1) * progress.cost_per_issue() > max_cost:
+            return False
+        url = next(todo, None)
+        if url is None:
+            return False
+        in_flight[pool.submit(_fetch, url)] = (url, 'fetch', None, None)
+        return True
+
+    def finish(url, issue, to_extract, extractions):
+        issue_date, deal_records = issue
+        new_deals, failed = 0, []
+        for deal, funding_data in zip(to_extract, extractions):
+            if not funding_data:
+                failed.append(deal)
+                continue
+            cleaned_data = main.normalize_ctvc_deal(deal, funding_data, url)
+            if cleaned_data.startup_name:
+                canonical, is_new = deduplicator.resolve(cleaned_data)
+                deal_sink.write(canonical)
+                new_deals += is_new
+        deal_sink.flush()  # the issue's deals are stored before it is marked done
+        # Lines whose extraction failed are not hashed, so the retry (and --refresh) extracts only them.
+        page_hashes.record(url, deal_records, failed=failed)
+        seen_urls.add(url)
+        error = f"extract: {len(failed)} of {len(to_extract)} deal lines failed" if failed else None
+        if error:
+            print(f"   -> 🟠 {url}: {error}; they will be retried.")
+        queue.mark_done(url, issue_date, len(deal_records), new_deals, error)
+        progress.issues += 1
+        progress.lines += len(deal_records)
+        progress.new_deals += new_deals
+
+    try:
+        while len(in_flight) < workers and submit_next():
+            pass
+        while in_flight:
+            done, _ = wait(in_flight, timeout=REPORT_EVERY, return_when=FIRST_COMPLETED)
+            for future in done:
+                url, stage, issue, to_extract = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"   -> 🔴 {url}: {stage} failed ({e.__class__.__name__}: {e}); it will be retried.")
+                    queue.mark_failed(url, f"{stage}: {e.__class__.__name__}: {e}")
+                    submit_next()
+                    continue
+                if stage == 'fetch':
+                    issue, to_extract = result, []
+                    deal_records = issue[1]
+                    if page_hashes.get_page(url):
+                        deal_records = page_hashes.new_lines(url, deal_records)  # a retry: only the lines that failed
+                    for deal in deal_records:
+                        # Rounds already reported by another source only need a provenance entry, not an LLM call.
+                        known_deal = deduplicator.find(deal['startup_name'], deal['amount_raised'], deal['date'], exclude_url=url)
+                        if known_deal:
+                            dedup.add_source(known_deal, url, "CTVC")
+                            deal_sink.write(known_deal)
+                        else:
+                            to_extract.append(deal)
+                    if to_extract:
+                        in_flight[pool.submit(_extract, EXTRACTORS[extractor], to_extract)] = (url, 'extract', issue, to_extract)
+                    else:
+                        finish(url, issue, [], [])
+                        submit_next()
+                else:
+                    finish(url, issue, to_extract, result)
+                    submit_next()
+            progress.maybe_report()
+        if max_cost is not None and next(todo, None) is not None:
+            print(f"💸 Stopped at the spend cap: ${progress.spent_usd():.4f} of ${max_cost:.2f}.")
+    except KeyboardInterrupt:
+        print(f"\n🛑 Interrupted; {len(in_flight)} issue(s) in flight stay pending for the next run.")
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        print(progress.line())
+        deal_sink.close()
+        deal_sink.report()
+        print(f"🔗 Dedup: {deduplicator.stats()}")
+        store.export_csv()
+        store.close()
+        seen_urls.close()
+        page_hashes.close()
+    return progress.new_deals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill deals from the whole CTVC newsletter archive (resumable).")
+    parser.add_argument("--workers", type=int, default=4, help="issues fetched and extracted at once")
+    parser.add_argument("--extractor", choices=sorted(EXTRACTORS), default="batch",
+                        help="batch: one LLM call per issue; concurrent: one per deal line; rules: no LLM")
+    parser.add_argument("--max-cost", type=float, help="stop before this session's LLM spend exceeds this many USD")
+    parser.add_argument("--limit", type=int, help="process at most this many issues this session")
+    parser.add_argument("--skip-enumerate", action="store_true", help="work on the queue as it is, without listing the archive")
+    parser.add_argument("--retry-failed", action="store_true", help="give issues that failed MAX_ATTEMPTS times another try")
+    parser.add_argument("--status", action="store_true", help="print the queue's counts and exit")
+    llm_backends.add_arguments(parser)
+    args = parser.parse_args()
+
+    with IssueQueue() as queue:
+        if args.status:
+            print(f"📚 Backfill queue: {queue.counts()}")
+            raise SystemExit(0)
+        if args.retry_failed:
+            print(f"   -> {queue.retry_failed()} failed issue(s) will be retried.")
+        main.backend = llm_backends.from_args(parser, args) or main.backend
+        retry.run_budget.retries = RETRY_BUDGET
+        if not args.skip_enumerate:
+            with url_index.open_seen_index() as seen_urls:
+                enumerate_archive(queue, seen_urls)
+        try:
+            new_deals = run_backfill(queue, args.extractor, args.workers, args.max_cost, args.limit)
+        finally:
+            main.backend.close()
+        retry.report()
+        prompts.report()
+        print(f"\n🏁 Backfill session complete: {new_deals} new deals. Queue: {queue.counts()}")
@@ -0,0 +1,63 @@
+# bench/deal_memory.py
+# Memory held by N deals as plain dicts vs `Deal` records (run from the repo root: python bench/deal_memory.py).
+
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from deal_record import Deal
+
+STAGES = ['Seed', 'Series A', 'Series B', 'Pre-Seed', 'Growth Equity', 'Debt', 'Grant']
+SITES = ['CTVC', 'Canary Media', 'CleanTechnica']
+SUBSECTORS = ['Deal from Newsletter', 'Clean Power', 'Transportation', 'Carbon', 'Buildings', 'Food & Land Use']
+INVESTORS = [f"Climate Fund {i}" for i in range(2000)]
+
+def _fresh(text):
+    # Parsed JSON/HTML hands us a new string object every time; mimic that so dicts don't share by accident.
+    return (text + '.')[:-1]
+
+def synthetic_deal(i):
+    """One extraction-shaped dict with the same fields a stored deal has."""
+    return {
+        'id': i,
+        'startup_name': _fresh(f"Startup {i}"),
+        'subsector': _fresh(SUBSECTORS[i % len(SUBSECTORS)]),
+        'amount_raised': _fresh(f"${i % 250 + 1}m"),
+        'funding_stage': _fresh(STAGES[i % len(STAGES)]),
+        'lead_investor': _fresh(INVESTORS[i % len(INVESTORS)]),
+        'other_investors': [_fresh(INVESTORS[(i * 7 + k) % len(INVESTORS)]) for k in range(3)],
+        'source_url': _fresh(f"https://www.ctvc.co/2025/07/{i % 28 + 1:02d}/newsletter-{i // 40}"),
+        'source_site': _fresh(SITES[i % len(SITES)]),
+        'date': _fresh(f"2025-07-{i % 28 + 1:02d}"),
+        'sources': None,
+        'amount_value': float(i % 250 + 1) * 1e6,
+        'amount_currency': _fresh('USD'),
+        'amount_usd': float(i % 250 + 1) * 1e6,
+        'fx_version': _fresh('2025-08-01'),
+    }
+
+def measure(label, build, count):
+    tracemalloc.start()
+    started = time.perf_counter()
+    records = [build(synthetic_deal(i)) for i in range(count)]
+    elapsed = time.perf_counter() - started
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<14} {current / 2**20:>9.1f} MiB  {current / count:>7.0f} B/deal  ({elapsed:.1f}s to build)")
+    del records
+    return current
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the memory footprint of dict deals and Deal records.")
+    parser.add_argument("--count", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"Holding {args.count:,} deals:")
+    as_dicts = measure("dict", dict, args.count)
+    as_records = measure("Deal (slots)", Deal.from_dict, args.count)
+    print(f"-> Deal records use {as_records / as_dicts:.0%} of the dict footprint "
+          f"({(as_dicts - as_records) / 2**20:,.0f} MiB saved).")
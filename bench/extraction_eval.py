@@ -0,0 +1,306 @@
+# bench/extraction_eval.py
+# Scores deal extractors (per-line LLM, batched LLM, rule-based, or your own) against a labelled golden set.
+# Run from the repo root: python bench/extraction_eval.py [--live] [--extractor per_line --model ...]
+
+import os
+import sys
+import json
+import time
+import argparse
+import importlib
+import contextlib
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+os.environ.setdefault("OPENAI_API_KEY", "offline-bench")  # main.py builds its backend at import time
+
+import main
+import dedup
+import retry
+import llm_backends
+import amounts
+import llm_costs
+import deal_segmenter
+import pipeline_bench
+from deal_record import Deal
+
+GOLDEN_FILE = os.path.join(pipeline_bench.FIXTURES_DIR, "golden_deals.jsonl")
+SCALAR_FIELDS = ('startup_name', 'amount', 'funding_stage', 'lead_investor')
+AMOUNT_TOLERANCE = 0.01
+
+
+# --- GOLDEN SET ---
+
+def load_golden(path=GOLDEN_FILE):
+    """
+    Loads the labelled items. Deal lines carry their `text`; articles name a fixture `page`,
+    which is parsed here so the text matches what the pipeline would see.
+    """
+    pages = pipeline_bench.load_pages()
+    items = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if item['kind'] == 'article':
+                parser = pipeline_bench.ARTICLE_PAGES[item['page']][0]
+                with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                    _, item['text'], _ = parser(pages[item['page']])
+            items.append(item)
+    return items
+
+
+# --- EXTRACTORS ---
+# An extractor takes (items, model) and returns one raw extraction dict (or None) per item, in order.
+
+def per_line_extractor(items, model=None):
+    """One LLM call per deal line or article: what main.py does today."""
+    model = model or main.EXTRACTION_MODEL
+    results = []
+    for item in items:
+        if item['kind'] == 'deal_line':
+            results.append(main.extract_ctvc_deal_data(item['text'], model=model))
+        else:
+            results.append(main.extract_funding_data(item['text'], model=model))
+    return results
+
+def batched_extractor(items, model=None, batch_size=8):
+    """Deal lines go to the LLM `batch_size` at a time; articles still get one call each."""
+    model = model or main.EXTRACTION_MODEL
+    results = [None] * len(items)
+    lines = [i for i, item in enumerate(items) if item['kind'] == 'deal_line']
+    for start in range(0, len(lines), batch_size):
+        chunk = lines[start:start + batch_size]
+        for i, extraction in zip(chunk, main.extract_ctvc_deals_batch([items[i]['text'] for i in chunk], model=model)):
+            results[i] = extraction
+    for i, item in enumerate(items):
+        if item['kind'] != 'deal_line':
+            results[i] = main.extract_funding_data(item['text'], model=model)
+    return results
+
+def rule_extractor(items, model=None):
+    """No LLM at all: regexes over the deal sentence (see deal_segmenter.parse_deal_text)."""
+    return [deal_segmenter.parse_deal_text(item['text']) for item in items]
+
+EXTRACTORS = {
+    'per_line': per_line_extractor,
+    'batched': batched_extractor,
+    'rules': rule_extractor,
+}
+
+def resolve_extractor(name):
+    """A name from EXTRACTORS, or 'module:function' for any other implementation with the same signature."""
+    if name in EXTRACTORS:
+        return EXTRACTORS[name]
+    if ':' not in name:
+        raise ValueError(f"Unknown extractor {name!r}; use one of {sorted(EXTRACTORS)} or 'module:function'")
+    module_name, function_name = name.split(':', 1)
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+# --- USAGE METERING ---
+
+class UsageMeter:
+    """
+    Wraps the OpenAI client (live or replayed) and records every chat completion's model,
+    token usage and latency, so each extractor's tokens and cost can be reported.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+        self.chat = type('Chat', (), {})()
+        self.chat.completions = type('Completions', (), {})()
+        self.chat.completions.create = self._create
+
+    def _create(self, **kwargs):
+        started = time.perf_counter()
+        response = self.client.chat.completions.create(**kwargs)
+        usage = getattr(response, 'usage', None)
+        self.calls.append({
+            'model': kwargs.get('model'),
+            'prompt_tokens': getattr(usage, 'prompt_tokens', 0) or 0,
+            'cached_tokens': llm_costs.cached_tokens(usage),
+            'completion_tokens': getattr(usage, 'completion_tokens', 0) or 0,
+            'latency_s': time.perf_counter() - started,
+        })
+        return response
+
+    def totals(self):
+        prompt_tokens = sum(call['prompt_tokens'] for call in self.calls)
+        cached_tokens = sum(call['cached_tokens'] for call in self.calls)
+        completion_tokens = sum(call['completion_tokens'] for call in self.calls)
+        costs = [llm_costs.estimate_cost(call['model'], call['prompt_tokens'], call['completion_tokens'],
+                                         call['cached_tokens'])
+                 for call in self.calls]
+        return {
+            'llm_calls': len(self.calls),
+            'prompt_tokens': prompt_tokens,
+            'cached_tokens': cached_tokens,
+            'billed_prompt_tokens': prompt_tokens - cached_tokens,
+            'completion_tokens': completion_tokens,
+            # None when any call used a model without a listed price, rather than a silently low total.
+            'cost_usd': sum(costs) if None not in costs else None,
+        }
+
+
+# --- SCORING ---
+
+def _field_values(extraction):
+    """Normalized comparison keys for one extraction (gold or predicted)."""
+    deal = Deal.from_extraction(extraction or {})
+    amount = amounts.parse_amount(deal.amount_raised) if deal.amount_raised else (None, None)
+    investors = [deal.lead_investor] if deal.lead_investor else []
+    investors += deal.other_investors or []
+    return {
+        'startup_name': dedup.normalize_name(deal.startup_name) or None,
+        'amount': amount if amount[0] is not None else None,
+        'funding_stage': str(deal.funding_stage).lower() if deal.funding_stage else None,
+        'lead_investor': dedup.normalize_name(deal.lead_investor) or None,
+        'investors': {dedup.normalize_name(investor) for investor in investors} - {''},
+    }
+
+def _same(field, predicted, expected):
+    if field == 'amount':
+        (value, currency), (expected_value, expected_currency) = predicted, expected
+        return currency == expected_currency and abs(value - expected_value) <= AMOUNT_TOLERANCE * expected_value
+    return predicted == expected
+
+def score(items, predictions):
+    """
+    Field-level precision/recall. A scalar field counts as predicted when the extractor returned
+    a value, and as correct when it matches the label after normalization; `investors` is scored
+    as a set over the lead plus other investors.
+
+    Returns:
+        tuple: ({field: {'precision', 'recall', 'f1'}}, [ids of items with any field wrong])
+    """
+    counts = {field: {'correct': 0, 'predicted': 0, 'expected': 0} for field in SCALAR_FIELDS + ('investors',)}
+    errors = []
+    for item, prediction in zip(items, predictions):
+        predicted = _field_values(prediction)
+        expected = _field_values(item['expected'])
+        wrong = False
+        for field in SCALAR_FIELDS:
+            counts[field]['predicted'] += predicted[field] is not None
+            counts[field]['expected'] += expected[field] is not None
+            if predicted[field] is not None and expected[field] is not None:
+                matched = _same(field, predicted[field], expected[field])
+                counts[field]['correct'] += matched
+                wrong = wrong or not matched
+            elif predicted[field] != expected[field]:
+                wrong = True
+        counts['investors']['predicted'] += len(predicted['investors'])
+        counts['investors']['expected'] += len(expected['investors'])
+        counts['investors']['correct'] += len(predicted['investors'] & expected['investors'])
+        if wrong or predicted['investors'] != expected['investors']:
+            errors.append(item['id'])
+
+    fields = {}
+    for field, count in counts.items():
+        precision = count['correct'] / count['predicted'] if count['predicted'] else 1.0
+        recall = count['correct'] / count['expected'] if count['expected'] else 1.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        fields[field] = {'precision': round(precision, 3), 'recall': round(recall, 3), 'f1': round(f1, 3)}
+    return fields, errors
+
+
+# --- HARNESS ---
+
+def evaluate(extractor, items, client, model=None, score_llm=True):
+    """
+    Runs one extractor over the golden items with a metered client and returns its report.
+
+    With `score_llm` False (replayed responses), an extractor that made LLM calls gets no accuracy
+    ('fields' None): the recording would only be scored against itself. Tokens, cost and latency still count.
+    """
+    meter = UsageMeter(client)
+    previous_backend, main.backend = main.backend, llm_backends.OpenAIBackend(meter)
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            started = time.perf_counter()
+            predictions = extractor(items, model=model)
+            elapsed = time.perf_counter() - started
+    finally:
+        main.backend = previous_backend
+    usage = meter.totals()
+    if usage['llm_calls'] and not score_llm:
+        fields, errors = None, []
+    else:
+        fields, errors = score(items, predictions)
+    records = len(items)
+    return {
+        'fields': fields,
+        'records': records,
+        'records_fully_correct': records - len(errors) if fields is not None else None,
+        'errors': errors,
+        **usage,
+        'tokens_per_record': round((usage['prompt_tokens'] + usage['completion_tokens']) / records, 1),
+        'cost_per_1k_records_usd': round(usage['cost_usd'] / records * 1000, 4) if usage['cost_usd'] is not None else None,
+        'latency_per_record_ms': round(elapsed / records * 1000, 2),
+    }
+
+def print_report(reports):
+    fields = SCALAR_FIELDS + ('investors',)
+    print(f"{'extractor':<12} " + " ".join(f"{field[:13]:>13}" for field in fields)
+          + f" {'exact':>7} {'tok/rec':>8} {'$/1k rec':>9} {'ms/rec':>8}")
+    print(f"{'':<12} " + " ".join(f"{'P / R':>13}" for _ in fields))
+    for name, report in reports.items():
+        if report['fields'] is None:
+            cells = " ".join(f"{'-':>13}" for _ in fields)
+            exact = f"{'-':>3}/{report['records']:<3}"
+        else:
+            cells = " ".join(f"{report['fields'][field]['precision']:>6.2f}/{report['fields'][field]['recall']:<6.2f}"
+                             for field in fields)
+            exact = f"{report['records_fully_correct']:>3}/{report['records']:<3}"
+        cost = report['cost_per_1k_records_usd']
+        print(f"{name:<12} {cells} {exact} "
+              f"{report['tokens_per_record']:>8} {cost if cost is not None else 'n/a':>9} {report['latency_per_record_ms']:>8}")
+    if any(report['fields'] is None for report in reports.values()):
+        print("   -> Replayed LLM responses only measure tokens, cost and latency; run with --live or --local-model "
+              "for the LLM extractors' accuracy.")
+    for name, report in reports.items():
+        if report['errors']:
+            print(f"   -> {name} got fields wrong on: {', '.join(report['errors'])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Accuracy vs. tokens, cost and latency for deal extractors.")
+    parser.add_argument("--extractor", action="append",
+                        help=f"one of {sorted(EXTRACTORS)} or module:function (repeatable; default: all built-ins)")
+    parser.add_argument("--model", help=f"model for the LLM extractors (default {main.EXTRACTION_MODEL})")
+    parser.add_argument("--batch-size", type=int, default=8, help="deal lines per call for the batched extractor")
+    parser.add_argument("--golden", default=GOLDEN_FILE)
+    parser.add_argument("--live", action="store_true",
+                        help="call the real API instead of replaying bench/fixtures/llm_responses.json")
+    parser.add_argument("--local-model", help="run the LLM extractors on this GGUF model with llama.cpp (implies live)")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="simulated seconds per replayed LLM call")
+    parser.add_argument("--output", help="also write the reports to a JSON file")
+    args = parser.parse_args()
+
+    items = load_golden(args.golden)
+    local = None
+    if args.local_model:
+        local = llm_backends.LlamaCppBackend(args.local_model)
+        client, args.model, args.live = local.client, local.model, True
+    elif args.live:
+        client = main.backend.client
+    else:
+        client = pipeline_bench.ReplayClient(latency=args.llm_latency)
+        retry.llm.limiter = retry.RateLimiter(rate=float('inf'), max_rate=float('inf'))  # replayed calls have no rate limit
+    reports = {}
+    for name in args.extractor or list(EXTRACTORS):
+        extractor = resolve_extractor(name)
+        if extractor is batched_extractor:
+            extractor = lambda items, model=None: batched_extractor(items, model, args.batch_size)
+        reports[name] = evaluate(extractor, items, client, args.model, score_llm=args.live)
+
+    print(f"📏 {len(items)} golden records ({'live API' if args.live else 'replayed LLM responses'}"
+          f"{', model ' + args.model if args.model else ''})\n")
+    print_report(reports)
+    if local:
+        local.close()
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, indent=2)
@@ -0,0 +1,303 @@
+# bench/pipeline_bench.py
+# Offline benchmark of the scraping pipeline on saved pages and recorded LLM responses.
+# Run from the repo root: python bench/pipeline_bench.py [--save-baseline]
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import tempfile
+import statistics
+import contextlib
+from types import SimpleNamespace
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+os.environ.setdefault("OPENAI_API_KEY", "offline-bench")  # main.py builds its backend at import time
+
+from bs4 import BeautifulSoup
+import main
+import dedup
+import sinks
+import sources
+import storage
+import tracing
+import retry
+import llm_backends
+import deal_segmenter
+from deal_record import Deal
+
+FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures")
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+FIXTURE_PAGES = {
+    'ctvc_newsletter': "ctvc_newsletter.html",
+    'ctvc_listing': "ctvc_listing.html",
+    'cleantechnica_listing': "cleantechnica_listing.html",
+    'cleantechnica_article': "cleantechnica_article.html",
+    'canary_listing': "canary_listing.html",
+    'canary_article': "canary_article.html",
+}
+# The single-deal articles run through classify + extract, like the non-CTVC sources in main.py.
+ARTICLE_PAGES = {
+    'cleantechnica_article': (sources.parse_cleantechnica_article, "CleanTechnica", "Batteries"),
+    'canary_article': (sources.parse_canary_media_article, "Canary Media", "Clean Industry"),
+}
+
+
+# --- RECORDED LLM ---
+
+class ReplayClient:
+    """
+    Stands in for the OpenAI client: answers each chat completion with the recorded response
+    whose `match` text appears in the prompt, after an optional simulated network latency.
+    """
+
+    def __init__(self, path=os.path.join(FIXTURES_DIR, "llm_responses.json"), latency=0.0):
+        with open(path, 'r', encoding='utf-8') as f:
+            self.responses = json.load(f)['responses']
+        self.latency = latency
+        self.calls = 0
+        self.misses = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, messages, **kwargs):
+        self.calls += 1
+        prompt = "\n".join(message['content'] for message in messages)
+        # Match only the text after the prompt's worked example, which quotes a real deal (AIR) itself.
+        actual = prompt[prompt.find("**Actual"):] if "**Actual" in prompt else prompt
+        content = next((r['content'] for r in self.responses if r['match'] in actual), None)
+        if content is None:
+            self.misses += 1
+            content = "{}"
+        if self.latency:
+            time.sleep(self.latency)
+        usage = SimpleNamespace(prompt_tokens=len(prompt) // 4, completion_tokens=len(content) // 4,
+                                total_tokens=(len(prompt) + len(content)) // 4)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+
+
+# --- MEASUREMENT ---
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10  # bytes on macOS, KiB on Linux
+
+def _percentile(sorted_samples, q):
+    return sorted_samples[min(len(sorted_samples) - 1, int(round(q * (len(sorted_samples) - 1))))]
+
+def time_stage(func, inputs, units_per_op=1):
+    """
+    Calls `func` once per input, timing each call.
+
+    Returns:
+        dict: ops, units/s throughput, p50/p99 latency per op in ms, and the process's peak RSS so far.
+    """
+    samples = []
+    tracing.reset()  # spans recorded by earlier stages would otherwise pile up and skew GC timings
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for item in inputs:
+            started = time.perf_counter()
+            func(item)
+            samples.append(time.perf_counter() - started)
+    samples.sort()
+    total = sum(samples)
+    return {
+        'ops': len(samples),
+        'throughput_per_s': round(len(samples) * units_per_op / total, 1) if total else None,
+        'p50_ms': round(_percentile(samples, 0.50) * 1000, 3),
+        'p99_ms': round(_percentile(samples, 0.99) * 1000, 3),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+
+# --- PIPELINE ---
+
+def load_pages():
+    pages = {}
+    for name, filename in FIXTURE_PAGES.items():
+        with open(os.path.join(FIXTURES_DIR, filename), 'r', encoding='utf-8') as f:
+            pages[name] = f.read()
+    return pages
+
+def parse_page(item):
+    name, html = item
+    if name == 'ctvc_newsletter':
+        soup = BeautifulSoup(html, 'lxml')
+        main_content = soup.find('div', class_=lambda c: c and 'content' in c and 'prose' in c)
+        return deal_segmenter.find_deals_heading(main_content)
+    parser = {
+        'ctvc_listing': sources.parse_ctvc_listing,
+        'cleantechnica_listing': sources.parse_cleantechnica_listing,
+        'canary_listing': sources.parse_canary_media_listing,
+        'cleantechnica_article': sources.parse_cleantechnica_article,
+        'canary_article': sources.parse_canary_media_article,
+    }[name]
+    return parser(html)
+
+def run_pipeline(pages, store, run_id):
+    """One end-to-end pass over the fixtures, mirroring the loop in main.py. Returns the deals saved."""
+    deduplicator = dedup.DealDeduplicator()
+    saved = 0
+    with sinks.DatabaseSink(store, flush_every=10, flush_interval=60.0) as deal_sink:
+        url = f"https://www.ctvc.co/2025/07/28/thermal-batteries-heat-up-214-{run_id}"
+        _, deal_records = sources.parse_ctvc_article(pages['ctvc_newsletter'])
+        for deal in deal_records:
+            known_deal = deduplicator.find(deal['startup_name'], deal['amount_raised'], deal['date'], exclude_url=url)
+            if known_deal:
+                dedup.add_source(known_deal, url, "CTVC")
+                deal_sink.write(known_deal)
+                continue
+            funding_data = main.extract_ctvc_deal_data(deal['text'])
+            if funding_data:
+                cleaned_data = main.clean_and_normalize_data(
+                    funding_data, source_url=url, source_site="CTVC", subsector="Deal from Newsletter")
+                if not cleaned_data.startup_name:
+                    cleaned_data.startup_name = deal['startup_name']
+                if cleaned_data.startup_name:
+                    deal_sink.write(deduplicator.resolve(cleaned_data)[0])
+                    saved += 1
+        for name, (parser, site, subsector) in ARTICLE_PAGES.items():
+            title, content, website = parser(pages[name])
+            if "STARTUP_FUNDING_ROUND" in main.classify_article_type(title, content):
+                funding_data = main.extract_funding_data(content)
+                if funding_data:
+                    cleaned_data = main.clean_and_normalize_data(
+                        funding_data, source_url=f"https://example.com/{name}/{run_id}", source_site=site,
+                        subsector=subsector, website=website)
+                    if cleaned_data.startup_name:
+                        deal_sink.write(deduplicator.resolve(cleaned_data)[0])
+                        saved += 1
+    return saved
+
+def run_benchmarks(iterations, llm_latency=0.0):
+    client = ReplayClient(latency=llm_latency)
+    main.backend = llm_backends.OpenAIBackend(client)
+    retry.llm.limiter = retry.RateLimiter(rate=float('inf'), max_rate=float('inf'))  # replayed calls have no rate limit
+    pages = load_pages()
+    results = {}
+
+    # parse: HTML -> soup -> page data (for the newsletter, up to locating the deals heading)
+    results['parse'] = time_stage(parse_page, list(pages.items()) * iterations)
+
+    # segment: deals block -> one record per deal
+    heading = parse_page(('ctvc_newsletter', pages['ctvc_newsletter']))
+    deal_records = deal_segmenter.segment_deals(heading)
+    results['segment'] = time_stage(lambda _: deal_segmenter.segment_deals(heading), range(iterations),
+                                    units_per_op=len(deal_records))
+
+    # extract: prompt building + (replayed) completion + JSON decoding, one call per deal
+    texts = [record['text'] for record in deal_records]
+    results['extract'] = time_stage(main.extract_ctvc_deal_data, texts * iterations)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        extractions = [main.extract_ctvc_deal_data(text) for text in texts]
+
+    # normalize: raw extraction -> Deal (investor cleanup, stage/source enums, amount parsing + FX)
+    url = "https://www.ctvc.co/2025/07/28/thermal-batteries-heat-up-214"
+    normalize = lambda raw: main.clean_and_normalize_data(raw, source_url=url, source_site="CTVC")
+    results['normalize'] = time_stage(normalize, extractions * iterations)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # write: batches of 10 (main.py's flush size) upserted into a fresh on-disk store
+        with storage.DealStore(os.path.join(tmp, "write.db")) as store:
+            deals = [normalize(raw).to_dict() for raw in extractions]
+            batches = []
+            for i in range(iterations):
+                # A distinct source URL per iteration, so every batch inserts rather than updates.
+                copies = [Deal.from_dict(dict(deal, source_url=f"{url}-{i}")) for deal in deals]
+                batches += [copies[start:start + 10] for start in range(0, len(copies), 10)]
+            results['write'] = time_stage(store.upsert_many, batches, units_per_op=10)
+
+        # end_to_end: every fixture page through parse, dedup, extract, normalize and write
+        with storage.DealStore(os.path.join(tmp, "pipeline.db")) as store:
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                saved = run_pipeline(pages, store, "warmup")
+            results['end_to_end'] = time_stage(lambda i: run_pipeline(pages, store, i), range(iterations),
+                                               units_per_op=saved)
+            results['end_to_end']['deals_per_run'] = saved
+
+    results['_meta'] = {
+        'iterations': iterations,
+        'llm_latency_s': llm_latency,
+        'llm_calls': client.calls,
+        'llm_replay_misses': client.misses,
+        'python': platform.python_version(),
+        'machine': f"{platform.system()} {platform.machine()}",
+    }
+    return results
+
+
+# --- BASELINE ---
+
+def median_results(runs):
+    """Per-stage, per-metric median of several `run_benchmarks` results (one run is noisy on a busy machine)."""
+    merged = {}
+    for stage, first in runs[0].items():
+        if stage.startswith('_'):
+            merged[stage] = dict(first, runs=len(runs))
+            continue
+        merged[stage] = {key: round(statistics.median(run[stage][key] for run in runs), 3)
+                         if isinstance(value, float) else value for key, value in first.items()}
+    return merged
+
+def compare(results, baseline, tolerance):
+    """Returns a list of human-readable regressions (slower p50, lower throughput or higher peak RSS)."""
+    regressions = []
+    for stage, current in results.items():
+        previous = baseline.get(stage)
+        if stage.startswith('_') or not previous:
+            continue
+        if current['p50_ms'] > previous['p50_ms'] * (1 + tolerance):
+            regressions.append(f"{stage}: p50 {previous['p50_ms']} ms -> {current['p50_ms']} ms")
+        if current['throughput_per_s'] and current['throughput_per_s'] < previous['throughput_per_s'] / (1 + tolerance):
+            regressions.append(f"{stage}: throughput {previous['throughput_per_s']}/s -> {current['throughput_per_s']}/s")
+        if current['peak_rss_mb'] > previous['peak_rss_mb'] * (1 + tolerance):
+            regressions.append(f"{stage}: peak RSS {previous['peak_rss_mb']} MB -> {current['peak_rss_mb']} MB")
+    return regressions
+
+def print_results(results):
+    print(f"{'stage':<12} {'ops':>7} {'throughput/s':>13} {'p50 ms':>9} {'p99 ms':>9} {'peak RSS MB':>12}")
+    for stage, r in results.items():
+        if not stage.startswith('_'):
+            print(f"{stage:<12} {r['ops']:>7} {r['throughput_per_s']:>13} {r['p50_ms']:>9} {r['p99_ms']:>9} {r['peak_rss_mb']:>12}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmark with regression check.")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="simulated seconds per LLM call")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="overwrite the baseline with this run")
+    parser.add_argument("--runs", type=int, default=1,
+                        help="repeat the benchmark and use each metric's median (use 5 or so when saving a baseline)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown before flagging")
+    parser.add_argument("--output", help="also write this run's results to a JSON file")
+    args = parser.parse_args()
+
+    runs = []
+    for _ in range(max(1, args.runs)):
+        runs.append(run_benchmarks(args.iterations, args.llm_latency))
+    results = median_results(runs) if len(runs) > 1 else runs[0]
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Baseline saved to {args.baseline}.")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n🔴 {len(regressions)} regression(s) against {args.baseline}:")
+            for regression in regressions:
+                print(f"   -> {regression}")
+            sys.exit(1)
+        print(f"\n✅ No regressions against {args.baseline} (tolerance {args.tolerance:.0%}).")
+    else:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one.")
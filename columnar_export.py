@@ -0,0 +1,248 @@
+# columnar_export.py
+# Incremental, partitioned Parquet / Arrow export of the deal store, with a memory-mapped read path.
+
+import os
+import json
+import uuid
+import datetime
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pafs
+    import pyarrow.parquet as pq
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+
+import storage
+
+EXPORT_DIR = "deals_dataset"
+MANIFEST_FILE = "_manifest.json"
+FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+def deal_schema():
+    return pa.schema([
+        ('id', pa.int64()),
+        ('startup_name', pa.string()),
+        ('subsector', pa.string()),
+        ('amount_raised', pa.string()),
+        ('amount_value', pa.float64()),
+        ('amount_currency', pa.string()),
+        ('amount_usd', pa.float64()),
+        ('fx_version', pa.string()),
+        ('funding_stage', pa.string()),
+        ('lead_investor', pa.string()),
+        ('other_investors', pa.list_(pa.string())),
+        ('source_url', pa.string()),
+        ('date', pa.date32()),
+        ('sources', pa.list_(pa.struct([('url', pa.string()), ('site', pa.string())]))),
+        ('website', pa.string()),
+        ('hq', pa.string()),
+        ('sector', pa.string()),
+    ])
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("columnar export needs pyarrow: pip install pyarrow")
+
+
+# --- MANIFEST ---
+# The manifest records the change-feed cursor (`seq`, see DealStore.deals_since) already exported, so each
+# run only writes deals inserted or updated since, and the highest deal id exported, so it knows which of
+# those have an older version in the files. (Manifests from before `last_seq` start over from cursor 0.)
+
+def _empty_manifest():
+    return {'last_seq': 0, 'last_id': 0, 'files': []}
+
+def _load_manifest(export_dir):
+    path = os.path.join(export_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return _empty_manifest()
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    manifest.setdefault('last_seq', 0)
+    return manifest
+
+def _save_manifest(export_dir, manifest):
+    path = os.path.join(export_dir, MANIFEST_FILE)
+    with open(path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+# --- EXPORT ---
+
+def _partition_key(deal):
+    month = (deal.get('date') or 'unknown')[:7]
+    source = (deal.get('source_site') or 'unknown').replace('/', '_')
+    return month, source
+
+def _to_columns(deals, schema):
+    columns = {field.name: [] for field in schema}
+    for deal in deals:
+        for name in columns:
+            value = deal.get(name)
+            if name == 'date' and value:
+                value = datetime.date.fromisoformat(value[:10])
+            elif name == 'other_investors':
+                value = value or []
+            elif name == 'sources':
+                value = [{'url': s.get('url'), 'site': s.get('site')} for s in value or []]
+            columns[name].append(value)
+    return pa.table(columns, schema=schema)
+
+def _format_of(path):
+    return 'arrow' if path.endswith(FORMATS['arrow']) else 'parquet'
+
+def _read_file(path, columns=None):
+    if _format_of(path) == 'arrow':
+        return feather.read_table(path, columns=columns, memory_map=False)
+    return pq.read_table(path, columns=columns)
+
+def _write_file(table, path, file_format):
+    if file_format == 'parquet':
+        pq.write_table(table, path, compression='zstd')
+    else:
+        # Uncompressed Arrow IPC so readers can memory-map it without a decode step.
+        feather.write_feather(table, path, compression='uncompressed')
+
+def _drop_stale(export_dir, manifest, ids):
+    """
+    Removes the exported rows of deals in `ids` (updated or deleted since they were exported), rewriting only
+    the files that hold one. A file left empty is deleted.
+    """
+    value_set = pa.array(sorted(ids), pa.int64())
+    for relative_path in list(manifest['files']):
+        path = os.path.join(export_dir, relative_path)
+        if not os.path.exists(path):
+            continue
+        stale = pc.is_in(_read_file(path, columns=['id'])['id'], value_set=value_set)
+        if not pc.any(stale).as_py():
+            continue
+        table = _read_file(path)
+        table = table.filter(pc.invert(stale))
+        if table.num_rows:
+            _write_file(table, path + ".tmp", _format_of(path))
+            os.replace(path + ".tmp", path)
+        else:
+            os.remove(path)
+            manifest['files'].remove(relative_path)
+
+def export_incremental(store, export_dir=EXPORT_DIR, file_format='parquet', batch_size=100_000):
+    """
+    Writes every deal inserted or updated since the manifest's `seq` cursor as new files under
+    `month=YYYY-MM/source=<site>/`. A deal updated after it was exported has its old row removed
+    from whichever file held it, and a deal deleted since (a store tombstone) has its row removed, so the
+    dataset keeps one current row per stored deal.
+
+    Returns:
+        int: Number of deals exported in this call.
+    """
+    _require_pyarrow()
+    if file_format not in FORMATS:
+        raise ValueError(f"Unknown format {file_format!r}; expected one of {sorted(FORMATS)}")
+    os.makedirs(export_dir, exist_ok=True)
+    manifest = _load_manifest(export_dir)
+    schema = deal_schema()
+    run_id = datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m%dT%H%M%S') + '-' + uuid.uuid4().hex[:6]
+
+    # Deletions go first: a deleted deal's id can be reused by a later insert, which the loop below writes.
+    tombstones = store.deleted_since(manifest['last_seq'])
+    if tombstones:
+        _drop_stale(export_dir, manifest, {tombstone['deal_id'] for tombstone in tombstones})
+
+    exported = 0
+    while True:
+        rows, cursor = store.deals_since(manifest['last_seq'], batch_size)
+        if not rows:
+            break
+        updated = {deal['id'] for deal in rows if deal['id'] <= manifest['last_id']}
+        if updated:
+            _drop_stale(export_dir, manifest, updated)
+        partitions = {}
+        for deal in rows:
+            partitions.setdefault(_partition_key(deal), []).append(deal)
+
+        for (month, source), deals in partitions.items():
+            directory = os.path.join(export_dir, f"month={month}", f"source={source}")
+            os.makedirs(directory, exist_ok=True)
+            filename = os.path.join(directory, f"part-{run_id}-{deals[0]['seq']}{FORMATS[file_format]}")
+            _write_file(_to_columns(deals, schema), filename, file_format)
+            manifest['files'].append(os.path.relpath(filename, export_dir))
+
+        exported += len(rows)
+        manifest['last_seq'] = cursor
+        manifest['last_id'] = max(manifest['last_id'], max(deal['id'] for deal in rows))
+        manifest['format'] = file_format
+        _save_manifest(export_dir, manifest)
+    if tombstones:
+        # Every deal older than the newest deletion has been exported by now.
+        manifest['last_seq'] = max(manifest['last_seq'], tombstones[-1]['seq'])
+        _save_manifest(export_dir, manifest)
+        print(f"   -> Removed {len(tombstones)} deleted deals from the export.")
+
+    print(f"📦 Exported {exported} new or updated deals to {export_dir} ({file_format}).")
+    return exported
+
+def rebuild(store, export_dir=EXPORT_DIR, file_format='parquet'):
+    """Deletes the exported files and re-exports the whole store."""
+    manifest = _load_manifest(export_dir)
+    for relative_path in manifest['files']:
+        path = os.path.join(export_dir, relative_path)
+        if os.path.exists(path):
+            os.remove(path)
+    if os.path.isdir(export_dir):
+        _save_manifest(export_dir, _empty_manifest())
+    return export_incremental(store, export_dir, file_format)
+
+
+# --- READ PATH ---
+
+def open_dataset(export_dir=EXPORT_DIR, file_format=None):
+    """
+    Opens the export as a pyarrow Dataset with `month` and `source` partition columns.
+    Files are read through a memory-mapping filesystem; with the Arrow format, scans are zero-copy.
+    """
+    _require_pyarrow()
+    file_format = file_format or _load_manifest(export_dir).get('format', 'parquet')
+    return ds.dataset(
+        export_dir,
+        format='ipc' if file_format == 'arrow' else 'parquet',
+        partitioning='hive',
+        filesystem=pafs.LocalFileSystem(use_mmap=True),
+        exclude_invalid_files=True,
+        ignore_prefixes=['_', '.'],
+    )
+
+def read_table(export_dir=EXPORT_DIR, columns=None, filter=None):
+    """Convenience scan, e.g. read_table(filter=ds.field('source') == 'CTVC', columns=['startup_name'])."""
+    return open_dataset(export_dir).to_table(columns=columns, filter=filter)
+
+def map_partition(path):
+    """Zero-copy view of a single Arrow partition file: the buffers point straight into the mapping."""
+    _require_pyarrow()
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export the deal store as partitioned Parquet/Arrow.")
+    parser.add_argument("command", choices=["export", "rebuild", "summary"])
+    parser.add_argument("--format", choices=sorted(FORMATS), default="parquet")
+    parser.add_argument("--dir", default=EXPORT_DIR)
+    parser.add_argument("--db", default=storage.DB_FILE)
+    args = parser.parse_args()
+
+    if args.command == "summary":
+        table = read_table(args.dir)
+        print(f"{table.num_rows} deals, {len(open_dataset(args.dir).files)} files")
+        print(table.group_by(['month', 'source']).aggregate([('amount_usd', 'sum'), ('id', 'count')]))
+    else:
+        with storage.open_store(args.db) as store:
+            if args.command == "export":
+                export_incremental(store, args.dir, args.format)
+            else:
+                rebuild(store, args.dir, args.format)
@@ -0,0 +1,140 @@
+# content_hashes.py
+# Content hashes of each newsletter's deals block and deal lines, so a refresh only re-extracts what was edited.
+
+import sqlite3
+import hashlib
+import datetime
+from difflib import SequenceMatcher
+
+import dedup
+import storage
+import deal_segmenter
+
+EDIT_NAME_SIMILARITY = 0.6    # a corrected startup name this close to a removed line's is the same deal
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS page_hashes (
+    url TEXT PRIMARY KEY,
+    block_hash TEXT NOT NULL,
+    line_count INTEGER NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    checked TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS deal_lines (
+    url TEXT NOT NULL,
+    line_hash TEXT NOT NULL,
+    startup_name TEXT,
+    PRIMARY KEY (url, line_hash)
+) WITHOUT ROWID;
+"""
+
+def line_hash(text):
+    """Hash of a deal line's text, ignoring whitespace differences."""
+    normalized = deal_segmenter.WHITESPACE_PATTERN.sub(' ', text).strip()
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).hexdigest()
+
+def block_hash(deal_records):
+    """Hash of a whole deals block: its line hashes, in order."""
+    digest = hashlib.blake2b(digest_size=16)
+    for record in deal_records:
+        digest.update(line_hash(record['text']).encode('ascii'))
+    return digest.hexdigest()
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+
+
+class ContentHashIndex:
+    """
+    Per-URL hashes of the deals block and of every segmented deal line, plus the HTTP validators
+    (ETag / Last-Modified) of the last fetch, in SQLite next to the deals.
+
+    Args:
+        path (str): SQLite database file (defaults to the master store's database).
+    """
+
+    def __init__(self, path=storage.DB_FILE, busy_timeout=30.0):
+        self.conn = sqlite3.connect(path, timeout=busy_timeout)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def get_page(self, url):
+        """The stored row for a newsletter (block_hash, line_count, etag, last_modified, checked), or None."""
+        row = self.conn.execute("SELECT * FROM page_hashes WHERE url = ?", (url,)).fetchone()
+        return dict(row) if row else None
+
+    def new_lines(self, url, deal_records):
+        """The records whose line text was not in the newsletter when it was last recorded (new or edited)."""
+        known = {row[0] for row in self.conn.execute("SELECT line_hash FROM deal_lines WHERE url = ?", (url,))}
+        return [record for record in deal_records if line_hash(record['text']) not in known]
+
+    def removed_lines(self, url, deal_records):
+        """Startup names of stored lines that are no longer in the newsletter (deleted, or edited into a new line)."""
+        current = {line_hash(record['text']) for record in deal_records}
+        return [row['startup_name'] for row in self.conn.execute(
+            "SELECT line_hash, startup_name FROM deal_lines WHERE url = ?", (url,)) if row['line_hash'] not in current]
+
+    def edited_lines(self, url, deal_records):
+        """
+        Pairs new or edited records (see `new_lines`) with the stored line each one replaced: the removed
+        line with the same startup name, else the one with the most similar name (a corrected spelling).
+        A record whose name matches no removed line is a new deal.
+
+        Returns:
+            dict: {id(record): startup name of the replaced line} for the records that are edits.
+        """
+        current = {line_hash(record['text']) for record in deal_records}
+        removed = {dedup.normalize_name(row['startup_name']): row['startup_name'] for row in self.conn.execute(
+            "SELECT line_hash, startup_name FROM deal_lines WHERE url = ?", (url,))
+            if row['line_hash'] not in current and row['startup_name']}
+        new = [(record, dedup.normalize_name(record.get('startup_name'))) for record in self.new_lines(url, deal_records)]
+        edits = {}
+        for record, name in new:
+            if name in removed:
+                edits[id(record)] = removed.pop(name)
+        for record, name in new:
+            if id(record) in edits or not name or not removed:
+                continue
+            similarity, old = max((SequenceMatcher(None, name, old).ratio(), old) for old in removed)
+            if similarity >= EDIT_NAME_SIMILARITY:
+                edits[id(record)] = removed.pop(old)
+        return edits
+
+    def record(self, url, deal_records, etag=None, last_modified=None, failed=()):
+        """
+        Stores the newsletter's current lines and block hash, replacing what was recorded before.
+        Lines in `failed` (extraction failed) are left out, and the block hash then no longer matches
+        the page, so the next refresh extracts them again.
+        """
+        failed = {id(record) for record in failed}
+        deal_records = [record for record in deal_records if id(record) not in failed]
+        with self.conn:
+            self.conn.execute("DELETE FROM deal_lines WHERE url = ?", (url,))
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO deal_lines (url, line_hash, startup_name) VALUES (?, ?, ?)",
+                [(url, line_hash(record['text']), record.get('startup_name')) for record in deal_records])
+            self.conn.execute(
+                """INSERT INTO page_hashes (url, block_hash, line_count, etag, last_modified, checked)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (url) DO UPDATE SET block_hash = excluded.block_hash, line_count = excluded.line_count,
+                       etag = excluded.etag, last_modified = excluded.last_modified, checked = excluded.checked""",
+                (url, block_hash(deal_records), len(deal_records), etag, last_modified, _now()))
+
+    def touch(self, url, etag=None, last_modified=None):
+        """Marks an unchanged newsletter as checked now, keeping validators the server did not resend."""
+        with self.conn:
+            self.conn.execute(
+                """UPDATE page_hashes SET checked = ?, etag = COALESCE(?, etag),
+                   last_modified = COALESCE(?, last_modified) WHERE url = ?""",
+                (_now(), etag, last_modified, url))
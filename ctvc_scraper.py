@@ -1,14 +1,8 @@
 # ctvc_scraper.py
 # A focused, reusable module to scrape and extract climate tech funding deals from CTVC.
 
-import os
 import json
-import csv
 import time
-import re
-import requests
-from dotenv import load_dotenv
-from openai import OpenAI
 from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.webdriver.firefox.service import Service as FirefoxService
@@ -16,48 +10,19 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.firefox import GeckoDriverManager
-
-# --- INITIALIZATION ---
-load_dotenv()
-
-# Configure the OpenAI client
-# For Replit, these will be set in the "Secrets" (environment variables) tab.
-client = OpenAI(
-  base_url="https://openrouter.ai/api/v1",
-  api_key=os.environ.get("OPENAI_API_KEY"),
-  default_headers={
-    "HTTP-Referer": "https://github.com/your-repo", # Optional: Change to your repo URL
-    "X-Title": "Climate Tech Funding Tracker",
-  },
-)
-
-PROCESSED_URLS_LOG_FILE = "processed_urls.log"
+import deal_segmenter
+import sources
+import storage
+import url_index
+import tracing
+import retry
+import main
+import prompts
+from deal_record import Deal, Source
 
 # --- HELPER FUNCTIONS ---
 
-def load_processed_urls(filename=PROCESSED_URLS_LOG_FILE):
-    if not os.path.exists(filename):
-        return set()
-    with open(filename, 'r', encoding='utf-8') as f:
-        return set(line.strip() for line in f)
-
-def save_to_csv(data_list, filename="climate_funding_data_master.csv"):
-    if not data_list:
-        print("No new data to save.")
-        return
-    print(f"💾 Saving {len(data_list)} new records to {filename}...")
-    file_exists = os.path.isfile(filename)
-    headers = set().union(*(d.keys() for d in data_list))
-    preferred_order = ['startup_name', 'subsector', 'amount_raised', 'funding_stage', 'lead_investor', 'other_investors', 'source_url', 'source_site']
-    final_headers = sorted(list(headers), key=lambda x: preferred_order.index(x) if x in preferred_order else len(preferred_order))
-    
-    with open(filename, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=final_headers)
-        if not file_exists:
-            writer.writeheader()
-        writer.writerows(data_list)
-    print("   -> Save complete.")
-
+@tracing.traced("crawl", source="CTVC")
 def crawl_ctvc_links(pages_to_load=1):
     base_url = "https://www.ctvc.co/tag/newsletter/"
     print(f"🕵️  Crawling CTVC Newsletter with Selenium...")
@@ -100,133 +65,104 @@ def crawl_ctvc_links(pages_to_load=1):
         if driver:
             driver.quit()
 
+@tracing.traced("scrape", source="CTVC")
 def scrape_deals_block(url):
+    """Returns the segmented deal records from a newsletter, or an empty list if none were found."""
     print(f"  Scraping URL for deals block: {url}")
     try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        response = requests.get(url, headers=headers, timeout=20)
-        response.raise_for_status()
+        response = retry.get(url, timeout=20)
         soup = BeautifulSoup(response.content, 'lxml')
         
         main_content = soup.find('div', class_=lambda c: c and 'content' in c and 'prose' in c)
-        if not main_content:
-            return "Content not found."
-
-        deals_heading = main_content.find(['h2', 'h3'], string=lambda t: t and 'deals of the week' in t.lower())
+        deals_heading = deal_segmenter.find_deals_heading(main_content)
         if not deals_heading:
-            return "Content not found."
+            return []
             
         print("   -> 'Deals of the Week' heading found.")
-        content_parts = []
-        stop_headings = ["in the news", "exits", "new funds", "pop-up", "opportunities & events", "jobs"]
-        for element in deals_heading.find_next_siblings():
-            if element.name in ['h2', 'h3']:
-                element_text = element.get_text(strip=True).lower()
-                if any(stop_word in element_text for stop_word in stop_headings):
-                    break
-            content_parts.append(element.get_text(separator=' ', strip=True))
-        
-        return "\n".join(content_parts)
+        deal_records = deal_segmenter.segment_deals(deals_heading)
+        published = sources.parse_published_date(soup)
+        for record in deal_records:
+            record['date'] = published
+        return deal_records
     
     except Exception as e:
         print(f"   -> 🔴 Error scraping article: {e.__class__.__name__}")
-        return "Content not found."
+        return []
 
+@tracing.traced("extract", source="CTVC")
 def extract_deal_data(deal_string):
-    prompt = f"""From the deal announcement text, extract: startup_name, amount_raised, funding_stage, and all investors.
-
-**Instructions:**
-- The startup name is the first bolded name.
-- The amount is the bolded dollar/euro value.
-- If a single investor is mentioned after "from", they are the `lead_investor`.
-- If multiple investors are listed, the first is the `lead_investor` and the rest are `other_investors`.
-- If a value is not present, use `null`.
-
-**Example:**
-Text: "✈️ AIR, a Haifa, Israel-based eVTOL developer, raised $23m in Series A funding from Entrée Capital."
-JSON Output: {{"startup_name": "AIR", "amount_raised": "$23m", "funding_stage": "Series A", "lead_investor": "Entrée Capital", "other_investors": []}}
-
----
-**Text to Process:** "{deal_string}"
-**JSON Output:**"""
     try:
-        response = client.chat.completions.create(
-            model="meta-llama/llama-3-8b-instruct",
-            response_format={"type": "json_object"},
-            messages=[{"role": "user", "content": prompt}]
-        )
+        # Through main's backend (OpenRouter, or llama.cpp under --backend), so its retries, pacing and usage apply.
+        response = main.chat_completion(**prompts.CTVC_DEAL.request(main.EXTRACTION_MODEL, deal_string=deal_string))
         return json.loads(response.choices[0].message.content)
     except Exception as e:
         print(f"   -> 🔴 AI Error: {e}")
         return None
 
-def clean_data(data):
-    lead = data.get('lead_investor') or data.get('lead_investors')
-    others = data.get('other_investors') or data.get('investors')
-    
-    if isinstance(lead, list) and lead:
-        if not others: others = []
-        others.extend(lead[1:])
-        lead = lead[0]
-
-    cleaned = {k: v for k, v in {
-        'startup_name': data.get('startup_name'), 'amount_raised': data.get('amount_raised'),
-        'funding_stage': data.get('funding_stage'), 'lead_investor': lead, 'other_investors': others
-    }.items() if v is not None and v != 'null' and v != ['null']}
-    
-    return cleaned
+def clean_data(data, **provenance):
+    return Deal.from_extraction(data, **provenance)
 
 # --- THE MAIN ENTRY POINT FOR YOUR UI ---
 
+def iter_latest_ctvc_deals(pages_to_load=1):
+    """
+    Yields each new `Deal` as soon as it is extracted, for callers that stream results
+    (see service.py). Once all of a newsletter's deals were yielded they are saved to the store,
+    and only then is the newsletter marked as processed in the seen index shared with main.py.
+
+    Args:
+        pages_to_load (int): The number of times to click the "Load More" button.
+    """
+    seen_urls = url_index.open_seen_index()
+    store = storage.open_store()
+    try:
+        newsletter_urls = crawl_ctvc_links(pages_to_load=pages_to_load)
+        for url in newsletter_urls:
+            if url in seen_urls:
+                continue
+
+            print(f"\n--- Processing article: {url} ---")
+            deal_records = scrape_deals_block(url)
+
+            print(f"   -> Found {len(deal_records)} potential deals in this article.")
+            newsletter_deals = []
+            for deal in deal_records:
+                deal_data = extract_deal_data(deal['text'])
+                if deal_data:
+                    cleaned_data = clean_data(deal_data, source_url=url, source_site=Source.CTVC)
+                    # Fall back to the bold spans the segmenter kept from the DOM.
+                    if not cleaned_data.startup_name:
+                        cleaned_data.startup_name = deal['startup_name']
+                    if not cleaned_data.amount_raised and deal['amount_raised']:
+                        cleaned_data.set_amount(deal['amount_raised'])
+                    cleaned_data.date = deal['date']
+                    if cleaned_data.startup_name:
+                        print(f"   -> ✅ SUCCESS: Extracted '{cleaned_data['startup_name']}'")
+                        newsletter_deals.append(cleaned_data)
+                        yield cleaned_data
+
+            # A URL in the seen index is never scraped again, so its deals must be stored first.
+            store.upsert_many(newsletter_deals)
+            seen_urls.add(url)
+    finally:
+        store.close()
+        seen_urls.close()
+
 def fetch_latest_ctvc_deals(pages_to_load=1):
     """
     This is the main function the front-end will call.
     It orchestrates the entire process of scraping and extracting CTVC deals.
+    A front end serving several users should go through service.py, which shares one run
+    between identical concurrent requests and caches the result.
     
     Args:
         pages_to_load (int): The number of times to click the "Load More" button.
                              Each click loads ~6 more articles.
                              
     Returns:
-        list: A list of dictionaries, where each dictionary is a funding deal.
+        list: A list of `Deal` records (they also support dict-style access).
     """
-    processed_urls = load_processed_urls()
-    newsletter_urls = crawl_ctvc_links(pages_to_load=pages_to_load)
-    
-    new_deals = []
-    
-    for url in newsletter_urls:
-        if url in processed_urls:
-            continue
-            
-        print(f"\n--- Processing article: {url} ---")
-        deals_block = scrape_deals_block(url)
-        
-        if deals_block != "Content not found.":
-            # Use regex to split the block by the deal-starting emojis
-            emoji_pattern = re.compile(r'[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001FA00-\U0001FAFF\u2600-\u26FF\u2700-\u27BF]+')
-            deal_chunks = emoji_pattern.split(deals_block)[1:]
-            emojis = emoji_pattern.findall(deals_block)
-            deal_lines = [emojis[i] + chunk.strip() for i, chunk in enumerate(deal_chunks)]
-            
-            print(f"   -> Found {len(deal_lines)} potential deals in this article.")
-            for line in deal_lines:
-                if 'raised' in line or 'funding' in line:
-                    time.sleep(1.5) # Rate limit our AI calls
-                    deal_data = extract_deal_data(line)
-                    if deal_data:
-                        cleaned_data = clean_data(deal_data)
-                        if cleaned_data.get('startup_name'):
-                            cleaned_data['source_url'] = url
-                            cleaned_data['source_site'] = "CTVC"
-                            new_deals.append(cleaned_data)
-                            print(f"   -> ✅ SUCCESS: Extracted '{cleaned_data['startup_name']}'")
-        
-        # Log the URL after we're done with it
-        with open(PROCESSED_URLS_LOG_FILE, 'a', encoding='utf-8') as f:
-            f.write(f"{url}\n")
-            
-    return new_deals
+    return list(iter_latest_ctvc_deals(pages_to_load))
 
 # --- TEST BLOCK ---
 # This code only runs when you execute `python ctvc_scraper.py` directly.
@@ -241,8 +177,9 @@ if __name__ == "__main__":
         print(f"\n--- TEST COMPLETE ---")
         print(f"Successfully extracted {len(latest_deals)} new deals.")
         
-        # Save the results to a CSV for inspection
-        save_to_csv(latest_deals)
+        # The deals are already in the master store; refresh the CSV export for inspection
+        with storage.open_store() as store:
+            store.export_csv()
         
         # Print a sample of the data
         import pprint
@@ -0,0 +1,196 @@
+# deal_record.py
+# The one deal record type shared by the extractors, dedup, sinks and the store.
+
+import re
+import sys
+import json
+import enum
+
+import amounts
+import storage
+
+# --- ENUMS ---
+# str-valued, so members compare equal to, and serialize as, their plain text.
+
+class _TextEnum(str, enum.Enum):
+    __str__ = str.__str__
+    __format__ = str.__format__
+
+    @classmethod
+    def parse(cls, text):
+        """Returns the matching member, the interned text if it is not a known value, or None."""
+        if text is None or isinstance(text, cls):
+            return text
+        text = str(text).strip()
+        if text in storage.MISSING_VALUES:
+            return None
+        lookup = _LOOKUPS.get(cls)
+        if lookup is None:
+            lookup = _LOOKUPS[cls] = {_enum_key(member.value): member for member in cls}
+        member = lookup.get(_enum_key(text))
+        return member if member is not None else sys.intern(text)
+
+class Stage(_TextEnum):
+    PRE_SEED = 'Pre-Seed'
+    SEED = 'Seed'
+    SERIES_A = 'Series A'
+    SERIES_B = 'Series B'
+    SERIES_C = 'Series C'
+    SERIES_D = 'Series D'
+    SERIES_E = 'Series E'
+    GROWTH = 'Growth Equity'
+    DEBT = 'Debt'
+    GRANT = 'Grant'
+    IPO = 'IPO'
+
+class Source(_TextEnum):
+    CTVC = 'CTVC'
+    CANARY_MEDIA = 'Canary Media'
+    CLEANTECHNICA = 'CleanTechnica'
+
+NON_ALNUM_PATTERN = re.compile(r'[^a-z0-9]+')
+ENUM_SUFFIX_PATTERN = re.compile(r' (?:round|funding|financing|stage)$')
+
+def _enum_key(text):
+    """'Series A round' / 'series-a' -> 'series a'."""
+    key = NON_ALNUM_PATTERN.sub(' ', text.lower()).strip()
+    return ENUM_SUFFIX_PATTERN.sub('', key)
+
+# Parse tables, built on first use; Stage gets a few common spellings on top of its values.
+_LOOKUPS = {Stage: {_enum_key(member.value): member for member in Stage}}
+_LOOKUPS[Stage].update({'preseed': Stage.PRE_SEED, 'growth': Stage.GROWTH, 'venture debt': Stage.DEBT})
+
+
+# --- DEAL RECORD ---
+
+FIELDS = ('id', 'startup_name', 'subsector', 'amount_raised', 'funding_stage', 'lead_investor',
+          'other_investors', 'source_url', 'source_site', 'date', 'sources',
+          'amount_value', 'amount_currency', 'amount_usd', 'fx_version', 'website', 'hq', 'sector')
+# Low-cardinality text that repeats across many deals; interning keeps one copy of each.
+INTERNED_FIELDS = ('subsector', 'lead_investor', 'amount_currency', 'fx_version', 'date', 'hq', 'sector')
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+class Deal:
+    """
+    A funding deal with a fixed set of fields (`FIELDS`), stored in `__slots__`.
+
+    Missing values are always None (never 'Not Specified'). The record also behaves like a
+    read/write mapping (`deal['startup_name']`, `deal.get(...)`, `dict(deal)`), so code
+    written against the old deal dicts keeps working.
+    """
+
+    __slots__ = FIELDS
+
+    def __init__(self, **fields):
+        for name in FIELDS:
+            setattr(self, name, None)
+        for name, value in fields.items():
+            self[name] = value
+
+    # --- Construction ---
+
+    @classmethod
+    def from_dict(cls, data):
+        """Builds a record from any deal dict, ignoring keys outside the schema."""
+        return cls(**{name: value for name, value in data.items() if name in FIELDS})
+
+    @classmethod
+    def from_extraction(cls, data, **provenance):
+        """
+        Normalizes an LLM extraction (`lead_investor`/`lead_investors`, `other_investors`/`investors`,
+        'null' placeholders) into a record, with the amount parsed to numbers and USD.
+
+        Args:
+            provenance: Extra fields such as `source_url`, `source_site` and `subsector`.
+        """
+        lead = data.get('lead_investor') or data.get('lead_investors')
+        others = data.get('other_investors') or data.get('investors')
+        if isinstance(others, str):
+            others = [others]
+        if isinstance(lead, list):
+            others = list(others or []) + lead[1:]
+            lead = lead[0] if lead else None
+        deal = cls(startup_name=data.get('startup_name'), funding_stage=data.get('funding_stage'),
+                   lead_investor=lead, other_investors=others, **provenance)
+        deal.set_amount(data.get('amount_raised'))
+        return deal
+
+    def set_amount(self, amount_raised):
+        """Sets `amount_raised` and re-derives the numeric amount fields from it."""
+        self.amount_raised = _clean(amount_raised)
+        amounts.normalize_record(self)
+
+    # --- Mapping protocol ---
+
+    def __setitem__(self, name, value):
+        if name not in FIELDS:
+            raise KeyError(name)
+        if name == 'funding_stage':
+            value = Stage.parse(value)
+        elif name == 'source_site':
+            value = Source.parse(value)
+        elif name == 'other_investors':
+            value = [sys.intern(investor) for investor in storage._investor_list(value)] or None
+        elif name in INTERNED_FIELDS:
+            value = _intern(_clean(value))
+        elif name not in ('sources', 'id'):
+            value = _clean(value)
+        setattr(self, name, value)
+
+    def __getitem__(self, name):
+        if name not in FIELDS:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __contains__(self, name):
+        return name in FIELDS and getattr(self, name) is not None
+
+    def get(self, name, default=None):
+        value = getattr(self, name, None) if name in FIELDS else None
+        return default if value is None else value
+
+    def setdefault(self, name, default=None):
+        if getattr(self, name) is None:
+            self[name] = default
+        return getattr(self, name)
+
+    def keys(self):
+        return [name for name in FIELDS if getattr(self, name) is not None]
+
+    def items(self):
+        return [(name, getattr(self, name)) for name in self.keys()]
+
+    def __eq__(self, other):
+        if not isinstance(other, Deal):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in FIELDS)
+
+    def __repr__(self):
+        return f"Deal({', '.join(f'{name}={value!r}' for name, value in self.items())})"
+
+    # --- Serialization ---
+
+    def to_dict(self):
+        """Plain dict of every field, with enums as their text."""
+        return {name: _plain(getattr(self, name)) for name in FIELDS}
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+    def to_db_row(self):
+        """Parameters for `DealStore`'s upsert statement."""
+        return storage.to_row(self)
+
+    def to_csv_row(self):
+        return storage.to_csv_row(storage.to_row(self))
+
+def _clean(value):
+    if isinstance(value, str):
+        value = value.strip()
+        return None if value in storage.MISSING_VALUES else value
+    return None if value in ([], ['null']) else value
+
+def _plain(value):
+    return value.value if isinstance(value, enum.Enum) else value
@@ -0,0 +1,177 @@
+# deal_segmenter.py
+# Splits the CTVC "Deals of the Week" block into one record per deal by walking the DOM.
+
+import re
+
+# --- PRECOMPILED PATTERNS ---
+# A leading run of emoji (plus variation selectors / ZWJ) that CTVC uses as a sector marker.
+LEADING_EMOJI_PATTERN = re.compile(
+    r'^[\s\U0001F000-\U0001FAFF\u2600-\u27BF\u2B00-\u2BFF\uFE0F\u200D]+'
+)
+AMOUNT_PATTERN = re.compile(r'[$€£¥]\s?\d[\d,.]*\s?(?:k|m|mm|b|bn|million|billion)?\b', re.IGNORECASE)
+DEAL_HINT_PATTERN = re.compile(r'\b(?:rais(?:ed|es|ing)|funding|secured|closed|financing|round)\b', re.IGNORECASE)
+WHITESPACE_PATTERN = re.compile(r'\s+')
+SPACE_BEFORE_PUNCT_PATTERN = re.compile(r'\s+([,.;:!?)])')
+
+# Rule-based field extraction from a deal sentence ("X, a ...-based ..., raised $5m in Seed funding from A, and B.").
+RAISED_PATTERN = re.compile(
+    r'\b(?:rais(?:ed|es)|secured|closed)\s+(?P<amount>[^\s,]*\d[^\s,]*(?:\s(?:thousand|million|billion|crore))?)',
+    re.IGNORECASE)
+STAGE_PATTERN = re.compile(r'\bin (?:an? )?(?P<stage>[A-Z][\w-]*(?: [A-Z0-9][\w-]*)?) (?:funding|financing|round)\b')
+FROM_PATTERN = re.compile(r'\b(?:funding|financing|round) from (?P<investors>[^.]+)')
+LED_BY_PATTERN = re.compile(r'\bled by (?P<lead>[^,.;]+)|(?P<lead_subject>[A-Z][^,.;]*?) led the round')
+PARTICIPANTS_PATTERN = re.compile(r'\b(?:participation from|joined by) (?P<investors>[^.]+)')
+HQ_PATTERN = re.compile(r"\ban? (?P<hq>[A-Z][\w.'’ -]*(?:, [A-Z][\w.'’ -]*)*?)-based\b")
+INVESTOR_SPLIT_PATTERN = re.compile(r',\s*(?:and\s+)?|\s+and\s+')
+
+DEALS_HEADING_TEXT = "deals of the week"
+STOP_HEADINGS = ["in the news", "exits", "new funds", "pop-up", "opportunities & events", "jobs"]
+HEADING_TAGS = ['h2', 'h3']
+LIST_TAGS = ['ul', 'ol']
+
+
+# --- DOM HELPERS ---
+
+def find_deals_heading(main_content):
+    if not main_content:
+        return None
+    return main_content.find(HEADING_TAGS, string=lambda t: t and DEALS_HEADING_TEXT in t.lower())
+
+def is_stop_heading(element):
+    if element.name not in HEADING_TAGS:
+        return False
+    element_text = element.get_text(strip=True).lower()
+    return any(stop_word in element_text for stop_word in STOP_HEADINGS)
+
+def iter_deal_elements(deals_heading):
+    """Yields every <p>/<li> between the deals heading and the next stop heading."""
+    for element in deals_heading.find_next_siblings():
+        if is_stop_heading(element):
+            break
+        if element.name == 'p':
+            yield element
+        elif element.name in LIST_TAGS:
+            for item in element.find_all('li'):
+                yield item
+        elif element.name not in HEADING_TAGS:
+            # Wrappers such as <div> or <figure> occasionally hold the deal paragraphs.
+            for item in element.find_all(['p', 'li']):
+                yield item
+
+
+# --- SEGMENTATION ---
+
+def _clean_text(text):
+    text = WHITESPACE_PATTERN.sub(' ', text).strip()
+    return SPACE_BEFORE_PUNCT_PATTERN.sub(r'\1', text)
+
+def segment_element(element):
+    """Builds a deal record from a single <p>/<li>, keeping the bold name and amount spans."""
+    text = _clean_text(element.get_text(separator=' ', strip=True))
+    if not text:
+        return None
+
+    emoji_match = LEADING_EMOJI_PATTERN.match(text)
+    emoji = emoji_match.group(0).strip() if emoji_match else ''
+
+    startup_name = None
+    website = None
+    amount = None
+    for bold in element.find_all(['strong', 'b']):
+        bold_text = _clean_text(bold.get_text(separator=' ', strip=True))
+        bold_text = LEADING_EMOJI_PATTERN.sub('', bold_text).strip(' ,')
+        if not bold_text:
+            continue
+        if amount is None and AMOUNT_PATTERN.search(bold_text):
+            amount = AMOUNT_PATTERN.search(bold_text).group(0).strip()
+        elif startup_name is None:
+            startup_name = bold_text
+            website = _link_of(bold)
+
+    if amount is None:
+        amount_match = AMOUNT_PATTERN.search(text)
+        amount = amount_match.group(0).strip() if amount_match else None
+
+    return {
+        'text': text,
+        'emoji': emoji,
+        'startup_name': startup_name,
+        'amount_raised': amount,
+        'website': website,
+        'hq': parse_hq(text),
+    }
+
+def _link_of(bold):
+    """The href of a link wrapping, or inside, the bold startup name (plain attribute checks; `find_parent` is slow)."""
+    if bold.parent is not None and bold.parent.name == 'a':
+        return bold.parent.get('href')
+    for child in bold.descendants:
+        if child.name == 'a':
+            return child.get('href')
+    return None
+
+def is_deal_candidate(record):
+    """Filters out intros, sponsor blurbs and other fragments before they reach the LLM."""
+    if not record or not record.get('startup_name'):
+        return False
+    return bool(record.get('amount_raised') or DEAL_HINT_PATTERN.search(record['text']))
+
+def segment_deals(deals_heading):
+    """
+    Walks the "Deals of the Week" block and returns one record per deal element.
+
+    Returns:
+        list: Dicts with `text`, `emoji`, `startup_name` and `amount_raised` (taken from the
+              bold spans, or None when the element has none), `website` (the link on the
+              startup's name) and `hq` (from "a <place>-based ...").
+    """
+    if not deals_heading:
+        return []
+    records = (segment_element(element) for element in iter_deal_elements(deals_heading))
+    return [record for record in records if is_deal_candidate(record)]
+
+
+
+# --- RULE-BASED EXTRACTION ---
+
+def parse_hq(text):
+    """'Realta Fusion, a Madison, WI-based fusion developer, ...' -> 'Madison, WI' (None if not stated)."""
+    match = HQ_PATTERN.search(text)
+    return match.group('hq') if match else None
+
+def _split_investors(text):
+    return [name.strip() for name in INVESTOR_SPLIT_PATTERN.split(text) if name.strip()]
+
+def parse_deal_text(text):
+    """
+    Extracts the deal fields from CTVC's deal sentence format with regexes, without an LLM.
+    Also handles the "led by ... with participation from ..." phrasing of single-deal articles.
+
+    Returns:
+        dict: The same keys as the LLM extraction (`startup_name`, `amount_raised`,
+              `funding_stage`, `lead_investor`, `other_investors`), with None for anything not found.
+    """
+    text = _clean_text(LEADING_EMOJI_PATTERN.sub('', text))
+    name = text.split(',', 1)[0].strip() if ',' in text else None
+    amount_match = RAISED_PATTERN.search(text)
+    stage_match = STAGE_PATTERN.search(text)
+
+    investors = []
+    from_match = FROM_PATTERN.search(text)
+    if from_match:
+        investors = _split_investors(from_match.group('investors'))
+    else:
+        led_match = LED_BY_PATTERN.search(text)
+        if led_match:
+            investors.append((led_match.group('lead') or led_match.group('lead_subject')).strip())
+        participants_match = PARTICIPANTS_PATTERN.search(text)
+        if participants_match:
+            investors += _split_investors(participants_match.group('investors'))
+
+    return {
+        'startup_name': name,
+        'amount_raised': amount_match.group('amount') if amount_match else None,
+        'funding_stage': stage_match.group('stage') if stage_match else None,
+        'lead_investor': investors[0] if investors else None,
+        'other_investors': investors[1:],
+    }
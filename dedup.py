@@ -0,0 +1,252 @@
+# dedup.py
+# Cross-source deal deduplication: resolves the same round reported by several sources to one canonical deal.
+
+import re
+import math
+import datetime
+import unicodedata
+from difflib import SequenceMatcher
+
+import amounts
+from deal_record import Deal
+
+# --- NORMALIZATION ---
+
+NON_ALNUM_PATTERN = re.compile(r'[^a-z0-9 ]+')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+COMPANY_SUFFIXES = {'inc', 'incorporated', 'ltd', 'limited', 'llc', 'gmbh', 'corp', 'corporation', 'co',
+                    'sa', 'sas', 'ag', 'bv', 'plc', 'pte', 'oy', 'ab', 'srl', 'the'}
+
+def normalize_name(name):
+    """'⚡Realta Fusion, Inc.' -> 'realta fusion'. Used for blocking and fuzzy comparison."""
+    if not name:
+        return ''
+    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii').lower()
+    name = NON_ALNUM_PATTERN.sub(' ', name)
+    tokens = [token for token in WHITESPACE_PATTERN.split(name) if token and token not in COMPANY_SUFFIXES]
+    return ' '.join(tokens)
+
+def parse_amount(text):
+    """Amount in USD for blocking ('$23m' -> 23000000.0), or None if there is no number."""
+    value, currency = amounts.parse_amount(text)
+    return amounts.to_usd(value, currency) if value is not None else None
+
+def _parse_date(value):
+    """The report's date, or None when it is missing or unparseable (no time constraint then)."""
+    if isinstance(value, datetime.date):
+        return value
+    try:
+        return datetime.date.fromisoformat(str(value)[:10])
+    except (TypeError, ValueError):
+        return None
+
+
+# --- DEDUP ENGINE ---
+
+class DealDeduplicator:
+    """
+    Incremental entity-resolution index over canonical deals.
+
+    Deals are blocked on (first name token, time bucket) and, inside a block, on a log-scale
+    amount bucket, so a lookup only fuzzy-compares a handful of candidates regardless of how
+    many deals are indexed. A candidate matches when the normalized names are similar enough
+    and the amounts (when both are known) agree within `amount_tolerance`. A deal without a
+    usable date goes in a per-name undated block and is compared regardless of time.
+
+    Args:
+        window_days (int): Width of a time bucket. Neighbouring buckets are searched too, so
+                           two reports up to `window_days` apart are always compared.
+        name_threshold (float): Minimum SequenceMatcher ratio between normalized names.
+        amount_tolerance (float): Maximum relative difference between two known amounts.
+    """
+
+    AMOUNT_BUCKET_BASE = 1.5
+
+    def __init__(self, window_days=45, name_threshold=0.88, amount_tolerance=0.2):
+        self.window_days = window_days
+        self.name_threshold = name_threshold
+        self.amount_tolerance = amount_tolerance
+        self.deals = []      # canonical deals, indexed by canonical id
+        self._keys = []      # (normalized name, amount, date) per canonical id
+        self._blocks = {}    # (name block, time bucket or None if undated) -> {amount bucket -> [canonical ids]}
+        self._name_buckets = {}  # name block -> time buckets in use, for undated lookups
+        self.lookups = 0
+        self.merges = 0
+        self.removed = 0
+
+    def __len__(self):
+        return len(self.deals) - self.removed
+
+    @classmethod
+    def from_store(cls, store, **kwargs):
+        """Seeds the index with every deal already in a DealStore."""
+        deduplicator = cls(**kwargs)
+        for deal in store.iter_deals():
+            deduplicator._index(Deal.from_dict(deal))
+        return deduplicator
+
+    # --- Blocking ---
+
+    def _amount_bucket(self, amount):
+        if not amount:
+            return None
+        return int(math.log(amount, self.AMOUNT_BUCKET_BASE))
+
+    def _time_bucket(self, date):
+        return date.toordinal() // self.window_days if date else None
+
+    def _index(self, deal):
+        name = normalize_name(deal.get('startup_name'))
+        if not name:
+            return None
+        amount = deal.get('amount_usd') or parse_amount(deal.get('amount_raised'))
+        date = _parse_date(deal.get('date'))
+        canonical_id = len(self.deals)
+        self.deals.append(deal)
+        self._keys.append((name, amount, date))
+        name_block, time_bucket = name.split()[0], self._time_bucket(date)
+        self._name_buckets.setdefault(name_block, set()).add(time_bucket)
+        block = self._blocks.setdefault((name_block, time_bucket), {})
+        block.setdefault(self._amount_bucket(amount), []).append(canonical_id)
+        return canonical_id
+
+    def _time_buckets(self, name_block, date):
+        """Neighbouring buckets of `date` plus the undated one; for an undated lookup, every bucket of the name."""
+        if date is None:
+            return self._name_buckets.get(name_block, ())
+        bucket = self._time_bucket(date)
+        return (bucket - 1, bucket, bucket + 1, None)
+
+    def _candidates(self, name, amount, date):
+        name_block = name.split()[0]
+        amount_bucket = self._amount_bucket(amount)
+        for time_bucket in self._time_buckets(name_block, date):
+            block = self._blocks.get((name_block, time_bucket))
+            if not block:
+                continue
+            if amount_bucket is None:
+                for ids in block.values():
+                    yield from ids
+            else:
+                for key in (amount_bucket - 1, amount_bucket, amount_bucket + 1, None):
+                    yield from block.get(key, ())
+
+    def _matches(self, canonical_id, name, amount, date):
+        other_name, other_amount, other_date = self._keys[canonical_id]
+        if date and other_date and abs((other_date - date).days) > self.window_days:
+            return False
+        if amount and other_amount:
+            if abs(amount - other_amount) / max(amount, other_amount) > self.amount_tolerance:
+                return False
+        if name == other_name:
+            return True
+        return SequenceMatcher(None, name, other_name).ratio() >= self.name_threshold
+
+    # --- Public API ---
+
+    def find(self, startup_name, amount_raised=None, date=None, exclude_url=None):
+        """
+        Returns the canonical deal matching these fields, or None. Cheap enough to call with the
+        segmenter's bold-span hints before paying for an extraction. Deals already reported by
+        `exclude_url` are skipped, since one article never lists the same round twice.
+        """
+        self.lookups += 1
+        name = normalize_name(startup_name)
+        if not name:
+            return None
+        amount = parse_amount(amount_raised)
+        date = _parse_date(date)
+        for canonical_id in self._candidates(name, amount, date):
+            if self._matches(canonical_id, name, amount, date):
+                canonical = self.deals[canonical_id]
+                if exclude_url and any(source['url'] == exclude_url for source in _sources_of(canonical)):
+                    continue
+                return canonical
+        return None
+
+    def resolve(self, deal):
+        """
+        Adds a newly extracted deal to the index.
+
+        Returns:
+            tuple: (canonical deal, is_new). For a duplicate, the canonical deal has the new
+                   record's missing fields, investors and source merged into it; write it back
+                   to the store to update the existing row in place.
+        """
+        canonical = self.find(deal.get('startup_name'), deal.get('amount_raised'), deal.get('date'),
+                              exclude_url=deal.get('source_url'))
+        if canonical is None:
+            deal.setdefault('sources', _sources_of(deal))
+            self._index(deal)
+            return deal, True
+        merge_into(canonical, deal)
+        self.merges += 1
+        return canonical, False
+
+    def add(self, deal):
+        """Indexes a deal that is already stored under its own name (e.g. one corrected in place), without resolving it."""
+        deal.setdefault('sources', _sources_of(deal))
+        return self._index(deal)
+
+    def remove(self, startup_name, source_url):
+        """
+        Drops the indexed deals stored under `startup_name` from `source_url` (e.g. before a rename),
+        so lookups stop matching them. Their canonical id slots stay empty.
+
+        Returns:
+            int: Number of deals removed.
+        """
+        name = normalize_name(startup_name)
+        if not name:
+            return 0
+        name_block, removed = name.split()[0], 0
+        for time_bucket in self._name_buckets.get(name_block, ()):
+            for ids in self._blocks.get((name_block, time_bucket), {}).values():
+                for canonical_id in list(ids):
+                    if self._keys[canonical_id][0] == name and self.deals[canonical_id].get('source_url') == source_url:
+                        ids.remove(canonical_id)
+                        self.deals[canonical_id] = None
+                        removed += 1
+        self.removed += removed
+        return removed
+
+    def stats(self):
+        return {'canonical_deals': len(self), 'blocks': len(self._blocks),
+                'lookups': self.lookups, 'merges': self.merges}
+
+
+# --- MERGING ---
+
+def _is_missing(value):
+    return value in (None, '', 'Not Specified', 'null') or value == []
+
+def _sources_of(deal):
+    if deal.get('sources'):
+        return list(deal['sources'])
+    if deal.get('source_url'):
+        return [{'url': deal['source_url'], 'site': deal.get('source_site')}]
+    return []
+
+def add_source(canonical, source_url, source_site):
+    """Records another article reporting the canonical deal (no-op if already recorded)."""
+    sources = canonical.setdefault('sources', _sources_of(canonical))
+    if source_url and all(source['url'] != source_url for source in sources):
+        sources.append({'url': source_url, 'site': source_site})
+
+def merge_into(canonical, deal):
+    """Fills the canonical deal's gaps from a duplicate report and records its provenance."""
+    for key in ('amount_raised', 'funding_stage', 'lead_investor', 'subsector', 'website', 'hq', 'sector'):
+        if _is_missing(canonical.get(key)) and not _is_missing(deal.get(key)):
+            canonical[key] = deal[key]
+    investors = canonical.get('other_investors')
+    investors = list(investors) if isinstance(investors, list) else []
+    incoming = deal.get('other_investors')
+    if isinstance(incoming, list):
+        for investor in incoming:
+            if investor not in investors and investor != canonical.get('lead_investor'):
+                investors.append(investor)
+    if investors:
+        canonical['other_investors'] = investors
+    for source in _sources_of(deal):
+        add_source(canonical, source['url'], source.get('site'))
+    return canonical
@@ -0,0 +1,263 @@
+# enrichment.py
+# Optional enrichment stage: classifies each startup from its own homepage (website, HQ, climate sector), concurrently and cached per domain.
+
+import re
+import json
+import sqlite3
+import datetime
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+from bs4 import BeautifulSoup
+
+import storage
+import retry
+import tracing
+import prompts
+
+NOT_CLIMATE = 'Not Climate Tech'
+PAGE_TEXT_CHARS = 1500        # homepage text sent to the LLM, as in the old is_climate_tech_startup
+KEYWORD_MIN_HITS = 3          # a sector this clearly ahead of the rest is assigned without an LLM call
+FAILURE_TTL_DAYS = 1          # unreachable sites are retried the next day, not after the full TTL
+
+# Keyword pre-check per sector; matched as whole words against the lowercased homepage text.
+SECTOR_KEYWORDS = {
+    'Clean Power': ('solar', 'wind', 'geothermal', 'fusion', 'nuclear', 'hydro', 'renewable', 'grid',
+                    'battery', 'batteries', 'energy storage', 'power plant', 'transmission', 'inverter'),
+    'Transportation': ('electric vehicle', 'ev charging', 'charging', 'evtol', 'aviation', 'fleet',
+                       'sustainable aviation fuel', 'e-bike', 'shipping', 'mobility', 'hydrogen truck'),
+    'Carbon': ('carbon capture', 'carbon removal', 'direct air capture', 'sequestration', 'co2',
+               'carbon credits', 'biochar', 'enhanced weathering', 'offsets'),
+    'Buildings': ('heat pump', 'hvac', 'insulation', 'building efficiency', 'smart thermostat',
+                  'low-carbon concrete', 'retrofit', 'embodied carbon'),
+    'Food & Land Use': ('agriculture', 'regenerative', 'farm', 'farmers', 'alternative protein',
+                        'fertilizer', 'soil', 'crop', 'forestry', 'food waste', 'aquaculture'),
+    'Industry': ('green hydrogen', 'electrolyzer', 'green steel', 'decarbonization', 'recycling',
+                 'circular economy', 'critical minerals', 'industrial heat', 'bioplastics'),
+    'Climate Management': ('climate risk', 'emissions tracking', 'carbon accounting', 'wildfire',
+                           'flood', 'climate adaptation', 'methane detection', 'esg reporting'),
+}
+SECTORS = tuple(SECTOR_KEYWORDS)
+KEYWORD_PATTERNS = {sector: re.compile(r'\b(?:' + '|'.join(re.escape(word) for word in words) + r')\b')
+                    for sector, words in SECTOR_KEYWORDS.items()}
+
+CLIMATE_SITE = prompts.register(prompts.PromptTemplate('climate_site', 1, system=f"""You are a climate tech industry analyst. Based on the text from a company's website, decide whether it is a climate tech company.
+
+Climate tech sectors: {', '.join(SECTORS)}.
+
+Respond with a JSON object: {{"climate_tech": true or false, "sector": one of the sectors above or null, "hq": "City, Country" if the text states where the company is based, else null}}.""",
+    user="""**Actual Website Text:** "{text}"
+JSON Output:"""))
+
+# Links on a deal line or in an article that point at coverage of the company rather than the company itself.
+NON_COMPANY_DOMAINS = ('techcrunch.com', 'businesswire.com', 'prnewswire.com', 'globenewswire.com',
+                       'linkedin.com', 'twitter.com', 'x.com', 'ctvc.co', 'medium.com', 'bloomberg.com',
+                       'reuters.com', 'axios.com', 'canarymedia.com', 'cleantechnica.com')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS domain_cache (
+    domain TEXT PRIMARY KEY,
+    website TEXT,
+    hq TEXT,
+    sector TEXT,          -- NULL when the site could not be fetched
+    checked TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+# --- HELPERS ---
+
+def company_domain(url):
+    """'https://www.realtafusion.com/about' -> 'realtafusion.com', or None for news and social links."""
+    if not url:
+        return None
+    host = (urlparse(url).hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if not host or any(host == domain or host.endswith('.' + domain) for domain in NON_COMPANY_DOMAINS):
+        return None
+    return host
+
+def keyword_sector(text):
+    """
+    The cheap pre-check before any LLM call.
+
+    Returns:
+        tuple: (sector, decided). `decided` is True when the keywords settle it: one sector with
+               at least KEYWORD_MIN_HITS hits and twice the runner-up, or NOT_CLIMATE when no
+               sector matches at all. Otherwise (best guess or None, False) and the LLM decides.
+    """
+    text = text.lower()
+    hits = sorted(((len(pattern.findall(text)), sector) for sector, pattern in KEYWORD_PATTERNS.items()), reverse=True)
+    (top, sector), (second, _) = hits[0], hits[1]
+    if top == 0:
+        return NOT_CLIMATE, True
+    if top >= KEYWORD_MIN_HITS and top >= 2 * second:
+        return sector, True
+    return sector, False
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+# --- ENRICHER ---
+
+class Enricher:
+    """
+    Looks up each deal's startup homepage on a bounded thread pool and fills in `website`,
+    `hq` and `sector`.
+
+    Results are cached per domain in SQLite (next to the deals) for `ttl_days`, so a company
+    that shows up again costs nothing; concurrent deals for the same domain share one lookup.
+    Workers only fetch and classify. The cache and the deals are touched on the calling thread,
+    in `submit` and `collect`.
+
+    Args:
+        chat_completion (callable): `main.chat_completion`, or anything with the same signature.
+        model (str): Model for the sectors the keyword pre-check cannot settle.
+        max_workers (int): Homepages fetched at once (each host is still paced by retry.for_host).
+    """
+
+    def __init__(self, chat_completion, model, path=storage.DB_FILE, max_workers=8, ttl_days=30, busy_timeout=30.0):
+        self.chat_completion = chat_completion
+        self.model = model
+        self.ttl = datetime.timedelta(days=ttl_days)
+        self.conn = sqlite3.connect(path, timeout=busy_timeout)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='enrich')
+        self.pending = {}        # domain -> (future, [deals waiting on it])
+        self.counts = {'submitted': 0, 'cache_hits': 0, 'fetched': 0, 'keyword_decided': 0,
+                       'llm_calls': 0, 'failed': 0, 'no_website': 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        self.conn.close()
+
+    # --- Cache ---
+
+    def _cached(self, domain):
+        row = self.conn.execute("SELECT website, hq, sector, checked FROM domain_cache WHERE domain = ?",
+                                (domain,)).fetchone()
+        if not row:
+            return None
+        website, hq, sector, checked = row
+        ttl = self.ttl if sector else datetime.timedelta(days=FAILURE_TTL_DAYS)
+        if _now() - datetime.datetime.fromisoformat(checked) > ttl:
+            return None
+        return {'website': website, 'hq': hq, 'sector': sector}
+
+    def _store(self, domain, result):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO domain_cache (domain, website, hq, sector, checked) VALUES (?, ?, ?, ?, ?)",
+                (domain, result['website'], result['hq'], result['sector'], _now().isoformat(timespec='seconds')))
+
+    # --- Worker ---
+
+    def _lookup(self, website):
+        """Runs on a worker thread: fetch the homepage, keyword pre-check, then the LLM if still undecided."""
+        homepage = f"{urlparse(website).scheme or 'https'}://{urlparse(website).netloc}/"
+        result = {'website': homepage, 'hq': None, 'sector': None}
+        with tracing.span("enrich", url=homepage):
+            try:
+                response = retry.get(homepage, timeout=10)
+                soup = BeautifulSoup(response.content, 'lxml')
+                text = (soup.body or soup).get_text(separator=' ', strip=True)[:PAGE_TEXT_CHARS]
+            except Exception as e:
+                print(f"   -> 🔴 Enrichment could not fetch {homepage}: {e.__class__.__name__}")
+                return result, 'failed'
+            sector, decided = keyword_sector(text)
+            if decided:
+                result['sector'] = sector
+                return result, 'keyword_decided'
+            answer = self._classify(text)
+            if answer is None:
+                result['sector'] = sector  # the keyword best guess beats nothing
+                return result, 'llm_calls'
+            result['sector'] = answer.get('sector') if answer.get('climate_tech') else NOT_CLIMATE
+            result['hq'] = answer.get('hq')
+            return result, 'llm_calls'
+
+    def _classify(self, text):
+        try:
+            with tracing.span("llm_request", model=self.model):
+                response = self.chat_completion(**CLIMATE_SITE.request(self.model, text=text), temperature=0)
+            answer = json.loads(response.choices[0].message.content)
+        except Exception as e:
+            print(f"   -> 🔴 ERROR during enrichment classification: {e}")
+            return None
+        if answer.get('sector') not in SECTORS:
+            answer['sector'] = None
+        return answer
+
+    # --- Public API ---
+
+    def submit(self, deal):
+        """
+        Queues a deal for enrichment. Cache hits are applied immediately and need no `collect`.
+        Deals without a company website (or with only a news link) are left as they are.
+        """
+        domain = company_domain(deal.get('website'))
+        if not domain:
+            self.counts['no_website'] += 1
+            return
+        self.counts['submitted'] += 1
+        if domain in self.pending:
+            self.pending[domain][1].append(deal)
+            return
+        cached = self._cached(domain)
+        if cached is not None:
+            self.counts['cache_hits'] += 1
+            _apply(deal, cached)
+            return
+        self.pending[domain] = (self.pool.submit(self._lookup, deal['website']), [deal])
+
+    def collect(self, wait_all=False):
+        """
+        Applies finished lookups to their deals and caches them.
+
+        Args:
+            wait_all (bool): Block until every queued lookup is done (end of run).
+
+        Returns:
+            list: The deals that were updated, to be written to the sink again.
+        """
+        if not self.pending:
+            return []
+        futures = {future: domain for domain, (future, _) in self.pending.items()}
+        if wait_all:
+            done = wait(futures).done
+        else:
+            done = [future for future in futures if future.done()]
+        updated = []
+        for future in done:
+            domain = futures[future]
+            _, deals = self.pending.pop(domain)
+            result, outcome = future.result()
+            self.counts['fetched'] += 1
+            self.counts[outcome] += 1
+            self._store(domain, result)
+            for deal in deals:
+                if _apply(deal, result):
+                    updated.append(deal)
+        return updated
+
+    def stats(self):
+        return {**self.counts, 'pending': len(self.pending), 'cached_domains':
+                self.conn.execute("SELECT COUNT(*) FROM domain_cache").fetchone()[0]}
+
+def _apply(deal, result):
+    """Fills the deal's empty enrichment fields from a lookup result; True if anything changed."""
+    changed = False
+    for field in ('website', 'hq', 'sector'):
+        if result.get(field) and not deal.get(field):
+            deal[field] = result[field]
+            changed = True
+    return changed
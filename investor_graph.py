@@ -0,0 +1,210 @@
+# investor_graph.py
+# Investor co-investment graph over the deal store, maintained incrementally by SQLite triggers.
+
+# --- GRAPH SCHEMA ---
+# Investors are interned to integer ids, and each co-investment edge is a (a, b) pair of ids in a
+# WITHOUT ROWID table (stored in both directions so neighbour lookups are a single index range).
+# Triggers on `deals` touch only the investors of the inserted/updated/deleted deal.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS investors (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE COLLATE NOCASE,
+    deal_count INTEGER NOT NULL DEFAULT 0,
+    lead_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS coinvest_edges (
+    a INTEGER NOT NULL,
+    b INTEGER NOT NULL,
+    deal_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (a, b)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS lead_rounds (
+    stage TEXT NOT NULL COLLATE NOCASE,
+    sector TEXT NOT NULL COLLATE NOCASE,
+    investor_id INTEGER NOT NULL,
+    deal_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (stage, sector, investor_id)
+) WITHOUT ROWID;
+"""
+
+# Distinct investor names on one deal row (lead first, then the other_investors JSON list).
+_NAMES = """(SELECT {row}.lead_investor WHERE {row}.lead_investor IS NOT NULL
+            UNION SELECT value FROM json_each(COALESCE({row}.other_investors, '[]')) WHERE value IS NOT NULL)"""
+_STAGE = "COALESCE({row}.funding_stage, 'Not Specified')"
+_SECTOR = "COALESCE({row}.sector, 'Not Specified')"  # the climate sector (enrichment.py), not the listing subsector
+
+def _apply(row, sign):
+    """Trigger statements that add (sign=+1) or remove (sign=-1) one deal's contribution."""
+    names = _NAMES.format(row=row)
+    statements = []
+    if sign > 0:
+        statements.append(f"INSERT INTO investors (name) SELECT * FROM {names} WHERE true ON CONFLICT (name) DO NOTHING;")
+    statements += [
+        f"""UPDATE investors SET deal_count = deal_count + ({sign}),
+                                 lead_count = lead_count + ({sign}) * (name IS {row}.lead_investor)
+            WHERE name IN {names};""",
+        f"""INSERT INTO coinvest_edges (a, b, deal_count)
+            SELECT x.id, y.id, {sign} FROM investors AS x, investors AS y
+            WHERE x.name IN {names} AND y.name IN {names} AND x.id != y.id
+            ON CONFLICT (a, b) DO UPDATE SET deal_count = deal_count + excluded.deal_count;""",
+        f"""INSERT INTO lead_rounds (stage, sector, investor_id, deal_count)
+            SELECT {_STAGE.format(row=row)}, {_SECTOR.format(row=row)}, id, {sign} FROM investors
+            WHERE name = {row}.lead_investor
+            ON CONFLICT (stage, sector, investor_id) DO UPDATE SET deal_count = deal_count + excluded.deal_count;""",
+    ]
+    return "\n".join(statements)
+
+TRIGGERS = f"""
+CREATE TRIGGER IF NOT EXISTS investor_graph_insert AFTER INSERT ON deals BEGIN
+{_apply('NEW', 1)}
+END;
+CREATE TRIGGER IF NOT EXISTS investor_graph_delete AFTER DELETE ON deals BEGIN
+{_apply('OLD', -1)}
+END;
+CREATE TRIGGER IF NOT EXISTS investor_graph_update
+AFTER UPDATE OF lead_investor, other_investors, funding_stage, sector ON deals BEGIN
+{_apply('OLD', -1)}
+{_apply('NEW', 1)}
+END;
+"""
+
+def install_graph(conn):
+    """Creates the graph tables and triggers if missing, back-filling them once from `deals`."""
+    existing = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'coinvest_edges'").fetchone()
+    # Graphs built before lead_rounds was keyed by `sector` still have subsector triggers: replace and rebuild.
+    old_trigger = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'investor_graph_update'").fetchone()
+    stale = old_trigger is not None and 'subsector' in old_trigger[0]
+    with conn:
+        if stale:
+            for trigger in ('insert', 'delete', 'update'):
+                conn.execute(f"DROP TRIGGER IF EXISTS investor_graph_{trigger}")
+        conn.executescript(SCHEMA)
+        conn.executescript(TRIGGERS)
+    if not existing or stale:
+        rebuild_graph(conn)
+
+def rebuild_graph(conn):
+    """Set-based full rebuild; only for first install or repair, since the triggers keep it current."""
+    with conn:
+        conn.executescript("""
+            DELETE FROM coinvest_edges; DELETE FROM lead_rounds; DELETE FROM investors;
+            CREATE TEMP TABLE deal_investors AS
+                SELECT id AS deal_id, lead_investor AS name FROM deals WHERE lead_investor IS NOT NULL
+                UNION SELECT deals.id, value FROM deals, json_each(COALESCE(deals.other_investors, '[]'))
+                      WHERE value IS NOT NULL;
+            INSERT OR IGNORE INTO investors (name) SELECT name FROM deal_investors;
+            UPDATE investors SET
+                deal_count = (SELECT COUNT(DISTINCT deal_id) FROM deal_investors WHERE deal_investors.name = investors.name COLLATE NOCASE),
+                lead_count = (SELECT COUNT(*) FROM deals WHERE investors.name = deals.lead_investor);
+            INSERT INTO coinvest_edges (a, b, deal_count)
+                SELECT x.id, y.id, COUNT(DISTINCT p.deal_id)
+                FROM deal_investors AS p
+                JOIN deal_investors AS q ON q.deal_id = p.deal_id
+                JOIN investors AS x ON x.name = p.name
+                JOIN investors AS y ON y.name = q.name
+                WHERE x.id != y.id GROUP BY 1, 2;
+            INSERT INTO lead_rounds (stage, sector, investor_id, deal_count)
+                SELECT COALESCE(funding_stage, 'Not Specified'), COALESCE(sector, 'Not Specified'), investors.id, COUNT(*)
+                FROM deals JOIN investors ON investors.name = deals.lead_investor
+                GROUP BY 1, 2, 3;
+            DROP TABLE deal_investors;
+        """)
+
+
+# --- QUERY API ---
+
+class InvestorGraph:
+    """Read API over the graph tables of a DealStore (or a sqlite3 connection)."""
+
+    def __init__(self, source):
+        self.conn = getattr(source, 'conn', source)
+
+    def _id(self, name):
+        row = self.conn.execute("SELECT id FROM investors WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def investor(self, name):
+        """(deal_count, lead_count, degree) for one investor, or None if unknown."""
+        row = self.conn.execute(
+            """SELECT deal_count, lead_count,
+                      (SELECT COUNT(*) FROM coinvest_edges WHERE a = investors.id AND deal_count > 0)
+               FROM investors WHERE name = ?""", (name,)).fetchone()
+        return tuple(row) if row else None
+
+    def degree(self, name):
+        info = self.investor(name)
+        return info[2] if info else 0
+
+    def top_coinvestors(self, name, limit=10):
+        """Investors that appear on the most deals together with `name`: [(investor, shared_deals)]."""
+        investor_id = self._id(name)
+        if investor_id is None:
+            return []
+        rows = self.conn.execute(
+            """SELECT investors.name, coinvest_edges.deal_count FROM coinvest_edges
+               JOIN investors ON investors.id = coinvest_edges.b
+               WHERE coinvest_edges.a = ? AND coinvest_edges.deal_count > 0
+               ORDER BY coinvest_edges.deal_count DESC, investors.deal_count DESC LIMIT ?""",
+            (investor_id, limit))
+        return [tuple(row) for row in rows]
+
+    def coinvestment_count(self, name_a, name_b):
+        row = self.conn.execute(
+            """SELECT deal_count FROM coinvest_edges
+               WHERE a = (SELECT id FROM investors WHERE name = ?) AND b = (SELECT id FROM investors WHERE name = ?)""",
+            (name_a, name_b)).fetchone()
+        return row[0] if row else 0
+
+    def lead_investors(self, stage, sector=None, limit=10):
+        """Funds that led rounds of `stage` (optionally only in `sector`): [(investor, rounds_led)]."""
+        sql = """SELECT investors.name, SUM(lead_rounds.deal_count) AS led FROM lead_rounds
+                 JOIN investors ON investors.id = lead_rounds.investor_id
+                 WHERE lead_rounds.stage = ? {sector_filter}
+                 GROUP BY investors.id HAVING led > 0 ORDER BY led DESC LIMIT ?"""
+        if sector:
+            rows = self.conn.execute(sql.format(sector_filter="AND lead_rounds.sector = ?"), (stage, sector, limit))
+        else:
+            rows = self.conn.execute(sql.format(sector_filter=""), (stage, limit))
+        return [tuple(row) for row in rows]
+
+    def most_connected(self, limit=10):
+        rows = self.conn.execute(
+            """SELECT investors.name, COUNT(*) AS degree FROM coinvest_edges
+               JOIN investors ON investors.id = coinvest_edges.a
+               WHERE coinvest_edges.deal_count > 0 GROUP BY coinvest_edges.a ORDER BY degree DESC LIMIT ?""",
+            (limit,))
+        return [tuple(row) for row in rows]
+
+
+if __name__ == "__main__":
+    import argparse
+    import storage
+
+    parser = argparse.ArgumentParser(description="Query the investor co-investment graph.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    coinvestors = subparsers.add_parser("coinvestors", help="who co-invests most with an investor")
+    coinvestors.add_argument("investor")
+    leads = subparsers.add_parser("leads", help="which funds led rounds of a stage (and sector)")
+    leads.add_argument("stage")
+    leads.add_argument("--sector")
+    subparsers.add_parser("connected", help="investors with the most distinct co-investors")
+    subparsers.add_parser("rebuild", help="recompute the graph from scratch")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--db", default=storage.DB_FILE)
+    args = parser.parse_args()
+
+    with storage.open_store(args.db) as store:
+        graph = InvestorGraph(store)
+        if args.command == "coinvestors":
+            rows = graph.top_coinvestors(args.investor, args.limit)
+        elif args.command == "leads":
+            rows = graph.lead_investors(args.stage, args.sector, args.limit)
+        elif args.command == "connected":
+            rows = graph.most_connected(args.limit)
+        else:
+            rebuild_graph(store.conn)
+            rows = []
+            print("✅ Investor graph rebuilt.")
+        for name, count in rows:
+            print(f"{name[:60]:<60} {count:>6}")
@@ -0,0 +1,198 @@
+# llm_backends.py
+# Where chat completions run: an OpenAI-compatible API (OpenRouter by default) or a local llama.cpp server on this machine's CPU.
+
+import os
+import time
+import shutil
+import socket
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from openai import OpenAI
+
+import retry
+import prompts
+import llm_costs
+
+LOCAL_MODEL_PREFIX = 'local/'   # model names reported by the local backend; llm_costs prices them at zero
+LLAMA_SERVER_BIN = os.environ.get("LLAMA_SERVER", "llama-server")
+
+
+class OpenAIBackend:
+    """
+    Chat completions through any OpenAI-compatible endpoint (OpenRouter, OpenAI, vLLM, llama.cpp...).
+
+    Args:
+        client: An `openai.OpenAI` client, or anything with `chat.completions.create`.
+        policy (retry.RetryPolicy): Retries and pacing for the calls (the shared `retry.llm` by default).
+        max_concurrency (int): Requests `complete_many` keeps in flight at once.
+        model (str): If set, replaces the `model` of every request (for servers that host a single model).
+    """
+
+    name = 'openai'
+
+    def __init__(self, client, policy=None, max_concurrency=4, model=None):
+        self.client = client
+        self.policy = policy or retry.llm
+        self.max_concurrency = max_concurrency
+        self.model = model
+        self._lock = threading.Lock()
+        self._usage = {'calls': 0, 'prompt_tokens': 0, 'cached_tokens': 0, 'completion_tokens': 0, 'cost_usd': 0.0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+    def complete(self, **kwargs):
+        """
+        `chat.completions.create(**kwargs)` under the backend's retry policy; returns the response object.
+        A `prompt_template` (see prompts.PromptTemplate.request) is not sent; the call's usage is credited to it.
+        """
+        template = kwargs.pop('prompt_template', None)
+        if self.model:
+            kwargs['model'] = self.model
+        response = self.policy.call(self.client.chat.completions.create, **kwargs)
+        usage = getattr(response, 'usage', None)
+        prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+        cached_tokens = llm_costs.cached_tokens(usage)
+        completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+        with self._lock:
+            self._usage['calls'] += 1
+            self._usage['prompt_tokens'] += prompt_tokens
+            self._usage['cached_tokens'] += cached_tokens
+            self._usage['completion_tokens'] += completion_tokens
+            self._usage['cost_usd'] += llm_costs.estimate_cost(kwargs.get('model'), prompt_tokens, completion_tokens,
+                                                               cached_tokens) or 0.0
+        if template is not None:
+            prompts.record(template, prompt_tokens, cached_tokens, completion_tokens)
+        return response
+
+    def usage(self):
+        """Successful calls, tokens (`cached_tokens`: prompt tokens read from the provider's cache) and estimated USD (models without a listed price count as free) so far."""
+        with self._lock:
+            return dict(self._usage)
+
+    def complete_many(self, requests_kwargs):
+        """
+        Runs several completions concurrently, up to `max_concurrency` at a time.
+
+        Returns:
+            list: One response per request, in order, or the exception that request raised.
+        """
+        def attempt(kwargs):
+            try:
+                return self.complete(**kwargs)
+            except Exception as e:
+                return e
+
+        if len(requests_kwargs) <= 1 or self.max_concurrency <= 1:
+            return [attempt(kwargs) for kwargs in requests_kwargs]
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(requests_kwargs))) as pool:
+            return list(pool.map(attempt, requests_kwargs))
+
+
+def openrouter(api_key=None, referer="https://github.com/PeteM573/APITest2", title="Climate Tech Funding Tracker"):
+    """The default backend: OpenRouter, with retries and pacing left to `retry.llm`."""
+    client = OpenAI(
+        base_url="https://openrouter.ai/api/v1",
+        api_key=api_key or os.environ.get("OPENAI_API_KEY"),
+        default_headers={"HTTP-Referer": referer, "X-Title": title},
+        max_retries=0,  # retries go through retry.llm, which also paces calls to the provider's limit
+    )
+    return OpenAIBackend(client)
+
+
+class LlamaCppBackend(OpenAIBackend):
+    """
+    Runs a quantized GGUF model (e.g. a Q4_K_M Llama 3.2 3B Instruct) on local CPU cores with
+    llama.cpp's `llama-server`, started as a child process and spoken to over its OpenAI-compatible API.
+
+    The server keeps `parallel` request slots and continuous batching: the requests that
+    `complete_many` sends together are decoded in one batch, so a newsletter's deal lines cost
+    about as much wall time as a few of them. No network and no per-token cost.
+
+    Args:
+        model_path (str): The .gguf file.
+        threads (int): CPU threads for inference (default: all cores).
+        parallel (int): Request slots, i.e. the batch size (the context is split between them).
+        ctx_size (int): Total context tokens across all slots.
+        server_bin (str): The llama-server executable (default $LLAMA_SERVER or `llama-server` on PATH).
+    """
+
+    name = 'llama.cpp'
+
+    def __init__(self, model_path, threads=None, parallel=4, ctx_size=16384, server_bin=LLAMA_SERVER_BIN,
+                 startup_timeout=180.0):
+        if not os.path.isfile(model_path):
+            raise FileNotFoundError(f"GGUF model not found: {model_path}")
+        executable = shutil.which(server_bin)
+        if executable is None:
+            raise FileNotFoundError(f"'{server_bin}' not found; install llama.cpp or set LLAMA_SERVER")
+        port = _free_port()
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.process = subprocess.Popen(
+            [executable, '--model', model_path, '--host', '127.0.0.1', '--port', str(port),
+             '--threads', str(threads or os.cpu_count()), '--parallel', str(parallel),
+             '--ctx-size', str(ctx_size), '--cont-batching'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        print(f"🦙 Starting llama.cpp server for {os.path.basename(model_path)} on {self.base_url}...")
+        self._wait_until_ready(startup_timeout)
+        client = OpenAI(base_url=f"{self.base_url}/v1", api_key="local", max_retries=0, timeout=600.0)
+        # Local calls need no pacing, only a retry if a slot is momentarily busy.
+        policy = retry.RetryPolicy('llama.cpp', max_attempts=3, base_delay=0.2,
+                                   limiter=retry.RateLimiter(rate=float('inf'), max_rate=float('inf')))
+        model = LOCAL_MODEL_PREFIX + os.path.splitext(os.path.basename(model_path))[0]
+        super().__init__(client, policy=policy, max_concurrency=parallel, model=model)
+
+    def _wait_until_ready(self, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"llama-server exited with status {self.process.returncode}")
+            try:
+                if requests.get(f"{self.base_url}/health", timeout=2).status_code == 200:
+                    print("   -> ✅ Model loaded.")
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.5)
+        self.close()
+        raise TimeoutError(f"llama-server did not become ready within {timeout:.0f}s")
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+def add_arguments(parser):
+    """The --backend and --local-* flags shared by the command-line entry points."""
+    parser.add_argument("--backend", choices=["openrouter", "llama.cpp"], default="openrouter",
+                        help="where LLM calls run: the OpenRouter API, or a local GGUF model on this machine's CPU")
+    parser.add_argument("--local-model", default=os.environ.get("LLAMA_MODEL"),
+                        help="GGUF model file for --backend llama.cpp (default $LLAMA_MODEL)")
+    parser.add_argument("--local-threads", type=int, help="CPU threads for the local model (default: all cores)")
+    parser.add_argument("--local-parallel", type=int, default=4,
+                        help="requests the local model decodes as one batch")
+
+def from_args(parser, args):
+    """The backend the flags of `add_arguments` ask for, or None for the default OpenRouter one."""
+    if args.backend != "llama.cpp":
+        return None
+    if not args.local_model:
+        parser.error("--backend llama.cpp needs --local-model (or $LLAMA_MODEL)")
+    return LlamaCppBackend(args.local_model, threads=args.local_threads, parallel=args.local_parallel)
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
@@ -0,0 +1,41 @@
+# llm_costs.py
+# Per-model token prices and cost estimates for the OpenRouter models the pipeline can call.
+
+# USD per 1M tokens as (prompt, completion), from openrouter.ai/models. Prices change; check before relying on them.
+MODEL_PRICES = {
+    'mistralai/mistral-7b-instruct': (0.028, 0.054),
+    'meta-llama/llama-3-8b-instruct': (0.03, 0.06),
+    'meta-llama/llama-3.1-8b-instruct': (0.02, 0.03),
+    'meta-llama/llama-3.1-70b-instruct': (0.10, 0.28),
+    'openai/gpt-4o-mini': (0.15, 0.60),
+    'anthropic/claude-3-haiku': (0.25, 1.25),
+}
+
+# Share of the prompt price charged for prompt tokens the provider served from its prompt cache.
+CACHED_PROMPT_FACTORS = {'openai/': 0.5, 'anthropic/': 0.1, 'google/': 0.25}
+
+def cached_tokens(usage):
+    """Prompt tokens of a response's `usage` that were read from the provider's prompt cache (0 if not reported)."""
+    details = getattr(usage, 'prompt_tokens_details', None)
+    if isinstance(details, dict):
+        return details.get('cached_tokens') or 0
+    return getattr(details, 'cached_tokens', 0) or 0
+
+def estimate_cost(model, prompt_tokens, completion_tokens, cached_prompt_tokens=0):
+    """
+    Returns the USD cost of one call, or None if the model has no listed price.
+
+    Args:
+        model (str): OpenRouter model id, e.g. 'meta-llama/llama-3-8b-instruct'.
+        cached_prompt_tokens (int): Part of `prompt_tokens` served from the prompt cache, billed at a discount.
+    """
+    if model and model.startswith('local/'):  # llm_backends.LlamaCppBackend: our own cores
+        return 0.0
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return None
+    prompt_price, completion_price = prices
+    if cached_prompt_tokens:
+        factor = next((factor for prefix, factor in CACHED_PROMPT_FACTORS.items() if model.startswith(prefix)), 1.0)
+        prompt_tokens -= cached_prompt_tokens * (1 - factor)
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1e6
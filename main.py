@@ -2,24 +2,32 @@
 
 import os
 import json
-import csv
-import time
-import re
 from dotenv import load_dotenv
-from openai import OpenAI
 import sources
+import storage
+import sinks
+import dedup
+import url_index
+import near_dup
+import content_hashes
+import enrichment
+import scheduler
+import prefetch
+import tracing
+import profiling
+import retry
+import llm_backends
+import prompts
+from deal_record import Deal
 
 load_dotenv()
 
 # --- CONFIGURATION ---
-client = OpenAI(
-  base_url="https://openrouter.ai/api/v1",
-  api_key=os.environ.get("OPENAI_API_KEY"),
-  default_headers={
-    "HTTP-Referer": "https://github.com/PeteM573/APITest2",
-    "X-Title": "Climate Tech Funding Tracker",
-  },
-)
+# Every AI function goes through this backend; `--backend llama.cpp` swaps in a local model (see llm_backends.py).
+backend = llm_backends.openrouter()
+
+CLASSIFICATION_MODEL = "mistralai/mistral-7b-instruct"
+EXTRACTION_MODEL = "meta-llama/llama-3-8b-instruct"
 
 # --- SOURCE HANDLERS (Enable all sources for production) ---
 SOURCE_HANDLERS = {
@@ -33,6 +41,7 @@ SOURCE_HANDLERS = {
     #     "url": "https://cleantechnica.com/?s=startup",
     #     "crawl_func": sources.crawl_cleantechnica_links,
     #     "scrape_func": sources.scrape_cleantechnica_article,
+    #     "uses_browser": True,  # Selenium; the prefetcher's browser budget applies
     #     "source_name": "CleanTechnica"
     # },
     "CTVC": {
@@ -45,19 +54,19 @@ SOURCE_HANDLERS = {
 
 # --- AI & UTILITY FUNCTIONS ---
 
-def classify_article_type(title, content_snippet):
+def chat_completion(**kwargs):
+    """One chat completion on the current `backend` (OpenRouter under retry.llm by default)."""
+    return backend.complete(**kwargs)
+
+@tracing.traced("classify")
+def classify_article_type(title, content_snippet, model=CLASSIFICATION_MODEL):
     # This is still needed for broad sources like CleanTechnica
     # ... (code is unchanged)
     print("🤖 AI Step 1: Classifying article type...")
-    prompt = f"""You are an expert financial news analyst. Your SOLE task is to classify an article's purpose based on its title. Pay close attention to financial keywords.
-**Keywords for STARTUP_FUNDING_ROUND:** raises, funding, secures, investment, round, closes, backed by, financing.
-**Categories:** STARTUP_FUNDING_ROUND, FUND_ANNOUNCEMENT, GENERAL_NEWS
-Analyze the title below and respond with ONLY the category name.
-**Title:** "{title}"
-**Category:**"""
-    messages = [{"role": "user", "content": prompt}]
+    request = prompts.ARTICLE_TYPE.request(model, json_output=False, title=title)
     try:
-        response = client.chat.completions.create(model="mistralai/mistral-7b-instruct",messages=messages,temperature=0,max_tokens=20)
+        with tracing.span("llm_request", model=model):
+            response = chat_completion(**request, temperature=0, max_tokens=20)
         classification = response.choices[0].message.content.strip().replace("`", "")
         if not any(cat in classification for cat in ["STARTUP_FUNDING_ROUND", "FUND_ANNOUNCEMENT", "GENERAL_NEWS"]):
              classification = "GENERAL_NEWS"
@@ -68,206 +77,392 @@ Analyze the title below and respond with ONLY the category name.
         return "GENERAL_NEWS"
 
 
-def extract_funding_data(content):
+@tracing.traced("extract")
+def extract_funding_data(content, model=EXTRACTION_MODEL):
     # This is the generic extractor for single-deal articles
     # ... (code is unchanged)
     print("🤖 AI Step 2: Extracting data for VC Associate persona...")
-    prompt = f"""You are a data analyst for an early-stage climate tech VC firm. Your task is to extract specific data points from the article text for a deal flow report. Be precise.
-**Primary Data Points Required:**
-- `startup_name`: The name of the company that received funding.
-- `funding_stage`: The stage of funding (e.g., "Seed," "Series A," "pre-seed"). If not specified, use `null`.
-- `amount_raised`: The total amount of money raised (e.g., "$15 million," "€20M").
-- `lead_investor`: The ONE firm or individual explicitly mentioned as "leading" or "co-leading" the round. If no lead is mentioned, use `null`.
-- `other_investors`: A list of any other participating investors mentioned. If none, use `null`.
-**Example:**
-Article Text: "Grid-X, a smart thermostat startup, has closed a $12 million Series A financing round. The investment was led by Climate Capital, with contributions from Powerhouse Ventures and Tina's Angel Fund."
-JSON Output: {{"startup_name": "Grid-X", "funding_stage": "Series A", "amount_raised": "$12 million", "lead_investor": "Climate Capital", "other_investors": ["Powerhouse Ventures", "Tina's Angel Fund"]}}
----
-**Actual Article to Process:**
-Article Text: --- {content[:4000]} ---
-JSON Output:"""
     try:
-        response = client.chat.completions.create(model="meta-llama/llama-3-8b-instruct",response_format={"type": "json_object"},messages=[{"role": "user", "content": prompt}])
+        with tracing.span("llm_request", model=model):
+            response = chat_completion(**prompts.FUNDING_ARTICLE.request(model, content=content[:4000]))
         extracted_data = json.loads(response.choices[0].message.content)
         return extracted_data
     except Exception as e:
         print(f"   -> 🔴 ERROR during data extraction: {e}")
         return None
 
-def extract_ctvc_deal_data(deal_string):
+@tracing.traced("extract")
+def extract_ctvc_deal_data(deal_string, model=EXTRACTION_MODEL):
     """
     NEW: A hyper-focused AI function for extracting data from a single CTVC deal string.
     """
     print(f"\n[AI] Processing deal: '{deal_string[:100]}...'")
-    prompt = f"""From the single, complete deal announcement text provided, extract: startup_name, amount_raised, funding_stage, and a list of all investors.
-
-**Instructions:**
-- The startup name is the first bolded name.
-- The amount is the bolded dollar/euro value.
-- If a single investor is mentioned, they are the `lead_investor`.
-- If multiple investors are listed after "from", the first is the `lead_investor` and the rest are `other_investors`.
-- If no value is present, use `null`.
-
-**Example:**
-Text: "✈️ AIR, a Haifa, Israel-based eVTOL developer, raised $23m in Series A funding from Entrée Capital."
-JSON Output: {{
-  "startup_name": "AIR",
-  "amount_raised": "$23m",
-  "funding_stage": "Series A",
-  "lead_investor": "Entrée Capital",
-  "other_investors": []
-}}
-
----
-**Actual Text to Process:**
-Text: "{deal_string}"
-JSON Output:"""
     try:
-        response = client.chat.completions.create(
-            model="meta-llama/llama-3-8b-instruct",
-            response_format={"type": "json_object"},
-            messages=[{"role": "user", "content": prompt}]
-        )
+        with tracing.span("llm_request", model=model):
+            response = chat_completion(**prompts.CTVC_DEAL.request(model, deal_string=deal_string))
         return json.loads(response.choices[0].message.content)
     except Exception as e:
         print(f"[AI] -> 🔴 ERROR during data extraction: {e}")
         return None
 
-def clean_and_normalize_data(data):
+@tracing.traced("extract")
+def extract_ctvc_deals_concurrently(deal_strings, model=EXTRACTION_MODEL):
     """
-    NEW: A function to clean up the messy JSON from the AI.
+    The per-line prompt of `extract_ctvc_deal_data` for several deal strings, sent to the backend
+    together (`backend.complete_many`), which a local llama.cpp server decodes as one batch.
+
+    Returns:
+        list: One extraction dict per input string, in order (None where a call failed).
     """
-    # Normalize different investor keys into a standard format
-    lead = data.get('lead_investor') or data.get('lead_investors')
-    others = data.get('other_investors') or data.get('investors')
-
-    # Handle cases where lead is a list
-    if isinstance(lead, list) and lead:
-        if not others: others = []
-        others.extend(lead[1:])
-        lead = lead[0]
-    
-    cleaned_data = {
-        'startup_name': data.get('startup_name'),
-        'amount_raised': data.get('amount_raised'),
-        'funding_stage': data.get('funding_stage'),
-        'lead_investor': lead,
-        'other_investors': others
-    }
+    print(f"\n[AI] Processing {len(deal_strings)} deals together on the {backend.name} backend...")
+    with tracing.span("llm_request", model=model, batch=len(deal_strings)):
+        responses = backend.complete_many([prompts.CTVC_DEAL.request(model, deal_string=deal_string)
+                                           for deal_string in deal_strings])
+    results = []
+    for deal_string, response in zip(deal_strings, responses):
+        try:
+            if isinstance(response, Exception):
+                raise response
+            results.append(json.loads(response.choices[0].message.content))
+        except Exception as e:
+            print(f"[AI] -> 🔴 ERROR during data extraction of '{deal_string[:60]}...': {e}")
+            results.append(None)
+    return results
 
-    # Final cleanup of null/None/'Not Specified' values
-    for key, value in cleaned_data.items():
-        if value is None or value == 'null' or value == ['null']:
-            cleaned_data[key] = 'Not Specified'
-            
-    return cleaned_data
+@tracing.traced("extract")
+def extract_ctvc_deals_batch(deal_strings, model=EXTRACTION_MODEL):
+    """
+    Extracts several CTVC deal strings with one LLM call instead of one call each.
 
+    Returns:
+        list: One extraction dict per input string, in order (None where the model skipped a line).
+    """
+    print(f"\n[AI] Processing a batch of {len(deal_strings)} deals...")
+    numbered = "\n".join(f"{i}. {deal_string}" for i, deal_string in enumerate(deal_strings, 1))
+    try:
+        with tracing.span("llm_request", model=model):
+            response = chat_completion(**prompts.CTVC_DEAL_BATCH.request(model, numbered=numbered))
+        extracted = json.loads(response.choices[0].message.content).get('deals') or []
+    except Exception as e:
+        print(f"[AI] -> 🔴 ERROR during batch extraction: {e}")
+        return [None] * len(deal_strings)
+    results = [None] * len(deal_strings)
+    for position, deal in enumerate(extracted):
+        if not isinstance(deal, dict):
+            continue
+        line = deal.pop('line', position + 1)
+        if isinstance(line, int) and 1 <= line <= len(deal_strings):
+            results[line - 1] = deal
+    return results
 
-# --- UTILITY FUNCTIONS ---
-def load_processed_urls(filename):
-    if not os.path.exists(filename): return set()
-    with open(filename, 'r', encoding='utf-8') as f:
-        return set(line.strip() for line in f)
+def clean_and_normalize_data(data, **provenance):
+    """
+    Cleans up the messy JSON from the AI into a `Deal` record.
 
-def save_to_csv(data_list, filename="climate_funding_data_master.csv"):
-    if not data_list: return
-    print(f"💾 Saving {len(data_list)} new records to {filename}...")
-    file_exists = os.path.isfile(filename)
-    headers = set().union(*(d.keys() for d in data_list))
-    preferred_order = ['startup_name', 'subsector', 'amount_raised', 'funding_stage', 'lead_investor', 'other_investors', 'source_url', 'source_site']
-    final_headers = sorted(list(headers), key=lambda x: preferred_order.index(x) if x in preferred_order else len(preferred_order))
-    with open(filename, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=final_headers)
-        if not file_exists: writer.writeheader()
-        writer.writerows(data_list)
-    print("   -> Save complete.")
+    Args:
+        provenance: Fields the extraction doesn't know, e.g. `source_url`, `source_site`, `subsector`.
+    """
+    return Deal.from_extraction(data, **provenance)
+
+def normalize_ctvc_deal(deal, funding_data, url, source_name="CTVC"):
+    """A `Deal` from one segmented CTVC deal line (see deal_segmenter) and its extraction."""
+    cleaned_data = clean_and_normalize_data(
+        funding_data, source_url=url, source_site=source_name, subsector="Deal from Newsletter")
+    # Fall back to the bold spans the segmenter kept from the DOM.
+    if not cleaned_data.startup_name:
+        cleaned_data.startup_name = deal['startup_name']
+    if not cleaned_data.amount_raised and deal['amount_raised']:
+        cleaned_data.set_amount(deal['amount_raised'])
+    cleaned_data.website = deal.get('website')
+    cleaned_data.hq = deal.get('hq')
+    cleaned_data.date = deal.get('date')  # the newsletter's publish date; CTVC URLs carry none
+    return cleaned_data
 
 
 if __name__ == "__main__":
-    PROCESSED_URLS_LOG_FILE = "processed_urls.log"
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Scrape climate tech funding deals from every enabled source.")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this port during the run")
+    parser.add_argument("--trace-dir", default="traces", help="where the run's Chrome trace and OpenMetrics file go")
+    parser.add_argument("--refresh", action="store_true",
+                        help="re-check already processed CTVC newsletters and re-extract only edited or new deal lines")
+    parser.add_argument("--near-dup-threshold", type=float, default=near_dup.DEFAULT_THRESHOLD,
+                        help="similarity (0-1) above which an article reuses an earlier copy's extraction")
+    llm_backends.add_arguments(parser)
+    parser.add_argument("--time-budget", type=float, help="stop starting new work after this many seconds")
+    parser.add_argument("--cost-budget", type=float, help="stop starting new work after this many USD of LLM calls")
+    parser.add_argument("--explain", action="store_true",
+                        help="print the planner's expected yield per source and its page order, then exit")
+    parser.add_argument("--prefetch", type=int, default=3,
+                        help="articles to fetch and parse ahead while the LLM works (0 to disable)")
+    parser.add_argument("--prefetch-connections", type=int, default=2, help="concurrent HTTP fetches for prefetching")
+    parser.add_argument("--prefetch-browsers", type=int, default=1, help="concurrent Selenium browsers for prefetching")
+    parser.add_argument("--enrich", action="store_true",
+                        help="look up each startup's homepage for its website, HQ and climate sector (cached per domain)")
+    parser.add_argument("--enrich-workers", type=int, default=8, help="homepages fetched at once when enriching")
+    parser.add_argument("--profile", choices=profiling.MODES,
+                        help="cpu: cProfile, sample: statistical CPU sampling, alloc: tracemalloc snapshots")
+    parser.add_argument("--profile-stage", help="only profile inside this span, e.g. crawl, scrape, parse, classify, extract")
+    parser.add_argument("--profile-source", help="only profile spans for this source, e.g. CTVC")
+    parser.add_argument("--profile-dir", default="profiles")
+    parser.add_argument("--profile-top", type=int, default=20, help="entries in the printed profile summary")
+    args = parser.parse_args()
+    worker_stages = ({'scrape', 'parse', 'http_fetch', 'selenium_start', 'page_load'} if args.prefetch > 0 else set()) | \
+                    ({'enrich', 'llm_request'} if args.enrich else set())
+    if args.profile == 'sample' and args.profile_stage in worker_stages:
+        parser.error(f"--profile sample can only sample the main thread, and '{args.profile_stage}' runs on worker "
+                     f"threads here; use --profile cpu, or --prefetch 0 / no --enrich")
+
     TARGET_SUCCESSES = 20 # Let's aim for a big number!
     MAX_PAGES_PER_SOURCE = 5
 
-    processed_urls = load_processed_urls(PROCESSED_URLS_LOG_FILE)
-    print(f"✅ Loaded {len(processed_urls)} previously processed URLs.")
+    if args.explain:
+        # Only reads the planner's history: no backend, browser, prefetcher or store is started.
+        with scheduler.Planner(SOURCE_HANDLERS, backend, lambda: 0, TARGET_SUCCESSES, MAX_PAGES_PER_SOURCE,
+                               time_budget=args.time_budget, cost_budget=args.cost_budget) as planner:
+            print(planner.explain())
+        raise SystemExit(0)
+
+    if args.metrics_port:
+        tracing.start_metrics_server(args.metrics_port)
+    backend = llm_backends.from_args(parser, args) or backend
+    profiler = profiling.start(args.profile, args.profile_stage, args.profile_source, args.profile_dir, args.profile_top)
+
+    seen_urls = url_index.open_seen_index()
+    near_dups = near_dup.NearDupIndex(threshold=args.near_dup_threshold)
+    page_hashes = content_hashes.ContentHashIndex()
+    prefetcher = prefetch.Prefetcher(args.prefetch, args.prefetch_connections, args.prefetch_browsers) if args.prefetch > 0 else None
+    enricher = enrichment.Enricher(chat_completion, CLASSIFICATION_MODEL, max_workers=args.enrich_workers) if args.enrich else None
     
-    master_funding_list = []
+    store = storage.open_store()
+    # Deals are flushed to the store every few records instead of being held until exit.
+    deal_sink = sinks.DatabaseSink(store, flush_every=10, flush_interval=60.0)
+    deduplicator = dedup.DealDeduplicator.from_store(store)
+    new_deal_count = 0
+
+    def save_deal(cleaned_data):
+        """Resolves the deal against every source seen so far and queues the canonical record."""
+        global new_deal_count
+        canonical, is_new = deduplicator.resolve(cleaned_data)
+        deal_sink.write(canonical)
+        if enricher:
+            enricher.submit(canonical)
+        if is_new:
+            new_deal_count += 1
+            print(f"   -> ✅ SUCCESS: Extracted '{canonical['startup_name']}'. Total finds: {new_deal_count}")
+        else:
+            print(f"   -> 🔗 DUPLICATE: '{cleaned_data['startup_name']}' merged into existing deal '{canonical['startup_name']}'.")
 
-    for name, handler in SOURCE_HANDLERS.items():
-        if len(master_funding_list) >= TARGET_SUCCESSES: break
-        
+    def update_edited_deal(url, old_name, cleaned_data):
+        """Applies an edited newsletter line to the deal stored from its previous version, renaming it if needed."""
+        stored = next((deal for deal in store.find_by_source_url(url)
+                       if dedup.normalize_name(deal['startup_name']) == dedup.normalize_name(old_name)), None)
+        if stored is None:
+            save_deal(cleaned_data)  # never stored under this URL (e.g. it was merged into another source's deal)
+            return
+        deal_sink.flush()  # queued writes for this URL must land before the row is renamed
+        store.replace(url, stored['startup_name'], cleaned_data)
+        # Re-key the dedup index: the old name's entry (and any under the new name, which the rename replaced) goes.
+        deduplicator.remove(stored['startup_name'], url)
+        deduplicator.remove(cleaned_data.startup_name, url)
+        deduplicator.add(cleaned_data)
+        if enricher:
+            enricher.submit(cleaned_data)
+        print(f"   -> ✏️  UPDATED: '{stored['startup_name']}' from its edited line"
+              + (f", now '{cleaned_data.startup_name}'." if cleaned_data.startup_name != stored['startup_name'] else "."))
+
+    def process_ctvc_deals(url, deal_records, source_name, edits=None):
+        """
+        Extracts and saves each segmented deal line of a CTVC newsletter.
+
+        Args:
+            edits (dict): On refresh, {id(record): startup name of the line it replaced} (see
+                          content_hashes.edited_lines); those update their stored deal in place.
+
+        Returns:
+            list: The deal lines whose extraction failed, to leave unhashed so they are retried.
+        """
+        edits = edits or {}
+        to_extract, failed = [], []
+        for deal in deal_records:
+            if id(deal) in edits:
+                to_extract.append(deal)  # our own deal, edited: no dedup shortcut
+                continue
+            # Rounds already reported by another source only need a provenance entry, not an LLM call.
+            known_deal = deduplicator.find(deal['startup_name'], deal['amount_raised'], deal['date'], exclude_url=url)
+            if known_deal:
+                dedup.add_source(known_deal, url, source_name)
+                deal_sink.write(known_deal)
+                print(f"   -> 🔗 DUPLICATE: '{deal['startup_name']}' already known, skipping extraction.")
+            else:
+                to_extract.append(deal)
+        if not to_extract:
+            return failed
+        # All of the newsletter's lines go to the backend together, so they run concurrently (one batch locally).
+        extractions = extract_ctvc_deals_concurrently([deal['text'] for deal in to_extract])
+        for deal, funding_data in zip(to_extract, extractions):
+            if not funding_data:
+                failed.append(deal)
+                continue
+            cleaned_data = normalize_ctvc_deal(deal, funding_data, url, source_name)
+            if not cleaned_data.startup_name:
+                continue
+            if id(deal) in edits:
+                update_edited_deal(url, edits[id(deal)], cleaned_data)
+            else:
+                save_deal(cleaned_data)
+        return failed
+
+    def refresh_newsletter(url, source_name):
+        """Re-checks a processed newsletter and re-extracts only the deal lines that are new or were edited."""
+        print(f"\n--- Refreshing URL: {url} ---")
+        tracing.bind(source=source_name, url=url)
+        page = page_hashes.get_page(url)
+        status, deal_records, etag, last_modified = sources.refresh_ctvc_article(
+            url, page and page['etag'], page and page['last_modified'])
+        if status == 'error':
+            return
+        if status == 'not_modified' or (page and content_hashes.block_hash(deal_records) == page['block_hash']):
+            print("   -> ✅ UNCHANGED since the last check.")
+            page_hashes.touch(url, etag, last_modified)
+            return
+        if page:
+            changed = page_hashes.new_lines(url, deal_records)
+        else:
+            # Processed before hashes were kept: treat lines whose startup is already stored for this URL as unchanged.
+            stored_names = {dedup.normalize_name(deal['startup_name']) for deal in store.find_by_source_url(url)}
+            changed = [deal for deal in deal_records if dedup.normalize_name(deal['startup_name']) not in stored_names]
+        edits = page_hashes.edited_lines(url, deal_records)
+        replaced = {dedup.normalize_name(name) for name in edits.values()}
+        # Lines that were deleted rather than edited; their deals stay stored (the round still happened).
+        removed = [name for name in page_hashes.removed_lines(url, deal_records)
+                   if name and dedup.normalize_name(name) not in replaced]
+        print(f"   -> ✏️  {len(changed) - len(edits)} new and {len(edits)} edited deal line(s) of {len(deal_records)}"
+              + (f"; no longer listed: {', '.join(removed)}" if removed else "") + ".")
+        failed = process_ctvc_deals(url, changed, source_name, edits)
+        # Lines whose extraction failed are not hashed, so the next refresh extracts them again; the validators
+        # are dropped too, or the server's 304 would hide those lines from it.
+        if failed:
+            etag = last_modified = None
+        page_hashes.record(url, deal_records, etag, last_modified, failed=failed)
+
+    def process_article(name, handler, article_info):
+        """Scrapes one new article or newsletter, then extracts and saves its deals."""
+        url = article_info['url']
+        print(f"\n--- Processing URL: {url} ---")
+        tracing.bind(source=name, url=url)
+
+        # CTVC scrapers return (title, deal_records); article scrapers add the startup's website from the article.
+        title, content, *website = prefetcher.get(url, handler['scrape_func']) if prefetcher else handler['scrape_func'](url)
+        if not title or not content or content == "Content not found.":
+            print("   -> ❌ SKIPPED: Scraper failed to get content.\n")
+            return
+
+        if name == "CTVC":
+            print("🤖 Source is CTVC, using multi-deal extraction strategy.")
+            deal_records = content
+            print(f"   -> Found {len(deal_records)} potential deals in this article.")
+            failed = process_ctvc_deals(url, deal_records, handler['source_name'])
+            page_hashes.record(url, deal_records, failed=failed)
+            return
+
+        # Republished copies of an article we already processed reuse its results instead of new LLM calls.
+        duplicate = near_dups.find(content, exclude_url=url)
+        if duplicate:
+            original_url, result, similarity = duplicate
+            print(f"   -> ♻️  NEAR-DUPLICATE ({similarity:.0%}) of {original_url}, reusing its results.")
+            article_type, funding_data = result['article_type'], result['funding_data']
+        else:
+            article_type = classify_article_type(title, content)
+            funding_data = extract_funding_data(content) if "STARTUP_FUNDING_ROUND" in article_type else None
+            near_dups.add(url, content, {'article_type': article_type, 'funding_data': funding_data})
+        if "STARTUP_FUNDING_ROUND" in article_type:
+            if funding_data:
+                cleaned_data = clean_and_normalize_data(
+                    funding_data, source_url=url, source_site=handler['source_name'],
+                    subsector=article_info['subsector'], website=website[0] if website else None)
+                if cleaned_data.startup_name:
+                    save_deal(cleaned_data)
+                else:
+                    print("   -> ❌ SKIPPED: AI failed to extract startup name.")
+            else:
+                print("   -> ❌ SKIPPED: AI extraction returned nothing.")
+        else:
+            print("   -> ❌ SKIPPED: Article is not a funding announcement.")
+
+    # Rather than sources in dict order, the planner picks each next listing page by expected deals per second
+    # (or per USD under --cost-budget) from every source's history, until the target or a budget is reached.
+    planner = scheduler.Planner(SOURCE_HANDLERS, backend, lambda: new_deal_count, TARGET_SUCCESSES,
+                                MAX_PAGES_PER_SOURCE, time_budget=args.time_budget, cost_budget=args.cost_budget)
+    print(planner.explain())
+
+    while True:
+        unit = planner.next_unit()
+        if unit is None:
+            break
+        name, current_page = unit
+        handler = SOURCE_HANDLERS[name]
         print(f"\n\n{'='*60}\n⚡ Processing Source: {name}\n{'='*60}\n")
-        
-        current_page = 1
-        
-        while current_page <= MAX_PAGES_PER_SOURCE:
-            if len(master_funding_list) >= TARGET_SUCCESSES: break
-            
-            print(f"--- Crawling Page {current_page} of {name} ---")
+        print(f"--- Crawling Page {current_page} of {name} ---")
+
+        with planner.measure(name, 'listing') as listing:
             articles_to_process = handler['crawl_func'](handler['url'], page=current_page)
-            if not articles_to_process:
-                print("   -> No more articles found for this source.")
-                break
-
-            for article_info in articles_to_process:
-                if len(master_funding_list) >= TARGET_SUCCESSES: break
-                
-                url = article_info['url']
-                if url in processed_urls: continue
-
-                print(f"\n--- Processing URL: {url} ---")
-                
-                with open(PROCESSED_URLS_LOG_FILE, 'a', encoding='utf-8') as f:
-                    f.write(f"{url}\n")
-                processed_urls.add(url)
-                
-                title, content = handler['scrape_func'](url)
-                if not title or not content or content == "Content not found.":
-                    print("   -> ❌ SKIPPED: Scraper failed to get content.\n")
-                    continue
-
-                if name == "CTVC":
-                    print("🤖 Source is CTVC, using multi-deal extraction strategy.")
-                    emoji_pattern = re.compile(r'[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001FA00-\U0001FAFF\u2600-\u26FF\u2700-\u27BF]+')
-                    deal_chunks = emoji_pattern.split(content)[1:]
-                    emojis = emoji_pattern.findall(content)
-                    deal_lines = [emojis[i] + chunk.strip() for i, chunk in enumerate(deal_chunks)]
-                    
-                    print(f"   -> Found {len(deal_lines)} potential deals in this article.")
-                    for deal_line in deal_lines:
-                        if 'raised' in deal_line or 'funding' in deal_line:
-                            time.sleep(1.5)
-                            funding_data = extract_ctvc_deal_data(deal_line)
-                            if funding_data:
-                                cleaned_data = clean_and_normalize_data(funding_data)
-                                if cleaned_data.get('startup_name') != 'Not Specified':
-                                    cleaned_data['source_url'] = url
-                                    cleaned_data['source_site'] = handler['source_name']
-                                    cleaned_data['subsector'] = "Deal from Newsletter"
-                                    master_funding_list.append(cleaned_data)
-                                    print(f"   -> ✅ SUCCESS: Extracted '{cleaned_data['startup_name']}'. Total finds: {len(master_funding_list)}")
-                else:
-                    article_type = classify_article_type(title, content)
-                    if "STARTUP_FUNDING_ROUND" in article_type:
-                        funding_data = extract_funding_data(content)
-                        if funding_data:
-                            cleaned_data = clean_and_normalize_data(funding_data)
-                            if cleaned_data.get('startup_name') != 'Not Specified':
-                                cleaned_data['source_url'] = url
-                                cleaned_data['source_site'] = handler['source_name']
-                                cleaned_data['subsector'] = article_info['subsector']
-                                master_funding_list.append(cleaned_data)
-                                print(f"   -> ✅ SUCCESS: Extracted '{cleaned_data['startup_name']}'. Total finds: {len(master_funding_list)}")
-                            else:
-                                print("   -> ❌ SKIPPED: AI failed to extract startup name.")
-                        else:
-                            print("   -> ❌ SKIPPED: AI extraction returned nothing.")
-                    else:
-                        print("   -> ❌ SKIPPED: Article is not a funding announcement.")
-                
-                time.sleep(1.5)
-
-            current_page += 1
-
-    save_to_csv(master_funding_list)
-    print(f"\n🏁 Full process complete. Added {len(master_funding_list)} new records in total.")
\ No newline at end of file
+            listing.items = 0
+        if not articles_to_process:
+            print("   -> No more articles found for this source.")
+            planner.exhausted(name)
+            continue
+        if prefetcher:
+            # Fetch the listing's new articles ahead, so their download overlaps the LLM calls for the one before.
+            prefetcher.clear()
+            prefetcher.schedule([article['url'] for article in articles_to_process if article['url'] not in seen_urls],
+                                handler['scrape_func'], handler.get('uses_browser', False))
+
+        for article_info in articles_to_process:
+            if planner.out_of_budget(): break
+
+            url = article_info['url']
+            # `add` is an atomic claim, so parallel runs never process the same article twice.
+            if not seen_urls.add(url):
+                if args.refresh and name == "CTVC":
+                    refresh_newsletter(url, handler['source_name'])
+                continue
+
+            listing.items += 1
+            with planner.measure(name, planner.page_type(name)):
+                process_article(name, handler, article_info)
+
+            if enricher:
+                for enriched in enricher.collect():
+                    deal_sink.write(enriched)
+            deal_sink.maybe_flush()
+
+        # The listing's yield is the new articles it led to; its cost was recorded when it was fetched.
+        planner.record_items(name, listing.items)
+
+    if prefetcher:
+        prefetcher.cancel()  # target or budget reached: drop anything still queued or in flight
+        print(f"🚚 Prefetch: {prefetcher.stats()}")
+    if enricher:
+        for enriched in enricher.collect(wait_all=True):
+            deal_sink.write(enriched)
+        print(f"🏷️  Enrichment: {enricher.stats()}")
+        enricher.close()
+    deal_sink.close()
+    deal_sink.report()
+    print(f"🔗 Dedup: {deduplicator.stats()}")
+    retry.report()
+    prompts.report()
+    print(f"♻️  Near-duplicates: {near_dups.stats()}")
+    store.export_csv()
+    store.close()
+    seen_urls.close()
+    near_dups.close()
+    page_hashes.close()
+    planner.close()
+    backend.close()
+    tracing.write_run(args.trace_dir)
+    if profiler:
+        profiler.stop()
+    print(f"\n🏁 Full process complete. Added {new_deal_count} new records in total.")
\ No newline at end of file
@@ -0,0 +1,200 @@
+# near_dup.py
+# MinHash/LSH near-duplicate detection for scraped articles, so republished stories reuse an earlier extraction.
+
+import re
+import json
+import zlib
+import array
+import sqlite3
+import hashlib
+import datetime
+
+try:
+    import numpy as np
+except ImportError:  # Signatures are computed in pure Python without it, just more slowly.
+    np = None
+
+import storage
+
+WORD_PATTERN = re.compile(r'\w+')
+SHINGLE_SIZE = 4              # words per shingle
+NUM_PERM = 128
+MERSENNE_PRIME = (1 << 31) - 1
+DEFAULT_THRESHOLD = 0.7       # estimated Jaccard similarity above which two articles count as the same story
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS near_dup_docs (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    signature BLOB NOT NULL,
+    result TEXT,
+    added TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS near_dup_bands (
+    band INTEGER NOT NULL,
+    bucket TEXT NOT NULL,
+    doc_id INTEGER NOT NULL REFERENCES near_dup_docs (id) ON DELETE CASCADE,
+    PRIMARY KEY (band, bucket, doc_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS near_dup_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+# --- MINHASH ---
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Hashes of the overlapping `size`-word windows of the lowercased text."""
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        return {zlib.crc32(' '.join(words).encode('utf-8'))} if words else set()
+    return {zlib.crc32(' '.join(words[i:i + size]).encode('utf-8')) for i in range(len(words) - size + 1)}
+
+class MinHasher:
+    """`num_perm` universal hash functions (a*x + b mod p); a text's signature is each one's minimum over its shingles."""
+
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        digest = hashlib.blake2b(f"minhash-{seed}".encode('utf-8'), digest_size=64).digest()
+        state = int.from_bytes(digest, 'little')
+        self.a, self.b = [], []
+        for _ in range(num_perm):
+            state = (state * 6364136223846793005 + 1442695040888963407) % (1 << 64)
+            self.a.append(1 + (state >> 33) % (MERSENNE_PRIME - 1))
+            state = (state * 6364136223846793005 + 1442695040888963407) % (1 << 64)
+            self.b.append((state >> 33) % MERSENNE_PRIME)
+        self.num_perm = num_perm
+        if np is not None:
+            self._a = np.array(self.a, dtype=np.uint64)[:, None]
+            self._b = np.array(self.b, dtype=np.uint64)[:, None]
+
+    def signature(self, text):
+        """Returns the signature as a tuple of `num_perm` ints (all MERSENNE_PRIME for empty text)."""
+        values = [value & MERSENNE_PRIME for value in shingles(text)]
+        if not values:
+            return (MERSENNE_PRIME,) * self.num_perm
+        if np is not None:
+            hashes = (self._a * np.array(values, dtype=np.uint64)[None, :] + self._b) % MERSENNE_PRIME
+            return tuple(hashes.min(axis=1).tolist())
+        return tuple(min((a * value + b) % MERSENNE_PRIME for value in values) for a, b in zip(self.a, self.b))
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity: the share of positions where two signatures agree."""
+    return sum(x == y for x, y in zip(signature, other)) / len(signature)
+
+def lsh_params(threshold, num_perm=NUM_PERM):
+    """
+    (bands, rows) whose LSH S-curve rises at about 0.85 * threshold, so pairs at the threshold
+    almost always share a bucket and the exact signature comparison makes the final call.
+    """
+    target = 0.85 * threshold
+    return min(((num_perm // rows, rows) for rows in range(1, num_perm + 1)),
+               key=lambda params: abs((1 / params[0]) ** (1 / params[1]) - target))
+
+
+# --- PERSISTENT INDEX ---
+
+class NearDupIndex:
+    """
+    Article fingerprints and their pipeline results, kept in SQLite next to the deals.
+
+    `find` hashes an article, looks up candidates that share an LSH band bucket and returns the
+    most similar stored article above `threshold` together with the result stored for it
+    (e.g. the classification and extraction), so a republished copy needs no LLM calls.
+
+    Args:
+        threshold (float): Minimum estimated Jaccard similarity (0-1) of 4-word shingles. A short wire
+                           story with a new intro and a reworded sentence or two scores about 0.75.
+    """
+
+    def __init__(self, path=storage.DB_FILE, threshold=DEFAULT_THRESHOLD, num_perm=NUM_PERM, busy_timeout=30.0):
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm)
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+        self.conn = sqlite3.connect(path, timeout=busy_timeout)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+        self._ensure_bands(num_perm)
+        self.lookups = 0
+        self.hits = 0
+        self.candidates = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    # --- Banding ---
+
+    def _buckets(self, signature):
+        for band in range(self.bands):
+            values = signature[band * self.rows:(band + 1) * self.rows]
+            yield band, hashlib.blake2b(array.array('I', values).tobytes(), digest_size=8).hexdigest()
+
+    def _ensure_bands(self, num_perm):
+        """Re-buckets the stored signatures if this run uses different LSH parameters (e.g. a new threshold)."""
+        params = f"{num_perm}:{self.bands}x{self.rows}"
+        stored = self.conn.execute("SELECT value FROM near_dup_meta WHERE key = 'lsh'").fetchone()
+        if stored and stored[0] == params:
+            return
+        with self.conn:
+            self.conn.execute("DELETE FROM near_dup_bands")
+            for doc_id, blob in self.conn.execute("SELECT id, signature FROM near_dup_docs").fetchall():
+                signature = tuple(array.array('I', blob))
+                if len(signature) != num_perm:
+                    self.conn.execute("DELETE FROM near_dup_docs WHERE id = ?", (doc_id,))
+                    continue
+                self.conn.executemany("INSERT OR IGNORE INTO near_dup_bands (band, bucket, doc_id) VALUES (?, ?, ?)",
+                                      [(band, bucket, doc_id) for band, bucket in self._buckets(signature)])
+            self.conn.execute("INSERT OR REPLACE INTO near_dup_meta (key, value) VALUES ('lsh', ?)", (params,))
+
+    # --- Public API ---
+
+    def find(self, text, exclude_url=None):
+        """
+        Returns (url, result, similarity) for the most similar stored article at or above the
+        threshold, or None. `result` is whatever was passed to `add` for that article.
+        """
+        self.lookups += 1
+        signature = self.hasher.signature(text)
+        candidate_ids = set()
+        for band, bucket in self._buckets(signature):
+            candidate_ids.update(doc_id for (doc_id,) in self.conn.execute(
+                "SELECT doc_id FROM near_dup_bands WHERE band = ? AND bucket = ?", (band, bucket)))
+        self.candidates += len(candidate_ids)
+        best = None
+        for doc_id in candidate_ids:
+            url, blob, result = self.conn.execute(
+                "SELECT url, signature, result FROM near_dup_docs WHERE id = ?", (doc_id,)).fetchone()
+            if url == exclude_url:
+                continue
+            score = similarity(signature, array.array('I', blob))
+            if score >= self.threshold and (best is None or score > best[2]):
+                best = (url, json.loads(result) if result else None, score)
+        if best:
+            self.hits += 1
+        return best
+
+    def add(self, url, text, result=None):
+        """Fingerprints an article and stores the pipeline's `result` for it (any JSON-serializable value)."""
+        signature = self.hasher.signature(text)
+        with self.conn:
+            self.conn.execute("DELETE FROM near_dup_docs WHERE url = ?", (url,))
+            cursor = self.conn.execute(
+                "INSERT INTO near_dup_docs (url, signature, result, added) VALUES (?, ?, ?, ?)",
+                (url, array.array('I', signature).tobytes(), json.dumps(result, ensure_ascii=False),
+                 datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')))
+            self.conn.executemany("INSERT OR IGNORE INTO near_dup_bands (band, bucket, doc_id) VALUES (?, ?, ?)",
+                                  [(band, bucket, cursor.lastrowid) for band, bucket in self._buckets(signature)])
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM near_dup_docs").fetchone()[0]
+
+    def stats(self):
+        return {'articles': len(self), 'lookups': self.lookups, 'hits': self.hits,
+                'hit_rate': round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+                'candidates_checked': self.candidates, 'threshold': self.threshold,
+                'lsh': f"{self.bands}x{self.rows}"}
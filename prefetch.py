@@ -0,0 +1,95 @@
+# prefetch.py
+# Speculative prefetch: fetches and parses the next few discovered articles while the LLM works on the current one.
+
+import time
+import threading
+import collections
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+
+
+class Prefetcher:
+    """
+    Keeps up to `depth` upcoming articles fetched (or in flight) ahead of the main loop.
+
+    `schedule` queues a listing's URLs with the source's scrape function; worker threads run
+    the scrape functions (HTTP fetch + parse, or a Selenium page load) under their own budget of
+    `max_connections` plain fetches and `max_browsers` browsers, separate from the main loop's.
+    `get` hands back a prefetched (title, content), waiting for it if it is still in flight, or
+    scrapes inline if the URL was never prefetched. Results are held in memory only until
+    they are used, and never more than `depth` at a time.
+
+    Args:
+        depth (int): How many articles to keep fetched ahead (the K in "next K").
+        max_connections (int): Concurrent plain HTTP scrapes.
+        max_browsers (int): Concurrent Selenium scrapes; each one is a Firefox process.
+    """
+
+    def __init__(self, depth=3, max_connections=2, max_browsers=1):
+        self.depth = depth
+        self.pool = ThreadPoolExecutor(max_workers=max_connections + max_browsers, thread_name_prefix='prefetch')
+        self.budgets = {False: threading.BoundedSemaphore(max_connections), True: threading.BoundedSemaphore(max_browsers)}
+        self.queue = collections.deque()          # (url, scrape_func, uses_browser) not started yet
+        self.cache = collections.OrderedDict()    # url -> future of (title, content, fetch seconds)
+        self.cancelled = False
+        self.counts = {'hits': 0, 'misses': 0, 'discarded': 0, 'hidden_s': 0.0, 'waited_s': 0.0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cancel()
+
+    def _scrape(self, scrape_func, url, uses_browser):
+        with self.budgets[uses_browser]:
+            if self.cancelled:
+                raise CancelledError()
+            started = time.monotonic()
+            return scrape_func(url), time.monotonic() - started
+
+    def _fill(self):
+        while self.queue and len(self.cache) < self.depth and not self.cancelled:
+            url, scrape_func, uses_browser = self.queue.popleft()
+            if url not in self.cache:
+                self.cache[url] = self.pool.submit(self._scrape, scrape_func, url, uses_browser)
+
+    def schedule(self, urls, scrape_func, uses_browser=False):
+        """Queues URLs (in processing order) to be fetched ahead; starts the first `depth` right away."""
+        self.queue.extend((url, scrape_func, uses_browser) for url in urls)
+        self._fill()
+
+    def get(self, url, scrape_func):
+        """`scrape_func(url)`, e.g. (title, content): the prefetched result if there is one, otherwise scraped now."""
+        future = self.cache.pop(url, None)
+        self._fill()
+        if future is not None and not future.cancelled():
+            started = time.monotonic()
+            try:
+                scraped, fetch_seconds = future.result()
+            except Exception:
+                future = None  # the scrape functions catch their own errors, so this is a cancellation
+            else:
+                waited = time.monotonic() - started
+                self.counts['hits'] += 1
+                self.counts['waited_s'] += waited
+                self.counts['hidden_s'] += max(0.0, fetch_seconds - waited)
+                return scraped
+        self.counts['misses'] += 1
+        return scrape_func(url)
+
+    def clear(self):
+        """Drops everything queued or prefetched (e.g. the rest of a listing the loop moved away from)."""
+        self.counts['discarded'] += len(self.cache)
+        self.queue.clear()
+        for future in self.cache.values():
+            future.cancel()
+        self.cache.clear()
+
+    def cancel(self):
+        """Stops prefetching for good: queued scrapes are cancelled and running ones are not waited for."""
+        self.cancelled = True
+        self.clear()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        return {**self.counts, 'hidden_s': round(self.counts['hidden_s'], 1),
+                'waited_s': round(self.counts['waited_s'], 1), 'depth': self.depth}
@@ -0,0 +1,225 @@
+# profiling.py
+# On-demand CPU (cProfile or sampling) and allocation (tracemalloc) profiling, optionally scoped to one stage/source.
+
+import io
+import os
+import time
+import signal
+import threading
+import pstats
+import cProfile
+import tracemalloc
+from collections import Counter
+
+import tracing
+
+MODES = ('cpu', 'sample', 'alloc')
+
+
+class Profiler:
+    """
+    Profiles a pipeline run, or only the spans of one stage and/or source.
+
+    With `stage`/`source` set, the profiler hooks into `tracing` spans and is only active inside
+    matching spans (e.g. stage='extract', source='CTVC'); the rest of the run pays nothing.
+    Without them, it covers everything between `start()` and `stop()` on the main thread.
+
+    Spans can run on worker threads (prefetching, enrichment, concurrent LLM calls): 'cpu' keeps
+    one cProfile per thread and merges them, 'alloc' traces while any thread is in scope, and
+    'sample' (signals only reach the main thread) skips, and counts, spans on other threads.
+
+    Args:
+        mode (str): 'cpu' (cProfile), 'sample' (statistical stack sampling) or 'alloc' (tracemalloc).
+        out_dir (str): Each run writes into its own `<out_dir>/<run id>/` folder.
+        top (int): Number of entries in the printed summary.
+    """
+
+    def __init__(self, mode, stage=None, source=None, out_dir="profiles", top=20, sample_interval=0.005):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profile mode {mode!r}; expected one of {MODES}")
+        if mode == 'sample' and not hasattr(signal, 'setitimer'):
+            raise RuntimeError("Sampling profiling needs signal.setitimer (not available on Windows); use --profile cpu")
+        self.mode = mode
+        self.stage = stage
+        self.source = source
+        self.top = top
+        self.sample_interval = sample_interval
+        self.run_dir = os.path.join(out_dir, time.strftime("run-%Y%m%d-%H%M%S"))
+        self._local = threading.local()  # per-thread scope depth, start time and whether it was activated
+        self._lock = threading.Lock()
+        self._profiles = {}              # cpu mode: thread ident -> cProfile.Profile
+        self._alloc_threads = 0          # alloc mode: threads currently in scope
+        self.off_main_thread = 0         # sample mode: matching spans skipped on worker threads
+        self.activations = 0
+        self.active_seconds = 0.0
+        self._started = None
+        self._samples = Counter()        # sample mode: stack tuple -> hits
+        self._alloc_diffs = Counter()    # alloc mode: "file:line" -> bytes still allocated at scope exit
+        self._alloc_counts = Counter()
+        self._alloc_peak = 0
+        self._snapshot = None
+
+    # --- Scope handling ---
+
+    def _matches(self, name, tags):
+        if self.stage and name != self.stage:
+            return False
+        return not self.source or tags.get('source') == self.source
+
+    def on_span_enter(self, name, tags):
+        if self._matches(name, tags):
+            self._enter()
+
+    def on_span_exit(self, name, tags):
+        if self._matches(name, tags):
+            self._exit()
+
+    def _enter(self):
+        depth = getattr(self._local, 'depth', 0) + 1
+        self._local.depth = depth
+        if depth > 1:
+            return
+        self._local.active = self._activate()
+        self._local.started = time.perf_counter()
+
+    def _exit(self):
+        depth = getattr(self._local, 'depth', 0) - 1
+        if depth < 0:
+            return  # the scope was entered before the hook was installed
+        self._local.depth = depth
+        if depth > 0 or not self._local.active:
+            return
+        elapsed = time.perf_counter() - self._local.started
+        with self._lock:
+            self.active_seconds += elapsed
+        self._deactivate()
+
+    def _activate(self):
+        """Starts profiling the calling thread's scope; False if this mode can't profile it."""
+        if self.mode == 'sample':
+            if threading.current_thread() is not threading.main_thread():
+                with self._lock:
+                    self.off_main_thread += 1
+                return False
+            signal.signal(signal.SIGPROF, self._on_sample)
+            signal.setitimer(signal.ITIMER_PROF, self.sample_interval, self.sample_interval)
+        with self._lock:
+            self.activations += 1
+            if self.mode == 'cpu':
+                profile = self._profiles.setdefault(threading.get_ident(), cProfile.Profile())
+            elif self.mode == 'alloc':
+                self._alloc_threads += 1
+                if self._alloc_threads == 1:
+                    tracemalloc.start(10)
+                    self._snapshot = tracemalloc.take_snapshot()
+        if self.mode == 'cpu':
+            profile.enable()  # cProfile hooks only the calling thread
+        return True
+
+    def _deactivate(self):
+        if self.mode == 'cpu':
+            self._profiles[threading.get_ident()].disable()
+        elif self.mode == 'sample':
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        else:
+            with self._lock:
+                self._alloc_threads -= 1
+                if self._alloc_threads > 0:
+                    return
+                after = tracemalloc.take_snapshot()
+                self._alloc_peak = max(self._alloc_peak, tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+                for stat in after.compare_to(self._snapshot, 'lineno'):
+                    frame = stat.traceback[0]
+                    key = f"{frame.filename}:{frame.lineno}"
+                    self._alloc_diffs[key] += stat.size_diff
+                    self._alloc_counts[key] += stat.count_diff
+                self._snapshot = after
+
+    def _on_sample(self, signum, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_filename, code.co_name, frame.f_lineno))
+            frame = frame.f_back
+        self._samples[tuple(reversed(stack))] += 1
+
+    # --- Lifecycle ---
+
+    def start(self):
+        if self.stage or self.source:
+            tracing.add_hook(self)
+        else:
+            self._enter()
+        return self
+
+    def stop(self):
+        """Stops profiling, writes the run's output files and prints the top-N summary."""
+        if self.stage or self.source:
+            tracing.remove_hook(self)
+        while getattr(self._local, 'depth', 0) > 0:
+            self._exit()
+        os.makedirs(self.run_dir, exist_ok=True)
+        summary = {'cpu': self._write_cpu, 'sample': self._write_samples, 'alloc': self._write_alloc}[self.mode]()
+        scope = " / ".join(filter(None, [self.stage, self.source])) or "whole run"
+        header = (f"🔬 {self.mode} profile ({scope}): {self.activations} activation(s), "
+                  f"{self.active_seconds:.2f}s profiled -> {self.run_dir}")
+        if self.off_main_thread:
+            header += (f"\n   -> ⚠️  {self.off_main_thread} matching span(s) ran on worker threads and were not sampled; "
+                       f"use --profile cpu for them")
+        with open(os.path.join(self.run_dir, "summary.txt"), 'w', encoding='utf-8') as f:
+            f.write(header + "\n" + summary)
+        print(header)
+        print(summary)
+
+    def _write_cpu(self):
+        if not self._profiles:
+            return "   -> No matching spans ran; nothing was profiled.\n"
+        buffer = io.StringIO()
+        stats = pstats.Stats(*self._profiles.values(), stream=buffer)  # every thread's profile, merged
+        stats.dump_stats(os.path.join(self.run_dir, "cpu.prof"))  # open with `python -m pstats` or snakeviz
+        stats.sort_stats('cumulative').print_stats(self.top)
+        return buffer.getvalue()
+
+    def _write_samples(self):
+        # Collapsed stacks, one "frame;frame;frame count" per line: the input format for flamegraph tools.
+        path = os.path.join(self.run_dir, "sample.folded")
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, hits in self._samples.most_common():
+                f.write(";".join(f"{name} ({os.path.basename(filename)}:{line})" for filename, name, line in stack)
+                        + f" {hits}\n")
+        total = sum(self._samples.values())
+        if not total:
+            return "   -> No samples were taken.\n"
+        self_time = Counter()
+        for stack, hits in self._samples.items():
+            filename, name, line = stack[-1]
+            self_time[f"{name} ({_short(filename)}:{line})"] += hits
+        lines = [f"   {total} samples every {self.sample_interval * 1000:.0f} ms of CPU time; top {self.top} by self time:"]
+        lines += [f"   {hits / total:>6.1%}  {where}" for where, hits in self_time.most_common(self.top)]
+        return "\n".join(lines) + "\n"
+
+    def _write_alloc(self):
+        if self._snapshot is not None:
+            self._snapshot.dump(os.path.join(self.run_dir, "alloc.snapshot"))  # tracemalloc.Snapshot.load()
+        if not self._alloc_diffs:
+            return "   -> No allocations were recorded.\n"
+        lines = [f"   peak traced memory {self._alloc_peak / 2**20:.1f} MiB; "
+                 f"top {self.top} lines by memory still held at scope exit:"]
+        for where, size in self._alloc_diffs.most_common(self.top):
+            lines.append(f"   {size / 1024:>10.1f} KiB  {self._alloc_counts[where]:>8} blocks  {_short(where)}")
+        return "\n".join(lines) + "\n"
+
+def _short(path):
+    """Trims site-packages / repo prefixes so summary lines stay readable."""
+    for marker in ('site-packages' + os.sep, os.getcwd() + os.sep):
+        if marker in path:
+            return path.split(marker, 1)[1]
+    return path
+
+
+def start(mode, stage=None, source=None, out_dir="profiles", top=20):
+    """Starts a Profiler, or returns None when `mode` is None so callers can skip it entirely."""
+    if not mode:
+        return None
+    return Profiler(mode, stage, source, out_dir, top).start()
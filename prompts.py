@@ -0,0 +1,187 @@
+# prompts.py
+# Versioned prompt templates: a byte-identical system prefix (instructions + examples) per template, so providers can cache it, and per-template token accounting.
+
+import threading
+import functools
+
+try:
+    import tiktoken
+except ImportError:  # Token counts fall back to a ~4 characters/token estimate without it.
+    tiktoken = None
+
+MESSAGE_OVERHEAD_TOKENS = 4   # role and separators the chat format adds per message
+# Providers that only cache a prefix marked with cache_control (OpenAI and DeepSeek cache automatically).
+EXPLICIT_CACHE_PREFIXES = ('anthropic/', 'google/')
+
+
+# --- TOKEN COUNTING ---
+
+@functools.lru_cache(maxsize=1)
+def _encoding():
+    return tiktoken.get_encoding("cl100k_base") if tiktoken is not None else None
+
+def count_tokens(text):
+    """Tokens in `text` (cl100k_base, or an estimate without tiktoken); models differ slightly either way."""
+    encoding = _encoding()
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text))
+
+
+# --- TEMPLATES ---
+
+class PromptTemplate:
+    """
+    A prompt split into a static system message, identical on every call, and a user
+    message holding only the variable text (`user` is a str.format template).
+
+    Editing a template's text means bumping its `version`, so usage (and any cached prefix)
+    is never mixed across two different prompts.
+    """
+
+    def __init__(self, name, version, system, user):
+        self.name = name
+        self.version = version
+        self.system = system
+        self.user = user
+        self._system_messages = {}  # model -> the (shared, never mutated) system message
+
+    @property
+    def id(self):
+        return f"{self.name}@v{self.version}"
+
+    @functools.cached_property
+    def static_tokens(self):
+        """Tokens of the static prefix, counted once."""
+        return count_tokens(self.system) + MESSAGE_OVERHEAD_TOKENS
+
+    def _system_message(self, model):
+        message = self._system_messages.get(model)
+        if message is None:
+            content = self.system
+            if model and model.startswith(EXPLICIT_CACHE_PREFIXES):
+                content = [{"type": "text", "text": self.system, "cache_control": {"type": "ephemeral"}}]
+            message = self._system_messages[model] = {"role": "system", "content": content}
+        return message
+
+    def messages(self, model=None, **values):
+        """The chat messages for one call. For providers that need it, the system prefix is marked cacheable."""
+        return [self._system_message(model), {"role": "user", "content": self.user.format(**values)}]
+
+    def request(self, model, json_output=True, **values):
+        """
+        Keyword arguments for `backend.complete` (see main.chat_completion). `prompt_template` is taken
+        out by the backend, which credits the call's token usage to this template.
+        """
+        request = {'model': model, 'messages': self.messages(model, **values), 'prompt_template': self}
+        if json_output:
+            request['response_format'] = {"type": "json_object"}
+        return request
+
+REGISTRY = {}
+
+def register(template):
+    REGISTRY[(template.name, template.version)] = template
+    return template
+
+def get(name, version=None):
+    """The template `name` at `version`, or its latest version."""
+    if version is not None:
+        return REGISTRY[(name, version)]
+    return max((template for (key, _), template in REGISTRY.items() if key == name), key=lambda t: t.version)
+
+
+# --- USAGE ---
+
+_lock = threading.Lock()
+_usage = {}
+
+def record(template, prompt_tokens, cached_tokens, completion_tokens):
+    """Adds one call's token usage to the template's totals (`cached` = prompt tokens the provider served from cache)."""
+    with _lock:
+        totals = _usage.get(template.id)
+        if totals is None:
+            totals = _usage[template.id] = {'calls': 0, 'prompt_tokens': 0, 'cached_tokens': 0, 'completion_tokens': 0}
+        totals['calls'] += 1
+        totals['prompt_tokens'] += prompt_tokens
+        totals['cached_tokens'] += cached_tokens
+        totals['completion_tokens'] += completion_tokens
+
+def usage():
+    """Per template id: calls, prompt/cached/billed prompt and completion tokens, and the precounted static prefix."""
+    with _lock:
+        totals = {template_id: dict(values) for template_id, values in _usage.items()}
+    for template_id, values in totals.items():
+        name, version = template_id.split('@v')
+        values['static_tokens'] = get(name, int(version)).static_tokens
+        values['billed_prompt_tokens'] = values['prompt_tokens'] - values['cached_tokens']
+    return totals
+
+def report():
+    """Prints one line per template used this run."""
+    for template_id, values in usage().items():
+        calls = values['calls']
+        cached_share = values['cached_tokens'] / values['prompt_tokens'] if values['prompt_tokens'] else 0.0
+        print(f"🧾 {template_id}: {calls} calls, static prefix {values['static_tokens']} tok, "
+              f"prompt {values['prompt_tokens'] / calls:.0f} tok/call, billed {values['billed_prompt_tokens'] / calls:.0f} "
+              f"tok/call ({cached_share:.0%} served from cache)")
+
+
+# --- THE PIPELINE'S PROMPTS ---
+
+DEAL_LINE_EXAMPLE = "✈️ AIR, a Haifa, Israel-based eVTOL developer, raised $23m in Series A funding from Entrée Capital."
+
+ARTICLE_TYPE = register(PromptTemplate('article_type', 1, system="""You are an expert financial news analyst. Your SOLE task is to classify an article's purpose based on its title. Pay close attention to financial keywords.
+**Keywords for STARTUP_FUNDING_ROUND:** raises, funding, secures, investment, round, closes, backed by, financing.
+**Categories:** STARTUP_FUNDING_ROUND, FUND_ANNOUNCEMENT, GENERAL_NEWS
+Analyze the title you are given and respond with ONLY the category name.""", user="""**Title:** "{title}"
+**Category:**"""))
+
+FUNDING_ARTICLE = register(PromptTemplate('funding_article', 1, system="""You are a data analyst for an early-stage climate tech VC firm. Your task is to extract specific data points from the article text for a deal flow report. Be precise.
+**Primary Data Points Required:**
+- `startup_name`: The name of the company that received funding.
+- `funding_stage`: The stage of funding (e.g., "Seed," "Series A," "pre-seed"). If not specified, use `null`.
+- `amount_raised`: The total amount of money raised (e.g., "$15 million," "€20M").
+- `lead_investor`: The ONE firm or individual explicitly mentioned as "leading" or "co-leading" the round. If no lead is mentioned, use `null`.
+- `other_investors`: A list of any other participating investors mentioned. If none, use `null`.
+**Example:**
+Article Text: "Grid-X, a smart thermostat startup, has closed a $12 million Series A financing round. The investment was led by Climate Capital, with contributions from Powerhouse Ventures and Tina's Angel Fund."
+JSON Output: {"startup_name": "Grid-X", "funding_stage": "Series A", "amount_raised": "$12 million", "lead_investor": "Climate Capital", "other_investors": ["Powerhouse Ventures", "Tina's Angel Fund"]}""", user="""**Actual Article to Process:**
+Article Text: --- {content} ---
+JSON Output:"""))
+
+# One set of instructions for main.py and ctvc_scraper.py, which used to word them slightly differently.
+CTVC_DEAL = register(PromptTemplate('ctvc_deal', 1, system=f"""From the single, complete deal announcement text provided, extract: startup_name, amount_raised, funding_stage, and a list of all investors.
+
+**Instructions:**
+- The startup name is the first bolded name.
+- The amount is the bolded dollar/euro value.
+- If a single investor is mentioned after "from", they are the `lead_investor`.
+- If multiple investors are listed after "from", the first is the `lead_investor` and the rest are `other_investors`.
+- If no value is present, use `null`.
+- Respond with a JSON object.
+
+**Example:**
+Text: "{DEAL_LINE_EXAMPLE}"
+JSON Output: {{"startup_name": "AIR", "amount_raised": "$23m", "funding_stage": "Series A", "lead_investor": "Entrée Capital", "other_investors": []}}""",
+    user="""**Actual Text to Process:**
+Text: "{deal_string}"
+JSON Output:"""))
+
+CTVC_DEAL_BATCH = register(PromptTemplate('ctvc_deal_batch', 1, system=f"""Each numbered line you are given is one complete deal announcement. For EVERY line, extract: startup_name, amount_raised, funding_stage, and a list of all investors.
+
+**Instructions:**
+- The startup name is the company at the start of the line.
+- If a single investor is mentioned, they are the `lead_investor`.
+- If multiple investors are listed after "from", the first is the `lead_investor` and the rest are `other_investors`.
+- If no value is present, use `null`.
+- Respond with a JSON object {{"deals": [...]}} holding one object per line, in order, each with a `line` number.
+
+**Example:**
+Deals:
+1. {DEAL_LINE_EXAMPLE}
+JSON Output: {{"deals": [{{"line": 1, "startup_name": "AIR", "amount_raised": "$23m", "funding_stage": "Series A", "lead_investor": "Entrée Capital", "other_investors": []}}]}}""",
+    user="""**Actual Deals to Process:**
+Deals:
+{numbered}
+JSON Output:"""))
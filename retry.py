@@ -0,0 +1,252 @@
+# retry.py
+# Shared retry policy for LLM calls and page fetches: Retry-After aware backoff, a per-run retry budget and AIMD pacing.
+
+import re
+import time
+import random
+import threading
+import email.utils
+from urllib.parse import urlparse
+
+import requests
+import openai
+
+# Status codes worth another attempt; anything else (400, 401, 404, ...) fails straight away.
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = (requests.ConnectionError, requests.Timeout, openai.APIConnectionError)  # incl. APITimeoutError
+THROTTLE_STATUS = {429, 503}
+DEFAULT_HEADERS = {'User-Agent': 'Mozilla/5.0'}
+DURATION_PATTERN = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')  # OpenAI-style reset values, e.g. '6m0s'
+UNIT_SECONDS = {'ms': 0.001, 'h': 3600, 'm': 60, 's': 1}
+
+
+# --- HEADER PARSING ---
+
+def _duration(text):
+    """'2', '1.5', '6m0s', '250ms' -> seconds, or None."""
+    text = text.strip().lower()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    parts = DURATION_PATTERN.findall(text)
+    if not parts or ''.join(number + unit for number, unit in parts) != text:
+        return None
+    return sum(float(number) * UNIT_SECONDS[unit] for number, unit in parts)
+
+def _reset_delay(value):
+    """A rate-limit reset header: seconds to wait, a duration ('6m0s'), or an epoch timestamp in s or ms."""
+    seconds = _duration(value)
+    if seconds is None:
+        return None
+    if seconds > 1e12:
+        return seconds / 1000 - time.time()
+    if seconds > 1e9:
+        return seconds - time.time()
+    return seconds
+
+def retry_after(headers):
+    """
+    Seconds the server asked us to wait, from `Retry-After(-ms)` or from an exhausted
+    `x-ratelimit-remaining*` with its matching `x-ratelimit-reset*` header. None if it didn't say.
+    """
+    if not headers:
+        return None
+    headers = {key.lower(): value for key, value in headers.items()}
+    if 'retry-after-ms' in headers:
+        seconds = _duration(headers['retry-after-ms'])
+        if seconds is not None:
+            return seconds / 1000
+    if 'retry-after' in headers:
+        value = headers['retry-after']
+        seconds = _duration(value)
+        if seconds is None:
+            try:
+                seconds = email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                seconds = None
+        if seconds is not None:
+            return max(0.0, seconds)
+    for suffix in ('-requests', '-tokens', ''):
+        remaining = headers.get(f'x-ratelimit-remaining{suffix}')
+        reset = headers.get(f'x-ratelimit-reset{suffix}')
+        if remaining is not None and reset is not None and remaining.strip() == '0':
+            seconds = _reset_delay(reset)
+            if seconds is not None:
+                return max(0.0, seconds)
+    return None
+
+def _status_and_headers(error):
+    """(HTTP status, response headers) for a requests or openai exception, else (None, None)."""
+    response = getattr(error, 'response', None)
+    status = getattr(error, 'status_code', None) or getattr(response, 'status_code', None)
+    return status, getattr(response, 'headers', None)
+
+
+# --- PACING ---
+
+class RateLimiter:
+    """
+    AIMD pacing: requests are spaced 1/rate apart; every success adds `increase` req/s and a
+    throttle (429/503) multiplies the rate by `decrease`, at most once per `cooldown` seconds
+    so one burst of 429s from in-flight requests only counts once.
+    """
+
+    def __init__(self, rate=1.0, min_rate=0.05, max_rate=20.0, increase=0.05, decrease=0.5, cooldown=2.0):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self._next_slot = 0.0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until this caller may send its next request."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot, self._paused_until)
+            self._next_slot = slot + 1.0 / self.rate
+        if slot > now:
+            time.sleep(slot - now)
+
+    def on_success(self):
+        if self.rate >= self.max_rate:
+            return  # already at full speed: nothing to update, so no lock on the hot path
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, wait=None):
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.cooldown:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self._last_decrease = now
+            if wait:
+                self._paused_until = max(self._paused_until, now + wait)
+
+
+# --- RETRY POLICY ---
+
+class RetryBudget:
+    """Caps the retries of a whole run, so a provider outage fails fast instead of backing off forever."""
+
+    def __init__(self, retries=200):
+        self.retries = retries
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def take(self):
+        with self._lock:
+            if self.used >= self.retries:
+                return False
+            self.used += 1
+            return True
+
+class RetryPolicy:
+    """
+    Runs a call with retries on connection errors, timeouts, 429s and 5xx responses.
+
+    The wait before retry n is the server's Retry-After (or rate-limit reset) when it sent one,
+    otherwise full-jitter exponential backoff: uniform(0, min(max_delay, base_delay * 2**n)).
+    Every attempt is paced by the policy's RateLimiter, which slows down on 429s and speeds up
+    on successes, and every retry draws from the shared run budget.
+
+    Args:
+        name (str): Shown in log lines and `report()`, e.g. 'llm' or a host name.
+        max_attempts (int): Attempts per call, including the first.
+        budget (RetryBudget): Shared by every policy unless given.
+    """
+
+    def __init__(self, name, max_attempts=5, base_delay=1.0, max_delay=60.0, limiter=None, budget=None):
+        self.name = name
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limiter = limiter or RateLimiter()
+        self.budget = budget or run_budget
+        self.calls = 0
+        self.retries = 0
+        self.throttles = 0
+        self.failures = 0
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, func, *args, **kwargs):
+        """Calls `func(*args, **kwargs)`, retrying as described above. Re-raises the last error."""
+        self.calls += 1
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                status, headers = _status_and_headers(e)
+                if status not in RETRYABLE_STATUS and not isinstance(e, RETRYABLE_ERRORS):
+                    self.failures += 1
+                    raise
+                wait = retry_after(headers)
+                if status in THROTTLE_STATUS:
+                    self.throttles += 1
+                    self.limiter.on_throttle(wait)
+                attempt += 1
+                if attempt >= self.max_attempts or not self.budget.take():
+                    self.failures += 1
+                    raise
+                self.retries += 1
+                delay = min(self.max_delay, wait) if wait is not None else self._backoff(attempt)
+                print(f"   -> ⏳ {self.name}: {status or e.__class__.__name__}, retry {attempt}/{self.max_attempts - 1} in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            self.limiter.on_success()
+            # A successful response can still say the window is used up; wait for its reset before the next call.
+            # (OpenAI SDK results carry no headers, so LLM calls skip this.)
+            headers = getattr(result, 'headers', None)
+            if headers:
+                wait = retry_after(headers)
+                if wait:
+                    self.limiter.on_throttle(wait)
+            return result
+
+    def stats(self):
+        return {'calls': self.calls, 'retries': self.retries, 'throttles': self.throttles,
+                'failures': self.failures, 'rate_per_s': round(self.limiter.rate, 2)}
+
+
+# --- SHARED POLICIES ---
+
+run_budget = RetryBudget()
+# LLM calls start at 2 req/s (the old fixed 1.5 s sleep was ~0.67) and find the provider's limit from there.
+llm = RetryPolicy('llm', limiter=RateLimiter(rate=2.0, max_rate=20.0))
+_host_policies = {}
+_host_lock = threading.Lock()
+
+def for_host(url):
+    """The policy for a site, one per host so a slow or throttling site doesn't pace the others."""
+    host = urlparse(url).netloc
+    with _host_lock:
+        policy = _host_policies.get(host)
+        if policy is None:
+            policy = _host_policies[host] = RetryPolicy(host, limiter=RateLimiter(rate=1.0, max_rate=5.0))
+    return policy
+
+def _get(url, **kwargs):
+    response = requests.get(url, **kwargs)
+    response.raise_for_status()
+    return response
+
+def get(url, timeout=15, headers=None, **kwargs):
+    """`requests.get` + `raise_for_status` under the host's retry policy."""
+    return for_host(url).call(_get, url, timeout=timeout, headers=headers or DEFAULT_HEADERS, **kwargs)
+
+def report():
+    """Prints one line per policy that was used this run."""
+    policies = [llm, *_host_policies.values()]
+    print(f"🔁 Retries: {run_budget.used}/{run_budget.retries} of the run budget used.")
+    for policy in policies:
+        if policy.calls:
+            print(f"   -> {policy.name}: {policy.stats()}")
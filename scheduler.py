@@ -0,0 +1,234 @@
+# scheduler.py
+# Yield-aware run planner: learns deals per fetch, per LLM call and per second for each source, and spends the run budget where they are highest.
+
+import time
+import sqlite3
+import datetime
+
+import storage
+
+DECAY = 0.95               # each recorded unit fades older history a little, so the stats follow sources that change
+PRIOR_WEIGHT = 2.0         # pseudo-fetches of the prior; a source with no history is planned from its prior alone
+# Prior guesses per page type, used until a source has history of its own.
+PRIORS = {
+    'listing': {'items': 6.0, 'llm_calls': 0.0, 'seconds': 3.0, 'cost_usd': 0.0, 'deals': 0.0},
+    'newsletter': {'items': 1.0, 'llm_calls': 8.0, 'seconds': 20.0, 'cost_usd': 0.001, 'deals': 6.0},
+    'article': {'items': 1.0, 'llm_calls': 2.0, 'seconds': 6.0, 'cost_usd': 0.0003, 'deals': 0.3},
+}
+METRICS = ('items', 'llm_calls', 'seconds', 'cost_usd', 'deals')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS source_yield (
+    source TEXT NOT NULL,
+    page_type TEXT NOT NULL,    -- 'listing' (a crawl page), 'newsletter' (multi-deal) or 'article' (single deal)
+    fetches REAL NOT NULL,      -- decayed counts from here on
+    items REAL NOT NULL,        -- listing: new articles it led to
+    llm_calls REAL NOT NULL,
+    seconds REAL NOT NULL,
+    cost_usd REAL NOT NULL,
+    deals REAL NOT NULL,        -- new deals found
+    updated TEXT NOT NULL,
+    PRIMARY KEY (source, page_type)
+) WITHOUT ROWID;
+"""
+
+
+class _Measurement:
+    """What one fetched page cost and found; `items` is set by the caller for listing pages."""
+
+    def __init__(self, planner, source, page_type):
+        self.planner = planner
+        self.source = source
+        self.page_type = page_type
+        self.items = 1
+
+    def __enter__(self):
+        self.started = time.monotonic()
+        self.usage = self.planner.backend.usage()
+        self.deals = self.planner.deals_found()
+        return self
+
+    def __exit__(self, *exc):
+        usage = self.planner.backend.usage()
+        self.planner.record(self.source, self.page_type, {
+            'items': self.items,
+            'llm_calls': usage['calls'] - self.usage['calls'],
+            'seconds': time.monotonic() - self.started,
+            'cost_usd': usage['cost_usd'] - self.usage['cost_usd'],
+            'deals': self.planner.deals_found() - self.deals,
+        })
+        return False
+
+
+class Planner:
+    """
+    Decides which source's next listing page to work on, one page at a time.
+
+    Each candidate (a source's next listing page, plus the articles it leads to) is scored by
+    expected new deals per second, or per USD when a cost budget is set, from the source's
+    decayed history in SQLite (next to the deals). Sources without history use `PRIORS`.
+    The run stops when the deal target, the time budget or the cost budget is reached, or no
+    source has pages left.
+
+    Args:
+        sources (dict): main.SOURCE_HANDLERS; CTVC pages are 'newsletter's, the rest 'article's.
+        backend: The LLM backend, for its call and cost counters (see llm_backends.OpenAIBackend.usage).
+        deals_found (callable): Returns the number of new deals found so far this run.
+        time_budget (float): Wall-clock seconds for the run, or None.
+        cost_budget (float): USD of LLM calls for the run, or None.
+    """
+
+    def __init__(self, sources, backend, deals_found, target, max_pages, time_budget=None, cost_budget=None,
+                 path=storage.DB_FILE, busy_timeout=30.0):
+        self.sources = sources
+        self.backend = backend
+        self.deals_found = deals_found
+        self.target = target
+        self.max_pages = max_pages
+        self.time_budget = time_budget
+        self.cost_budget = cost_budget
+        self.next_page = {name: 1 for name in sources}
+        self.started = time.monotonic()
+        self.start_cost = backend.usage()['cost_usd']
+        self.conn = sqlite3.connect(path, timeout=busy_timeout)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    @staticmethod
+    def page_type(source):
+        return 'newsletter' if source == 'CTVC' else 'article'
+
+    # --- History ---
+
+    def _history(self, source, page_type):
+        row = self.conn.execute(
+            "SELECT fetches, items, llm_calls, seconds, cost_usd, deals FROM source_yield WHERE source = ? AND page_type = ?",
+            (source, page_type)).fetchone()
+        return dict(zip(('fetches',) + METRICS, row)) if row else None
+
+    def per_fetch(self, source, page_type):
+        """Expected items, LLM calls, seconds, USD and deals for one fetch, smoothed towards the prior."""
+        prior = PRIORS[page_type]
+        history = self._history(source, page_type) or {'fetches': 0.0, **{metric: 0.0 for metric in METRICS}}
+        weight = history['fetches'] + PRIOR_WEIGHT
+        return {metric: (history[metric] + PRIOR_WEIGHT * prior[metric]) / weight for metric in METRICS}
+
+    def record(self, source, page_type, observed):
+        """Adds one fetch's observed cost and yield to the source's decayed history."""
+        with self.conn:
+            self.conn.execute(
+                f"""INSERT INTO source_yield (source, page_type, fetches, {', '.join(METRICS)}, updated)
+                    VALUES (?, ?, 1, {', '.join('?' for _ in METRICS)}, ?)
+                    ON CONFLICT (source, page_type) DO UPDATE SET fetches = fetches * {DECAY} + 1,
+                    {', '.join(f'{metric} = {metric} * {DECAY} + excluded.{metric}' for metric in METRICS)},
+                    updated = excluded.updated""",
+                (source, page_type, *[observed[metric] for metric in METRICS],
+                 datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')))
+
+    def record_items(self, source, items):
+        """Credits the listing page recorded last with the new articles it turned out to lead to."""
+        with self.conn:
+            self.conn.execute("UPDATE source_yield SET items = items + ? WHERE source = ? AND page_type = 'listing'",
+                              (items, source))
+
+    def measure(self, source, page_type):
+        """`with planner.measure(source, page_type) as m:` around one page fetch and its processing."""
+        return _Measurement(self, source, page_type)
+
+    # --- Planning ---
+
+    def expected_unit(self, source):
+        """Expected deals, seconds, USD and LLM calls of the source's next listing page and its articles."""
+        listing = self.per_fetch(source, 'listing')
+        page = self.per_fetch(source, self.page_type(source))
+        articles = listing['items']
+        return {metric: listing[metric] + articles * page[metric] for metric in ('deals', 'seconds', 'cost_usd', 'llm_calls')}
+
+    def score(self, unit):
+        """Deals per USD under a cost budget (per second if the calls are free), else deals per second."""
+        if self.cost_budget is not None and unit['cost_usd'] > 0:
+            return unit['deals'] / unit['cost_usd']
+        return unit['deals'] / max(unit['seconds'], 1e-6)
+
+    def _ranked(self, next_page):
+        candidates = [(self.score(self.expected_unit(name)), name) for name in self.sources
+                      if next_page[name] is not None and next_page[name] <= self.max_pages]
+        return [name for _, name in sorted(candidates, key=lambda candidate: -candidate[0])]
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def spent_usd(self):
+        return self.backend.usage()['cost_usd'] - self.start_cost
+
+    def out_of_budget(self):
+        """True once the deal target, the time budget or the cost budget is reached."""
+        return (self.deals_found() >= self.target
+                or (self.time_budget is not None and self.elapsed() >= self.time_budget)
+                or (self.cost_budget is not None and self.spent_usd() >= self.cost_budget))
+
+    def next_unit(self):
+        """The (source, page) to crawl next, or None when the run should stop."""
+        if self.out_of_budget():
+            return None
+        ranked = self._ranked(self.next_page)
+        if not ranked:
+            return None
+        name = ranked[0]
+        page = self.next_page[name]
+        self.next_page[name] = page + 1
+        return name, page
+
+    def exhausted(self, source):
+        """The source returned no more articles; it is not planned again this run."""
+        self.next_page[source] = None
+
+    def explain(self):
+        """The expected yield of every source and the order pages would be worked in, as printable text."""
+        lines = [f"🧭 Plan (target {self.target} deals"
+                 + (f", {self.time_budget:.0f}s" if self.time_budget is not None else "")
+                 + (f", ${self.cost_budget:.2f}" if self.cost_budget is not None else "") + "):"]
+        lines.append(f"   {'source':<15} {'history':>8} {'deals/fetch':>11} {'deals/call':>10} {'deals/s':>8} "
+                     f"{'per page: deals':>15} {'s':>6} {'$':>8}")
+        for name in self.sources:
+            page_type = self.page_type(name)
+            history = self._history(name, page_type)
+            page = self.per_fetch(name, page_type)
+            unit = self.expected_unit(name)
+            per_call = page['deals'] / page['llm_calls'] if page['llm_calls'] else float('inf')
+            fetches = format(history['fetches'], '.0f') if history else 'prior'
+            lines.append(f"   {name:<15} {fetches:>8} "
+                         f"{page['deals']:>11.2f} {per_call:>10.2f} {page['deals'] / max(page['seconds'], 1e-6):>8.3f} "
+                         f"{unit['deals']:>15.1f} {unit['seconds']:>6.0f} {unit['cost_usd']:>8.4f}")
+
+        # Simulate the greedy order against the budgets with the expected numbers.
+        next_page = dict(self.next_page)
+        deals = seconds = cost = 0.0
+        order = []
+        while deals < self.target:
+            ranked = self._ranked(next_page)
+            if not ranked:
+                break
+            name = ranked[0]
+            unit = self.expected_unit(name)
+            if ((self.time_budget is not None and seconds + unit['seconds'] > self.time_budget)
+                    or (self.cost_budget is not None and cost + unit['cost_usd'] > self.cost_budget)):
+                break
+            order.append(f"{name} p{next_page[name]}")
+            next_page[name] += 1
+            deals, seconds, cost = deals + unit['deals'], seconds + unit['seconds'], cost + unit['cost_usd']
+        skipped = [name for name in self.sources if next_page[name] == self.next_page[name]]
+        lines.append(f"   -> Order: {', '.join(order) or 'nothing fits the budget'}")
+        lines.append(f"   -> Expected: {deals:.1f} deals in {seconds:.0f}s for ${cost:.4f}"
+                     + (f"; not planned ({'target reached first' if deals >= self.target else 'out of budget or pages'}):"
+                        f" {', '.join(skipped)}" if skipped else ""))
+        return "\n".join(lines)
@@ -0,0 +1,246 @@
+# service.py
+# Local HTTP service for front ends: identical concurrent requests share one pipeline run, recent results are cached, and deals can be streamed (SSE).
+
+import os
+import json
+import time
+import asyncio
+import argparse
+import importlib
+from urllib.parse import urlsplit, parse_qs
+
+DEFAULT_PIPELINE = "ctvc_scraper:iter_latest_ctvc_deals"
+DEFAULT_TTL = 600.0           # seconds a finished run's deals are served without running the pipeline again
+MAX_PAGES = 10
+MAX_REQUEST_BYTES = 16384
+FIXTURE_NEWSLETTER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench", "fixtures", "ctvc_newsletter.html")
+
+
+# --- PIPELINES ---
+# A pipeline is a plain (blocking) function `pipeline(pages)` that yields deals as they are found.
+
+def resolve_pipeline(name):
+    """'module:function', or 'fixture' for the offline stand-in below."""
+    if name == 'fixture':
+        return fixture_pipeline
+    module_name, function_name = name.split(':', 1)
+    return getattr(importlib.import_module(module_name), function_name)
+
+def fixture_pipeline(pages, delay=0.2):
+    """
+    Local stand-in for the CTVC pipeline: the saved newsletter in bench/fixtures, extracted with
+    the rule-based parser, one deal every `delay` seconds. No browser, network or LLM.
+    """
+    import deal_segmenter
+    from bs4 import BeautifulSoup
+    from deal_record import Deal, Source
+
+    with open(FIXTURE_NEWSLETTER, 'rb') as f:
+        soup = BeautifulSoup(f.read(), 'lxml')
+    for _ in range(pages):
+        for record in deal_segmenter.segment_deals(deal_segmenter.find_deals_heading(soup)):
+            time.sleep(delay)
+            yield Deal.from_extraction(deal_segmenter.parse_deal_text(record['text']),
+                                       source_url="file://" + FIXTURE_NEWSLETTER, source_site=Source.CTVC)
+
+
+# --- RUNS ---
+
+class _Run:
+    """One pipeline run: the deals produced so far, shared by every request that asked for it."""
+
+    def __init__(self, key):
+        self.key = key
+        self.deals = []
+        self.done = False
+        self.error = None
+        self.finished_at = None
+        self.changed = asyncio.Condition()
+
+    async def publish(self, deal):
+        async with self.changed:
+            self.deals.append(deal.to_dict() if hasattr(deal, 'to_dict') else dict(deal))
+            self.changed.notify_all()
+
+    async def finish(self, error=None):
+        async with self.changed:
+            self.done, self.error, self.finished_at = True, error, time.monotonic()
+            self.changed.notify_all()
+
+    async def follow(self):
+        """Yields every deal of the run, from the first one, as it becomes available."""
+        position = 0
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: position < len(self.deals) or self.done)
+                batch, finished = self.deals[position:], self.done
+            for deal in batch:
+                yield deal
+            position += len(batch)
+            if finished and position >= len(self.deals):
+                return
+
+
+class DealService:
+    """
+    Runs the pipeline on behalf of HTTP requests.
+
+    Requests with the same parameters that arrive while a run is in flight join it (single
+    flight) instead of starting another Selenium crawl and LLM run. A finished run is served
+    from memory for `ttl` seconds; failed runs are not cached.
+
+    Args:
+        pipeline (callable): `pipeline(pages)` yielding deals; runs on a worker thread.
+        max_runs (int): Distinct runs allowed at once (each one drives a browser).
+    """
+
+    def __init__(self, pipeline, ttl=DEFAULT_TTL, max_runs=1):
+        self.pipeline = pipeline
+        self.ttl = ttl
+        self.max_runs = max_runs
+        self.runs = {}
+        self.tasks = set()
+        self.run_slots = None
+        self.counts = {'requests': 0, 'runs': 0, 'coalesced': 0, 'cache_hits': 0, 'failures': 0}
+
+    def get_run(self, pages):
+        """The in-flight or cached run for these parameters, starting a new one if there is neither."""
+        key = ('ctvc', pages)
+        run = self.runs.get(key)
+        if run is not None and run.done and time.monotonic() - run.finished_at > self.ttl:
+            del self.runs[key]  # expired
+            run = None
+        if run is not None:
+            self.counts['cache_hits' if run.done else 'coalesced'] += 1
+            return run
+        run = self.runs[key] = _Run(key)
+        self.counts['runs'] += 1
+        task = asyncio.get_running_loop().create_task(self._execute(run, pages))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return run
+
+    async def _execute(self, run, pages):
+        if self.run_slots is None:
+            self.run_slots = asyncio.Semaphore(self.max_runs)
+        loop = asyncio.get_running_loop()
+
+        def work():
+            for deal in self.pipeline(pages):
+                asyncio.run_coroutine_threadsafe(run.publish(deal), loop).result()
+
+        error = None
+        async with self.run_slots:
+            try:
+                await loop.run_in_executor(None, work)
+            except Exception as e:
+                error = f"{e.__class__.__name__}: {e}"
+                self.counts['failures'] += 1
+                print(f"   -> 🔴 Pipeline run {run.key} failed: {error}")
+        if error and self.runs.get(run.key) is run:
+            del self.runs[run.key]
+        await run.finish(error)
+
+    def stats(self):
+        return {**self.counts, 'in_flight': sum(not run.done for run in self.runs.values()),
+                'cached': sum(run.done for run in self.runs.values())}
+
+
+# --- HTTP ---
+
+async def _read_request(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    if len(head) > MAX_REQUEST_BYTES:
+        raise ValueError("request too large")
+    method, target, _ = head.split(b"\r\n", 1)[0].decode('latin-1').split(' ', 2)
+    return method, target
+
+def _response_head(status, content_type, extra=""):
+    reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 502: 'Bad Gateway'}
+    return (f"HTTP/1.1 {status} {reasons[status]}\r\nContent-Type: {content_type}\r\n"
+            f"Cache-Control: no-store\r\nConnection: close\r\n{extra}\r\n").encode('latin-1')
+
+async def _send_json(writer, status, payload):
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    writer.write(_response_head(status, "application/json; charset=utf-8", f"Content-Length: {len(body)}\r\n") + body)
+    await writer.drain()
+
+async def _stream(writer, run):
+    """Server-sent events: one `deal` event per deal, then `done` (or `error`)."""
+    writer.write(_response_head(200, "text/event-stream; charset=utf-8"))
+    count = 0
+    async for deal in run.follow():
+        count += 1
+        writer.write(f"event: deal\ndata: {json.dumps(deal, ensure_ascii=False)}\n\n".encode('utf-8'))
+        await writer.drain()
+    if run.error:
+        writer.write(f"event: error\ndata: {json.dumps({'error': run.error})}\n\n".encode('utf-8'))
+    else:
+        writer.write(f"event: done\ndata: {json.dumps({'count': count})}\n\n".encode('utf-8'))
+    await writer.drain()
+
+def make_handler(service):
+    async def handle(reader, writer):
+        try:
+            method, target = await _read_request(reader)
+            url = urlsplit(target)
+            if method != 'GET':
+                return await _send_json(writer, 405, {'error': 'only GET is supported'})
+            if url.path == '/health':
+                return await _send_json(writer, 200, {'status': 'ok'})
+            if url.path == '/stats':
+                return await _send_json(writer, 200, service.stats())
+            if url.path not in ('/deals', '/deals/stream'):
+                return await _send_json(writer, 404, {'error': f'no route {url.path}'})
+            try:
+                pages = int(parse_qs(url.query).get('pages', ['1'])[0])
+            except ValueError:
+                pages = 0
+            if not 1 <= pages <= MAX_PAGES:
+                return await _send_json(writer, 400, {'error': f'pages must be an integer from 1 to {MAX_PAGES}'})
+            service.counts['requests'] += 1
+            run = service.get_run(pages)
+            if url.path == '/deals/stream':
+                return await _stream(writer, run)
+            deals = [deal async for deal in run.follow()]
+            if run.error:
+                return await _send_json(writer, 502, {'error': run.error})
+            await _send_json(writer, 200, {'deals': deals, 'count': len(deals),
+                                           'age_s': round(time.monotonic() - run.finished_at, 1)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # the client went away; a run it started keeps going for anyone else
+        except (ValueError, asyncio.LimitOverrunError):
+            await _send_json(writer, 400, {'error': 'malformed request'})
+        finally:
+            writer.close()
+    return handle
+
+async def serve(service, host="127.0.0.1", port=8765):
+    server = await asyncio.start_server(make_handler(service), host, port)
+    print(f"🛰️  Serving deals at http://{host}:{server.sockets[0].getsockname()[1]}/deals (stream: /deals/stream)")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP service around the CTVC deal pipeline.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ttl", type=float, default=DEFAULT_TTL, help="seconds a finished run's result is reused")
+    parser.add_argument("--max-runs", type=int, default=1, help="distinct pipeline runs allowed at once")
+    parser.add_argument("--pipeline", default=DEFAULT_PIPELINE,
+                        help="module:function yielding deals, or 'fixture' for the offline stand-in")
+    import llm_backends
+    llm_backends.add_arguments(parser)
+    args = parser.parse_args()
+    backend = llm_backends.from_args(parser, args)
+    if backend is not None:
+        import main  # the pipelines' LLM calls go through main.backend
+        main.backend = backend
+    try:
+        asyncio.run(serve(DealService(resolve_pipeline(args.pipeline), args.ttl, args.max_runs), args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if backend is not None:
+            backend.close()
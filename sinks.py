@@ -0,0 +1,166 @@
+# sinks.py
+# Buffered, streaming output targets for extracted deals (CSV, JSONL or the SQLite store).
+
+import os
+import csv
+import json
+import time
+import storage
+from deal_record import Deal
+
+# --- BASE SINK ---
+
+class BufferedSink:
+    """
+    Buffers records and flushes them by count or by age, so memory stays bounded and
+    results become durable during the run instead of at exit.
+
+    Args:
+        flush_every (int): Flush once this many records are buffered.
+        flush_interval (float): Flush when the oldest buffered record is this many seconds old.
+        fsync_every (int): fsync the target after this many flushes (1 = every flush).
+    """
+
+    def __init__(self, flush_every=25, flush_interval=30.0, fsync_every=1):
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.fsync_every = fsync_every
+        self.buffer = []
+        self.records_written = 0
+        self.batches_written = 0
+        self.write_seconds = 0.0
+        self._oldest_buffered_at = None
+        self._flushes_since_sync = 0
+        self._started_at = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        """Total records accepted so far (written plus still buffered)."""
+        return self.records_written + len(self.buffer)
+
+    def write(self, record):
+        if not self.buffer:
+            self._oldest_buffered_at = time.monotonic()
+        self.buffer.append(record)
+        self.maybe_flush()
+
+    def maybe_flush(self):
+        """Flushes if the buffer is full or too old. Cheap enough to call once per article."""
+        if not self.buffer:
+            return
+        if (len(self.buffer) >= self.flush_every or
+                time.monotonic() - self._oldest_buffered_at >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        started = time.monotonic()
+        self._write_batch(self.buffer)
+        self._flushes_since_sync += 1
+        if self._flushes_since_sync >= self.fsync_every:
+            self._sync()
+            self._flushes_since_sync = 0
+        self.write_seconds += time.monotonic() - started
+        self.records_written += len(self.buffer)
+        self.batches_written += 1
+        self.buffer = []
+        self._oldest_buffered_at = None
+
+    def close(self):
+        self.flush()
+        if self._flushes_since_sync:
+            self._sync()
+        self._close()
+
+    def stats(self):
+        elapsed = time.monotonic() - self._started_at
+        return {
+            'records': self.records_written,
+            'batches': self.batches_written,
+            'write_seconds': round(self.write_seconds, 4),
+            'records_per_write_second': round(self.records_written / self.write_seconds, 1) if self.write_seconds else None,
+            'records_per_second': round(self.records_written / elapsed, 2) if elapsed else None,
+        }
+
+    def report(self):
+        s = self.stats()
+        print(f"💾 {self.__class__.__name__}: wrote {s['records']} records in {s['batches']} batches "
+              f"({s['write_seconds']}s writing, {s['records_per_write_second']} rec/s while writing).")
+
+    # Subclasses implement these.
+    def _write_batch(self, records):
+        raise NotImplementedError
+
+    def _sync(self):
+        pass
+
+    def _close(self):
+        pass
+
+
+# --- FILE SINKS ---
+
+class _FileSink(BufferedSink):
+    """Holds one open file handle for the whole run."""
+
+    def __init__(self, filename, **kwargs):
+        super().__init__(**kwargs)
+        self.filename = filename
+        self.file = open(filename, 'a', newline='', encoding='utf-8')
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def _close(self):
+        self.file.close()
+
+class CsvSink(_FileSink):
+    """Appends rows using the store's fixed column set, so batches can never misalign."""
+
+    def __init__(self, filename, **kwargs):
+        super().__init__(filename, **kwargs)
+        self.writer = csv.DictWriter(self.file, fieldnames=storage.DEAL_COLUMNS)
+        if self.file.tell() == 0:
+            self.writer.writeheader()
+
+    def _write_batch(self, records):
+        self.writer.writerows(storage.to_csv_row(storage.to_row(record)) for record in records)
+
+class JsonlSink(_FileSink):
+    def _write_batch(self, records):
+        self.file.writelines((record.to_json() if isinstance(record, Deal) else json.dumps(record, ensure_ascii=False)) + "\n"
+                             for record in records)
+
+
+# --- DATABASE SINK ---
+
+class DatabaseSink(BufferedSink):
+    """Upserts each batch into a DealStore in a single transaction."""
+
+    def __init__(self, store, close_store=False, **kwargs):
+        super().__init__(**kwargs)
+        self.store = store
+        self.close_store = close_store
+
+    def _write_batch(self, records):
+        self.store.upsert_many(records)
+
+    def _close(self):
+        if self.close_store:
+            self.store.close()
+
+
+def open_sink(target, **kwargs):
+    """Picks a sink from the target's extension: .csv, .jsonl, or anything else as a SQLite store."""
+    if target.endswith('.csv'):
+        return CsvSink(target, **kwargs)
+    if target.endswith('.jsonl'):
+        return JsonlSink(target, **kwargs)
+    return DatabaseSink(storage.open_store(target), close_store=True, **kwargs)
@@ -1,9 +1,12 @@
 # sources.py (v14 - Final Production Version)
 
-import requests
 from bs4 import BeautifulSoup
 import time
 import re
+import deal_segmenter
+import tracing
+import retry
+import enrichment
 
 # Selenium Imports
 from selenium import webdriver
@@ -13,100 +16,192 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.firefox import GeckoDriverManager
 
+# --- PAGE PARSERS ---
+# Pure HTML -> data functions, split from the fetching code so they can run on saved pages (see bench/).
+
+@tracing.traced("parse")
+def parse_canary_media_listing(html):
+    soup = BeautifulSoup(html, 'lxml')
+    articles_found = []
+    for item in soup.select('li.py-5'):
+        link_tag = item.select_one('a.type-gamma')
+        subsector_tag = item.select_one('p.type-theta')
+        if link_tag and 'href' in link_tag.attrs:
+            articles_found.append({
+                'url': link_tag['href'],
+                'subsector': subsector_tag.get_text(strip=True) if subsector_tag else 'Not Specified'
+            })
+    return articles_found
+
+def first_paragraph_company_link(content_div):
+    """
+    The startup's website from an article body: the first link in its first paragraph that points at
+    a company (not the news site itself, a wire service or social media), as Old/processor.py used it.
+    """
+    first_p = content_div.find('p') if content_div else None
+    for link_tag in first_p.find_all('a', href=True) if first_p else []:
+        if link_tag['href'].startswith('http') and enrichment.company_domain(link_tag['href']):
+            return link_tag['href']
+    return None
+
+@tracing.traced("parse")
+def parse_canary_media_article(html):
+    """Returns the article's title, its text and the startup's website (None if the article doesn't link it)."""
+    soup = BeautifulSoup(html, 'lxml')
+    title = soup.find('title').get_text(strip=True) if soup.find('title') else "Title not found"
+    content_div = soup.find('div', class_='prose')
+    content = content_div.get_text(separator='\n', strip=True) if content_div else "Content not found."
+    return title, content, first_paragraph_company_link(content_div)
+
+@tracing.traced("parse")
+def parse_cleantechnica_listing(html):
+    soup = BeautifulSoup(html, 'lxml')
+    articles_found = []
+    for article_tag in soup.find_all('article'):
+        link_tag = article_tag.select_one('div.cm-featured-image > a')
+        if link_tag and 'href' in link_tag.attrs:
+            subsector = "CleanTech"
+            for cls in article_tag.get('class', []):
+                if cls.startswith('category-'):
+                    subsector = cls.replace('category-', '').replace('-', ' ').title()
+                    break
+            articles_found.append({'url': link_tag['href'], 'subsector': subsector})
+    return articles_found
+
+@tracing.traced("parse")
+def parse_cleantechnica_article(html):
+    """Returns the article's title, its text and the startup's website (None if the article doesn't link it)."""
+    soup = BeautifulSoup(html, 'lxml')
+    title_tag = soup.select_one('h1.cm-entry-title')
+    title = title_tag.get_text(strip=True) if title_tag else "Title not found"
+    final_content_div = soup.find('div', class_='cm-entry-summary')
+    if final_content_div:
+        for ad_section in final_content_div.select('hr, center, .afterpost, .sharedaddy'):
+            ad_section.decompose()
+        content = final_content_div.get_text(separator='\n', strip=True)
+    else: content = "Content not found."
+    return title, content, first_paragraph_company_link(final_content_div)
+
+@tracing.traced("parse")
+def parse_ctvc_listing(html):
+    soup = BeautifulSoup(html, 'lxml')
+    articles_found = []
+    for link_tag in soup.select('div.flex-1 h3 > a'):
+        if 'href' in link_tag.attrs:
+            articles_found.append({
+                'url': "https://www.ctvc.co" + link_tag['href'],
+                'subsector': 'Climatetech Newsletter'
+            })
+    # Return a list of unique dicts
+    return [dict(t) for t in {tuple(d.items()) for d in articles_found}]
+
+ISO_DATE_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}')
+LD_DATE_PATTERN = re.compile(r'"datePublished"\s*:\s*"(\d{4}-\d{2}-\d{2})')
+
+def parse_published_date(soup):
+    """
+    The page's publish date as 'YYYY-MM-DD', or None. Ghost (CTVC) and WordPress pages carry it in
+    an `article:published_time` meta tag; a JSON-LD `datePublished` or the first <time datetime> also count.
+    """
+    meta = soup.find('meta', attrs={'property': 'article:published_time'})
+    candidates = [meta.get('content') if meta else None]
+    for script in soup.find_all('script', type='application/ld+json'):
+        match = LD_DATE_PATTERN.search(script.string or '')
+        candidates.append(match.group(1) if match else None)
+    time_tag = soup.find('time', datetime=True)
+    candidates.append(time_tag['datetime'] if time_tag else None)
+    for candidate in candidates:
+        match = ISO_DATE_PATTERN.match(candidate or '')
+        if match:
+            return match.group(0)
+    return None
+
+@tracing.traced("parse")
+def parse_ctvc_article(html):
+    """
+    Returns the newsletter title and a list of segmented deal records (see deal_segmenter), each
+    with the newsletter's publish `date` (None if the page doesn't give one).
+    """
+    soup = BeautifulSoup(html, 'lxml')
+    title_tag = soup.find('h1')
+    title = title_tag.get_text(strip=True) if title_tag else "Title not found"
+    main_content = soup.find('div', class_=lambda c: c and 'content' in c and 'prose' in c)
+    deals_heading = deal_segmenter.find_deals_heading(main_content)
+    if not deals_heading:
+        return title, []
+    deal_records = deal_segmenter.segment_deals(deals_heading)
+    published = parse_published_date(soup)
+    for record in deal_records:
+        record['date'] = published
+    return title, deal_records
+
 # --- CANARY MEDIA HANDLERS ---
+@tracing.traced("crawl", source="Canary Media")
 def crawl_canary_media_links(category_url, page=1):
     if page > 1: return []
     print(f"🕵️  Crawling Canary Media: {category_url}")
-    articles_found = []
     try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        response = requests.get(category_url, headers=headers, timeout=15)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'lxml')
-        for item in soup.select('li.py-5'):
-            link_tag = item.select_one('a.type-gamma')
-            subsector_tag = item.select_one('p.type-theta')
-            if link_tag and 'href' in link_tag.attrs:
-                articles_found.append({
-                    'url': link_tag['href'],
-                    'subsector': subsector_tag.get_text(strip=True) if subsector_tag else 'Not Specified'
-                })
+        with tracing.span("http_fetch"):
+            response = retry.get(category_url, timeout=15)
+        articles_found = parse_canary_media_listing(response.content)
         print(f"   -> Found {len(articles_found)} articles.\n")
         return articles_found
     except Exception as e:
         print(f"   -> 🔴 Error crawling Canary Media: {e}")
         return []
 
+@tracing.traced("scrape", source="Canary Media")
 def scrape_canary_media_article(url):
     print(f"  Scraping URL: {url}")
     try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'lxml')
-        title = soup.find('title').get_text(strip=True) if soup.find('title') else "Title not found"
-        content_div = soup.find('div', class_='prose')
-        content = content_div.get_text(separator='\n', strip=True) if content_div else "Content not found."
-        return title, content
+        with tracing.span("http_fetch"):
+            response = retry.get(url, timeout=15)
+        return parse_canary_media_article(response.content)
     except Exception as e:
         print(f"   -> Error scraping article: {e}")
-        return None, None
+        return None, None, None
 
 # --- CLEANTECHNICA HANDLERS ---
+@tracing.traced("crawl", source="CleanTechnica")
 def crawl_cleantechnica_links(search_url, page=1):
     query = search_url.split('?')[1] if '?' in search_url else ""
     base_url = search_url.split('?')[0]
     full_url = search_url if page == 1 else f"{base_url}page/{page}/?{query}"
     print(f"🕵️  Crawling CleanTechnica Search: {full_url}")
-    articles_found = []
     try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        response = requests.get(full_url, headers=headers, timeout=15)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'lxml')
-        for article_tag in soup.find_all('article'):
-            link_tag = article_tag.select_one('div.cm-featured-image > a')
-            if link_tag and 'href' in link_tag.attrs:
-                subsector = "CleanTech"
-                for cls in article_tag.get('class', []):
-                    if cls.startswith('category-'):
-                        subsector = cls.replace('category-', '').replace('-', ' ').title()
-                        break
-                articles_found.append({'url': link_tag['href'], 'subsector': subsector})
+        with tracing.span("http_fetch"):
+            response = retry.get(full_url, timeout=15)
+        articles_found = parse_cleantechnica_listing(response.content)
         print(f"   -> Found {len(articles_found)} articles.\n")
         return articles_found
     except Exception as e:
         print(f"   -> 🔴 Error crawling CleanTechnica: {e}")
         return []
 
+@tracing.traced("scrape", source="CleanTechnica")
 def scrape_cleantechnica_article(url):
     print(f"  Scraping URL with Firefox/Selenium: {url}")
     options = webdriver.FirefoxOptions()
     options.add_argument("--headless")
     driver = None
     try:
-        driver = webdriver.Firefox(service=FirefoxService(GeckoDriverManager().install()), options=options)
+        with tracing.span("selenium_start"):
+            driver = webdriver.Firefox(service=FirefoxService(GeckoDriverManager().install()), options=options)
         driver.set_page_load_timeout(30)
-        driver.get(url)
-        wait = WebDriverWait(driver, 15)
-        title_tag = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, 'h1.cm-entry-title')))
-        wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, 'div.cm-entry-summary')))
-        title = title_tag.text.strip()
-        soup = BeautifulSoup(driver.page_source, 'lxml')
-        final_content_div = soup.find('div', class_='cm-entry-summary')
-        if final_content_div:
-            for ad_section in final_content_div.select('hr, center, .afterpost, .sharedaddy'):
-                ad_section.decompose()
-            content = final_content_div.get_text(separator='\n', strip=True)
-        else: content = "Content not found."
-        return title, content
+        with tracing.span("page_load"):
+            driver.get(url)
+            wait = WebDriverWait(driver, 15)
+            wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, 'h1.cm-entry-title')))
+            wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, 'div.cm-entry-summary')))
+        return parse_cleantechnica_article(driver.page_source)
     except Exception as e:
         print(f"   -> 🔴 Error during Firefox/Selenium scraping: {e.__class__.__name__}")
-        return None, None
+        return None, None, None
     finally:
         if driver: driver.quit()
 
 # --- CTVC HANDLERS ---
+@tracing.traced("crawl", source="CTVC")
 def crawl_ctvc_links(base_url, page=1):
     print(f"🕵️  Crawling CTVC Newsletter with Selenium...")
     options = webdriver.FirefoxOptions()
@@ -114,10 +209,12 @@ def crawl_ctvc_links(base_url, page=1):
     driver = None
     clicks_to_perform = 3 
     try:
-        driver = webdriver.Firefox(service=FirefoxService(GeckoDriverManager().install()), options=options)
+        with tracing.span("selenium_start"):
+            driver = webdriver.Firefox(service=FirefoxService(GeckoDriverManager().install()), options=options)
         driver.set_page_load_timeout(45)
-        driver.get(base_url)
-        WebDriverWait(driver, 20).until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, 'div.flex-1 h3 > a')))
+        with tracing.span("page_load"):
+            driver.get(base_url)
+            WebDriverWait(driver, 20).until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, 'div.flex-1 h3 > a')))
         time.sleep(2)
         for i in range(clicks_to_perform):
             try:
@@ -130,52 +227,53 @@ def crawl_ctvc_links(base_url, page=1):
             except Exception:
                 print("   -> 'Load More' button not found.")
                 break
-        soup = BeautifulSoup(driver.page_source, 'lxml')
-        articles_found = []
-        for link_tag in soup.select('div.flex-1 h3 > a'):
-            if 'href' in link_tag.attrs:
-                articles_found.append({
-                    'url': "https://www.ctvc.co" + link_tag['href'],
-                    'subsector': 'Climatetech Newsletter'
-                })
-        print(f"   -> Found {len(set(d['url'] for d in articles_found))} unique articles.\n")
-        # Return a list of unique dicts
-        return [dict(t) for t in {tuple(d.items()) for d in articles_found}]
+        articles_found = parse_ctvc_listing(driver.page_source)
+        print(f"   -> Found {len(articles_found)} unique articles.\n")
+        return articles_found
     except Exception as e:
         print(f"   -> 🔴 Error crawling CTVC with Selenium: {e.__class__.__name__}")
         return []
     finally:
         if driver: driver.quit()
 
+@tracing.traced("scrape", source="CTVC")
 def scrape_ctvc_article(url):
+    """Returns the newsletter title and a list of segmented deal records (see deal_segmenter)."""
     print(f"  Scraping URL: {url}")
     try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        response = requests.get(url, headers=headers, timeout=20)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'lxml')
-        
-        title_tag = soup.find('h1')
-        title = title_tag.get_text(strip=True) if title_tag else "Title not found"
-        
-        main_content = soup.find('div', class_=lambda c: c and 'content' in c and 'prose' in c)
-        content_block = ""
-
-        if main_content:
-            deals_heading = main_content.find(['h2', 'h3'], string=lambda t: t and 'deals of the week' in t.lower())
-            if deals_heading:
-                print("   -> 'Deals of the Week' heading found.")
-                content_parts = []
-                stop_headings = ["in the news", "exits", "new funds", "pop-up", "opportunities & events", "jobs"]
-                for element in deals_heading.find_next_siblings():
-                    if element.name in ['h2', 'h3']:
-                        element_text = element.get_text(strip=True).lower()
-                        if any(stop_word in element_text for stop_word in stop_headings):
-                            break
-                    content_parts.append(element.get_text(separator=' ', strip=True))
-                content_block = "\n".join(content_parts)
-        
-        return title, content_block if content_block else "Content not found."
+        with tracing.span("http_fetch"):
+            response = retry.get(url, timeout=20)
+        title, deal_records = parse_ctvc_article(response.content)
+        if deal_records:
+            print("   -> 'Deals of the Week' heading found.")
+        return title, deal_records
     except Exception as e:
         print(f"   -> 🔴 Error scraping CTVC article: {e.__class__.__name__}")
-        return None, None
\ No newline at end of file
+        return None, None
+
+
+@tracing.traced("scrape", source="CTVC")
+def refresh_ctvc_article(url, etag=None, last_modified=None):
+    """
+    Conditionally re-fetches a newsletter that was already processed, for `main.py --refresh`.
+
+    Returns:
+        tuple: (status, deal_records, etag, last_modified) with status 'modified', 'not_modified'
+               (HTTP 304, no body downloaded) or 'error'.
+    """
+    print(f"  Re-checking URL: {url}")
+    headers = dict(retry.DEFAULT_HEADERS)
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    try:
+        with tracing.span("http_fetch"):
+            response = retry.get(url, timeout=20, headers=headers)
+        if response.status_code == 304:
+            return 'not_modified', None, response.headers.get('ETag'), response.headers.get('Last-Modified')
+        _, deal_records = parse_ctvc_article(response.content)
+        return 'modified', deal_records, response.headers.get('ETag'), response.headers.get('Last-Modified')
+    except Exception as e:
+        print(f"   -> 🔴 Error re-checking CTVC article: {e.__class__.__name__}")
+        return 'error', None, None, None
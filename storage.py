@@ -0,0 +1,448 @@
+# storage.py
+# SQLite master store for funding deals. The CSV is now only an export format.
+
+import os
+import re
+import csv
+import ast
+import json
+import time
+import sqlite3
+import datetime
+
+import amounts
+import analytics
+import investor_graph
+
+DB_FILE = "climate_funding.db"
+CSV_EXPORT_FILE = "climate_funding_data_master.csv"
+
+# The fixed schema. CSV exports always use exactly these columns, in this order.
+DEAL_COLUMNS = ['startup_name', 'subsector', 'amount_raised', 'funding_stage', 'lead_investor',
+                'other_investors', 'source_url', 'source_site', 'date', 'sources', 'amount_usd', 'amount_currency',
+                'website', 'hq', 'sector']
+# Column order the old `save_to_csv` wrote when a batch had every preferred key.
+LEGACY_PREFERRED_ORDER = ['startup_name', 'subsector', 'amount_raised', 'funding_stage', 'lead_investor',
+                          'other_investors', 'source_url', 'source_site']
+MISSING_VALUES = {None, '', 'null', 'None', 'Not Specified'}
+URL_DATE_PATTERN = re.compile(r'/(\d{4})/(\d{2})/(\d{2})/')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS deals (
+    id INTEGER PRIMARY KEY,
+    startup_name TEXT NOT NULL,
+    subsector TEXT,
+    amount_raised TEXT,
+    funding_stage TEXT,
+    lead_investor TEXT,
+    other_investors TEXT,          -- JSON list of investor names
+    source_url TEXT NOT NULL DEFAULT '',
+    source_site TEXT,
+    date TEXT,                     -- ISO date (YYYY-MM-DD)
+    sources TEXT,                  -- JSON list of {"url", "site"}: every article that reported the deal
+    amount_value REAL,             -- amount_raised parsed to a number, in amount_currency
+    amount_currency TEXT,          -- ISO 4217 code
+    amount_usd REAL,               -- amount_value converted with the fx_rates.json table named in fx_version
+    fx_version TEXT,
+    website TEXT,                  -- the startup's homepage (from the deal line's link)
+    hq TEXT,                       -- headquarters as reported, e.g. 'Madison, WI'
+    sector TEXT,                   -- climate sector from enrichment.py, or 'Not Climate Tech'
+    seq INTEGER,                   -- change feed cursor: set from a store-wide counter on every insert or update
+    ingested_at TEXT,              -- UTC time the deal was first stored (NULL for deals stored before it was kept)
+    UNIQUE (source_url, startup_name)
+);
+-- The UNIQUE constraint already gives us an index led by source_url.
+CREATE INDEX IF NOT EXISTS idx_deals_startup_name ON deals (startup_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_deals_date ON deals (date);
+"""
+# Columns added after the first release; older databases get them via ALTER TABLE on open.
+ADDED_COLUMNS = [('sources', 'TEXT'), ('amount_value', 'REAL'), ('amount_currency', 'TEXT'),
+                 ('amount_usd', 'REAL'), ('fx_version', 'TEXT'), ('website', 'TEXT'), ('hq', 'TEXT'),
+                 ('sector', 'TEXT'), ('seq', 'INTEGER'), ('ingested_at', 'TEXT')]
+# Next value of the change feed counter; writers hold SQLite's write lock, so values only ever grow.
+# Deleted deals leave a tombstone with its own seq, so a deleted newest deal's seq is never handed out again.
+NEXT_SEQ = ("(SELECT MAX(COALESCE((SELECT MAX(seq) FROM deals), 0), "
+            "COALESCE((SELECT MAX(seq) FROM deal_tombstones), 0)) + 1)")
+TOMBSTONES = f"""
+CREATE TABLE IF NOT EXISTS deal_tombstones (
+    seq INTEGER PRIMARY KEY,       -- change feed position of the deletion
+    deal_id INTEGER NOT NULL,
+    deal_seq INTEGER,              -- the deleted version's seq
+    source_url TEXT,
+    startup_name TEXT,
+    deleted_at TEXT NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS deals_tombstone AFTER DELETE ON deals BEGIN
+    INSERT INTO deal_tombstones (seq, deal_id, deal_seq, source_url, startup_name, deleted_at)
+    VALUES (MAX({NEXT_SEQ}, COALESCE(OLD.seq, 0) + 1), OLD.id, OLD.seq, OLD.source_url, OLD.startup_name,
+            strftime('%Y-%m-%dT%H:%M:%S+00:00', 'now'));
+END;
+"""
+FEED_PAGE_SIZE = 500
+AMOUNT_FIELDS = ['amount_value', 'amount_currency', 'amount_usd', 'fx_version']
+
+# What an upsert writes to each column of an existing deal: fields the new record leaves empty keep their
+# stored value, and the amount fields move together with `amount_raised`.
+_KEEP_AMOUNT = "CASE WHEN excluded.amount_raised IS NULL THEN {0} ELSE excluded.{0} END"
+UPSERT_UPDATES = {
+    'subsector': "COALESCE(excluded.subsector, subsector)",
+    'amount_raised': "COALESCE(excluded.amount_raised, amount_raised)",
+    **{field: _KEEP_AMOUNT.format(field) for field in AMOUNT_FIELDS},
+    'funding_stage': "COALESCE(excluded.funding_stage, funding_stage)",
+    'date': "COALESCE(excluded.date, date)",
+    'lead_investor': "COALESCE(excluded.lead_investor, lead_investor)",
+    'other_investors': "CASE WHEN excluded.other_investors = '[]' THEN other_investors ELSE excluded.other_investors END",
+    'source_site': "COALESCE(excluded.source_site, source_site)",
+    'website': "COALESCE(excluded.website, website)",
+    'hq': "COALESCE(excluded.hq, hq)",
+    'sector': "COALESCE(excluded.sector, sector)",
+}
+# Provenance only ever grows: stored sources first, then incoming ones whose url is not listed yet.
+_STORED_URLS = "(SELECT json_extract(value, '$.url') FROM json_each(COALESCE(deals.sources, '[]')))"
+_MERGED_SOURCES = """(SELECT json_group_array(json(value)) FROM (
+                           -- per url, the first entry (value comes from the row MIN picks)
+                           SELECT value, MIN(rank) AS rank FROM (
+                               SELECT value, key AS rank FROM json_each(COALESCE(deals.sources, '[]'))
+                               UNION ALL SELECT value, 1000000 + key FROM json_each(excluded.sources))
+                           GROUP BY json_extract(value, '$.url') ORDER BY rank))"""
+_NEW_SOURCE = f"EXISTS (SELECT 1 FROM json_each(excluded.sources) WHERE json_extract(value, '$.url') NOT IN {_STORED_URLS})"
+
+_UPSERT_SQL = f"""
+    INSERT INTO deals (startup_name, subsector, amount_raised, funding_stage, lead_investor,
+                       other_investors, source_url, source_site, date, sources,
+                       amount_value, amount_currency, amount_usd, fx_version, website, hq, sector,
+                       seq, ingested_at)
+    VALUES (:startup_name, :subsector, :amount_raised, :funding_stage, :lead_investor,
+            :other_investors, :source_url, :source_site, :date, :sources,
+            :amount_value, :amount_currency, :amount_usd, :fx_version, :website, :hq, :sector,
+            {NEXT_SEQ}, :ingested_at)
+    ON CONFLICT (source_url, startup_name) DO UPDATE SET
+        {', '.join(f"{column} = {update}" for column, update in UPSERT_UPDATES.items())},
+        sources = {_MERGED_SOURCES},
+        seq = {NEXT_SEQ}
+    -- A save that changes nothing is not written: no new seq in the change feed, no trigger work.
+    WHERE {' OR '.join(f"({update}) IS NOT {column}" for column, update in UPSERT_UPDATES.items())}
+          OR {_NEW_SOURCE}
+    RETURNING id
+"""
+
+# --- VALUE NORMALIZATION ---
+
+def _clean_value(value):
+    if isinstance(value, str):
+        value = value.strip()
+    if isinstance(value, list):
+        return None if value in ([], ['null']) else value
+    if value in MISSING_VALUES:
+        return None
+    return value
+
+def _investor_list(value):
+    """Accepts a list, a JSON/Python list literal (old CSV rows) or a comma-separated string."""
+    value = _clean_value(value)
+    if value is None:
+        return []
+    if isinstance(value, str):
+        if value.startswith('['):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                try:
+                    value = ast.literal_eval(value)
+                except (ValueError, SyntaxError):
+                    value = [value.strip('[]')]
+        else:
+            value = value.split(',')
+    if not isinstance(value, (list, tuple)):
+        value = [value]
+    return [str(v).strip() for v in value if _clean_value(v) is not None]
+
+def _date_for(deal):
+    date = _clean_value(deal.get('date'))
+    if date:
+        return str(date)[:10]
+    match = URL_DATE_PATTERN.search(deal.get('source_url') or '')
+    if match:
+        return '-'.join(match.groups())
+    return None  # unknown; the ingest day would put the deal in the wrong month
+
+def _source_list(deal):
+    sources = deal.get('sources') or []
+    if isinstance(sources, str):
+        sources = json.loads(sources)
+    if not sources and _clean_value(deal.get('source_url')):
+        sources = [{'url': deal['source_url'], 'site': _clean_value(deal.get('source_site'))}]
+    return sources
+
+def to_row(deal):
+    """Maps a (possibly messy) deal dict onto the fixed schema."""
+    lead = _clean_value(deal.get('lead_investor'))
+    if isinstance(lead, list):
+        lead = lead[0] if lead else None
+    if 'amount_usd' not in deal:
+        deal = amounts.normalize_record(dict(deal))
+    return {
+        'startup_name': _clean_value(deal.get('startup_name')),
+        'subsector': _clean_value(deal.get('subsector')),
+        'amount_raised': _clean_value(deal.get('amount_raised')),
+        'funding_stage': _clean_value(deal.get('funding_stage')),
+        'lead_investor': lead,
+        'other_investors': json.dumps(_investor_list(deal.get('other_investors'))),
+        'source_url': _clean_value(deal.get('source_url')) or '',
+        'source_site': _clean_value(deal.get('source_site')),
+        'date': _date_for(deal),
+        'sources': json.dumps(_source_list(deal)),
+        **{field: deal.get(field) for field in AMOUNT_FIELDS},
+        'website': _clean_value(deal.get('website')),
+        'hq': _clean_value(deal.get('hq')),
+        'sector': _clean_value(deal.get('sector')),
+    }
+
+def to_csv_row(deal):
+    """Formats a stored (or `to_row`-normalized) deal for the CSV export."""
+    row = {key: deal.get(key) for key in DEAL_COLUMNS}
+    for key in ('other_investors', 'sources'):
+        values = row[key]
+        if isinstance(values, str):
+            values = json.loads(values)
+        row[key] = json.dumps(values, ensure_ascii=False) if values else None
+    return {key: 'Not Specified' if value in (None, '') else value for key, value in row.items()}
+
+def from_row(row):
+    deal = dict(row)
+    deal['other_investors'] = json.loads(deal['other_investors'] or '[]')
+    deal['sources'] = json.loads(deal['sources'] or '[]')
+    return deal
+
+
+# --- REPOSITORY ---
+
+class DealStore:
+    """
+    Small repository API over the SQLite master store.
+
+    Deals are keyed by (source_url, startup_name): saving the same deal twice updates it in place,
+    and fields the new record leaves empty keep their stored value.
+    """
+
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self._add_missing_columns()
+        self.conn.executescript(TOMBSTONES)
+        analytics.install_rollups(self.conn)
+        investor_graph.install_graph(self.conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def _add_missing_columns(self):
+        existing = {row['name'] for row in self.conn.execute("PRAGMA table_info(deals)")}
+        with self.conn:
+            for column, column_type in ADDED_COLUMNS:
+                if column not in existing:
+                    self.conn.execute(f"ALTER TABLE deals ADD COLUMN {column} {column_type}")
+            if 'seq' not in existing:
+                # Deals stored before the change feed existed enter it in id order.
+                self.conn.execute("UPDATE deals SET seq = id")
+            self.conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_deals_seq ON deals (seq)")
+
+    def _upsert_row(self, row):
+        updated = self.conn.execute(_UPSERT_SQL, row).fetchone()
+        if updated is None:  # unchanged, so nothing was returned
+            updated = self.conn.execute("SELECT id FROM deals WHERE source_url = ? AND startup_name = ?",
+                                        (row['source_url'], row['startup_name'])).fetchone()
+        return updated[0]
+
+    def upsert(self, deal):
+        """Inserts or updates a single deal and returns its id (None if it has no startup name)."""
+        row = to_row(deal)
+        if not row['startup_name']:
+            return None
+        row['ingested_at'] = _now()
+        with self.conn:
+            return self._upsert_row(row)
+
+    def replace(self, source_url, old_name, deal):
+        """
+        Updates the deal stored as (source_url, old_name) from `deal`, which may carry a corrected startup
+        name (an edited newsletter line); otherwise the same as `upsert`. Returns the deal's id.
+        """
+        row = to_row(deal)
+        if not row['startup_name']:
+            return None
+        row['ingested_at'] = _now()
+        with self.conn:
+            if old_name != row['startup_name']:
+                # Move the row onto the corrected name (a change, so it gets a new seq). If that name is
+                # already stored for the URL, the old row is a stale duplicate of it and goes (a tombstone).
+                self.conn.execute(f"""UPDATE OR IGNORE deals SET startup_name = ?, seq = {NEXT_SEQ}
+                                      WHERE source_url = ? AND startup_name = ?""",
+                                  (row['startup_name'], source_url, old_name))
+                self.conn.execute("DELETE FROM deals WHERE source_url = ? AND startup_name = ?", (source_url, old_name))
+            return self._upsert_row(row)
+
+    def upsert_many(self, deals):
+        """Upserts a batch of deals in one transaction. Returns the number of deals written."""
+        rows = [row for row in map(to_row, deals) if row['startup_name']]
+        ingested_at = _now()
+        for row in rows:
+            row['ingested_at'] = ingested_at
+        with self.conn:
+            for row in rows:
+                self._upsert_row(row)
+        return len(rows)
+
+    def get(self, deal_id):
+        row = self.conn.execute("SELECT * FROM deals WHERE id = ?", (deal_id,)).fetchone()
+        return from_row(row) if row else None
+
+    def find_by_startup(self, startup_name):
+        rows = self.conn.execute(
+            "SELECT * FROM deals WHERE startup_name = ? COLLATE NOCASE ORDER BY date", (startup_name,)
+        )
+        return [from_row(row) for row in rows]
+
+    def find_by_source_url(self, source_url):
+        rows = self.conn.execute("SELECT * FROM deals WHERE source_url = ? ORDER BY id", (source_url,))
+        return [from_row(row) for row in rows]
+
+    def iter_deals(self, since_date=None):
+        if since_date:
+            rows = self.conn.execute("SELECT * FROM deals WHERE date >= ? ORDER BY date, id", (since_date,))
+        else:
+            rows = self.conn.execute("SELECT * FROM deals ORDER BY date, id")
+        for row in rows:
+            yield from_row(row)
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM deals").fetchone()[0]
+
+    # --- CHANGE FEED ---
+
+    def latest_seq(self):
+        """The cursor of the newest change (0 for an empty store); an index lookup, not a scan."""
+        return self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM deals").fetchone()[0]
+
+    def deals_since(self, cursor=0, limit=FEED_PAGE_SIZE):
+        """
+        Deals inserted or updated after `cursor`, oldest change first, one page at a time.
+        Each call is a range scan on the `seq` index, so its cost does not grow with the store.
+
+        Returns:
+            tuple: (deals, next_cursor). Pass `next_cursor` back to get the following page; a
+                   deal updated again later shows up again, under its new `seq`.
+        """
+        rows = self.conn.execute("SELECT * FROM deals WHERE seq > ? ORDER BY seq LIMIT ?", (cursor, limit)).fetchall()
+        deals = [from_row(row) for row in rows]
+        return deals, (deals[-1]['seq'] if deals else cursor)
+
+    def deleted_since(self, cursor=0):
+        """
+        Tombstones of deals deleted after `cursor`, oldest first: dicts with `seq`, `deal_id`, `deal_seq`
+        (the seq of the deleted version), `source_url`, `startup_name` and `deleted_at`.
+        """
+        rows = self.conn.execute("SELECT * FROM deal_tombstones WHERE seq > ? ORDER BY seq", (cursor,))
+        return [dict(row) for row in rows]
+
+    def wait_for_deals(self, cursor=0, timeout=30.0, limit=FEED_PAGE_SIZE, poll_interval=0.5):
+        """
+        Long-poll form of `deals_since`: returns as soon as there is a change after `cursor`
+        (from this or any other process), or an empty page after `timeout` seconds.
+        """
+        deadline = time.monotonic() + timeout
+        version = None
+        while True:
+            # data_version only changes when another connection commits, so idle polls skip the query.
+            current = self.conn.execute("PRAGMA data_version").fetchone()[0]
+            if current != version:
+                version = current
+                if self.latest_seq() > cursor:
+                    return self.deals_since(cursor, limit)
+            if time.monotonic() >= deadline:
+                return [], cursor
+            time.sleep(min(poll_interval, max(0.0, deadline - time.monotonic())))
+
+    # --- CSV EXPORT / IMPORT ---
+
+    def export_csv(self, filename=CSV_EXPORT_FILE):
+        """Rewrites `filename` from the store with the fixed column set."""
+        print(f"💾 Exporting {self.count()} records to {filename}...")
+        tmp_filename = filename + ".tmp"
+        with open(tmp_filename, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=DEAL_COLUMNS)
+            writer.writeheader()
+            for deal in self.iter_deals():
+                writer.writerow(to_csv_row(deal))
+        os.replace(tmp_filename, filename)
+        print("   -> Export complete.")
+
+    def import_csv(self, filename=CSV_EXPORT_FILE):
+        """
+        Loads an existing master CSV, including files written by the old append-only `save_to_csv`.
+        Rows appended under a stale header are re-aligned to the order that function used.
+        """
+        if not os.path.exists(filename):
+            return 0
+        with open(filename, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            deals = [_realign_row(header, values) for values in reader if values]
+        written = self.upsert_many(deals)
+        print(f"✅ Imported {written} records from {filename}.")
+        return written
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+
+def open_store(path=DB_FILE, seed_csv=CSV_EXPORT_FILE):
+    """Opens the store, seeding a brand-new database from the existing master CSV."""
+    store = DealStore(path)
+    if store.count() == 0 and seed_csv:
+        store.import_csv(seed_csv)
+    return store
+
+def _realign_row(header, values):
+    deal = dict(zip(header, values))
+    if not (deal.get('source_url') or '').startswith('http'):
+        legacy = dict(zip(LEGACY_PREFERRED_ORDER, values))
+        if (legacy.get('source_url') or '').startswith('http'):
+            return legacy
+    return {key: value for key, value in deal.items() if key in DEAL_COLUMNS}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage the SQLite master store.")
+    parser.add_argument("command", choices=["import", "export", "count", "since"])
+    parser.add_argument("csv_file", nargs="?", default=CSV_EXPORT_FILE)
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("--cursor", type=int, default=0, help="since: the next_cursor of the previous call")
+    parser.add_argument("--limit", type=int, default=FEED_PAGE_SIZE, help="since: deals per page")
+    parser.add_argument("--wait", type=float, default=0.0,
+                        help="since: long-poll up to this many seconds when nothing is new")
+    args = parser.parse_args()
+
+    with DealStore(args.db) as store:
+        if args.command == "import":
+            store.import_csv(args.csv_file)
+        elif args.command == "export":
+            store.export_csv(args.csv_file)
+        elif args.command == "since":
+            if args.wait > 0:
+                deals, next_cursor = store.wait_for_deals(args.cursor, timeout=args.wait, limit=args.limit)
+            else:
+                deals, next_cursor = store.deals_since(args.cursor, limit=args.limit)
+            print(json.dumps({'deals': deals, 'next_cursor': next_cursor}, ensure_ascii=False))
+        else:
+            print(store.count())
@@ -0,0 +1,228 @@
+# tracing.py
+# Lightweight timing spans for the pipeline, exported as Prometheus text, OpenMetrics and Chrome trace JSON.
+
+import os
+import json
+import time
+import bisect
+import threading
+import functools
+import contextvars
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency buckets (seconds) sized for everything from a parse (ms) to a Selenium page load (tens of s).
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRIC_NAME = "pipeline_span_duration_seconds"
+MAX_TRACE_EVENTS = 200_000
+# Tags that become metric labels; everything else (e.g. url) only goes to the trace, to keep cardinality low.
+LABEL_TAGS = ('source',)
+
+enabled = True
+
+_lock = threading.Lock()
+_events = []       # finished spans for the Chrome trace
+_histograms = {}   # (name, labels) -> [per-bucket counts..., overflow count, sum]
+_errors = {}       # (name, labels) -> count
+_origin = time.perf_counter()
+_current_tags = contextvars.ContextVar('tracing_tags', default={})
+_hooks = []        # objects with on_span_enter/on_span_exit(name, tags), e.g. a scoped profiling.Profiler
+
+
+# --- SPANS ---
+
+class _Span:
+    """A plain class rather than a @contextmanager generator: entering/exiting is the hot path."""
+
+    __slots__ = ('name', 'tags', 'token', 'started')
+
+    def __init__(self, name, tags):
+        self.name = name
+        self.tags = tags
+
+    def __enter__(self):
+        parent = _current_tags.get()
+        if self.tags:
+            merged = {**parent, **{key: value for key, value in self.tags.items() if value is not None}}
+        else:
+            merged = parent
+        self.tags = merged
+        self.token = _current_tags.set(merged)
+        if _hooks:
+            for hook in _hooks:
+                hook.on_span_enter(self.name, merged)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.started
+        if _hooks:
+            for hook in _hooks:
+                hook.on_span_exit(self.name, self.tags)
+        _current_tags.reset(self.token)
+        _record(self.name, self.tags, self.started, duration, exc_type is not None)
+        return False
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+def span(name, **tags):
+    """
+    Times the enclosed `with` block as a span called `name`.
+
+    Tags are inherited by nested spans, so a `span("article", source=..., url=...)` around a
+    unit of work labels every crawl/scrape/LLM span inside it.
+    """
+    return _Span(name, tags) if enabled else _NULL_SPAN
+
+def bind(**tags):
+    """Adds tags to every span started afterwards in the current thread/context (e.g. the article being processed)."""
+    _current_tags.set({**_current_tags.get(), **tags})
+
+def add_hook(hook):
+    _hooks.append(hook)
+
+def remove_hook(hook):
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+def traced(name=None, **tags):
+    """
+    Decorator form of `span`. A first positional argument that looks like a URL is added as the
+    `url` tag, which covers the scrape_*/crawl_* functions.
+    """
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            url = args[0] if args and isinstance(args[0], str) and args[0].startswith('http') else None
+            with span(span_name, url=url, **tags):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def _record(name, tags, started, duration, failed):
+    labels = tuple([(key, str(tags[key])) for key in LABEL_TAGS if key in tags])
+    key = (name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [0] * (len(BUCKETS) + 2)
+        histogram[bisect.bisect_left(BUCKETS, duration)] += 1
+        histogram[-1] += duration
+        if failed:
+            _errors[key] = _errors.get(key, 0) + 1
+        if len(_events) < MAX_TRACE_EVENTS:
+            _events.append((name, started, duration, threading.get_ident(), tags, failed))
+
+def reset():
+    with _lock:
+        _events.clear()
+        _histograms.clear()
+        _errors.clear()
+
+
+# --- EXPORTERS ---
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _label_text(name, labels, extra=()):
+    pairs = [('stage', name), *labels, *extra]
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+def render_metrics(openmetrics=False):
+    """Renders the span histograms in Prometheus text format (or OpenMetrics, with `openmetrics=True`)."""
+    with _lock:
+        histograms = {key: list(values) for key, values in _histograms.items()}
+        errors = dict(_errors)
+    lines = [f"# HELP {METRIC_NAME} Time spent in each pipeline stage.",
+             f"# TYPE {METRIC_NAME} histogram"]
+    if openmetrics:
+        lines.append(f"# UNIT {METRIC_NAME} seconds")
+    for (name, labels), values in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(BUCKETS, values):
+            cumulative += count
+            lines.append(f"{METRIC_NAME}_bucket{_label_text(name, labels, [('le', repr(bound))])} {cumulative}")
+        total = cumulative + values[-2]
+        lines.append(f"{METRIC_NAME}_bucket{_label_text(name, labels, [('le', '+Inf')])} {total}")
+        lines.append(f"{METRIC_NAME}_count{_label_text(name, labels)} {total}")
+        lines.append(f"{METRIC_NAME}_sum{_label_text(name, labels)} {values[-1]:.6f}")
+    # OpenMetrics names the counter family without `_total` and the samples with it.
+    errors_name = "pipeline_span_errors" if openmetrics else "pipeline_span_errors_total"
+    lines += [f"# HELP {errors_name} Spans that ended with an exception.", f"# TYPE {errors_name} counter"]
+    for (name, labels), count in sorted(errors.items()):
+        lines.append(f"pipeline_span_errors_total{_label_text(name, labels)} {count}")
+    if openmetrics:
+        lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+def write_openmetrics(path):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(render_metrics(openmetrics=True))
+
+def write_chrome_trace(path):
+    """Writes the recorded spans as a Chrome trace (open in chrome://tracing or ui.perfetto.dev)."""
+    with _lock:
+        events = list(_events)
+    pid = os.getpid()
+    trace = [{
+        'name': name,
+        'cat': tags.get('source', 'pipeline'),
+        'ph': 'X',
+        'ts': round((started - _origin) * 1e6, 1),
+        'dur': round(duration * 1e6, 1),
+        'pid': pid,
+        'tid': thread_id,
+        'args': {**{key: str(value) for key, value in tags.items()}, **({'error': True} if failed else {})},
+    } for name, started, duration, thread_id, tags, failed in events]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+
+def write_run(directory="traces", run_id=None):
+    """Writes `<run_id>.trace.json` and `<run_id>.om` for a finished run. Returns the two paths."""
+    os.makedirs(directory, exist_ok=True)
+    run_id = run_id or time.strftime("run-%Y%m%d-%H%M%S")
+    trace_path = os.path.join(directory, f"{run_id}.trace.json")
+    metrics_path = os.path.join(directory, f"{run_id}.om")
+    write_chrome_trace(trace_path)
+    write_openmetrics(metrics_path)
+    print(f"⏱️  Trace written to {trace_path} and metrics to {metrics_path}.")
+    return trace_path, metrics_path
+
+
+# --- PROMETHEUS ENDPOINT ---
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        openmetrics = 'application/openmetrics-text' in self.headers.get('Accept', '')
+        body = render_metrics(openmetrics).encode('utf-8')
+        content_type = ("application/openmetrics-text; version=1.0.0; charset=utf-8" if openmetrics
+                        else "text/plain; version=0.0.4; charset=utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def start_metrics_server(port=9464, host="127.0.0.1"):
+    """Serves /metrics from a daemon thread for the life of the process. Returns the server."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    print(f"📈 Metrics at http://{host}:{server.server_address[1]}/metrics")
+    return server
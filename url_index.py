@@ -0,0 +1,179 @@
+# url_index.py
+# URL canonicalization plus a persistent, shareable "already processed" index (replaces processed_urls.log).
+
+import os
+import mmap
+import math
+import sqlite3
+import hashlib
+import datetime
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, quote, unquote
+
+import storage
+
+LEGACY_LOG_FILE = "processed_urls.log"
+
+# Query parameters that never change which article a URL points to.
+TRACKING_PARAMS = {'fbclid', 'gclid', 'dclid', 'msclkid', 'mc_cid', 'mc_eid', 'ref', 'ref_src',
+                   'amp', '_ga', '_gl', 'igshid', 'cmpid'}
+DEFAULT_PORTS = {80, 443}
+
+# --- CANONICALIZATION ---
+
+def canonicalize_url(url):
+    """
+    Normalizes a URL so the same article always maps to the same key:
+    lowercase scheme/host, no 'www.', no default port, no fragment, no tracking params,
+    sorted query, normalized percent-encoding and no trailing slash.
+    """
+    if not url:
+        return url
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or 'https').lower()
+    if scheme == 'http':
+        scheme = 'https'
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if parts.port and parts.port not in DEFAULT_PORTS:
+        host = f"{host}:{parts.port}"
+
+    path = quote(unquote(parts.path), safe="/:@!$&'()*+,;=-._~") or '/'
+    if len(path) > 1:
+        path = path.rstrip('/')
+
+    query = sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if key.lower() not in TRACKING_PARAMS and not key.lower().startswith('utm_'))
+    return urlunsplit((scheme, host, path, urlencode(query), ''))
+
+
+# --- BLOOM FILTER ---
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter backed by a memory-mapped file, so opening it is O(1) and its
+    memory footprint never grows. Only a pre-check: a "maybe" always falls through to SQLite.
+    """
+
+    def __init__(self, path, capacity=5_000_000, error_rate=0.001):
+        self.num_bits = int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        num_bytes = (self.num_bits + 7) // 8
+        self.created = not os.path.exists(path)
+        with open(path, 'ab') as f:
+            if f.tell() < num_bytes:
+                f.truncate(num_bytes)
+        self._file = open(path, 'r+b')
+        self._bits = mmap.mmap(self._file.fileno(), num_bytes)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def close(self):
+        self._bits.close()
+        self._file.close()
+
+
+# --- SEEN-URL INDEX ---
+
+class SeenUrlIndex:
+    """
+    Persistent set of processed URLs in a SQLite table (WAL mode), keyed by canonical URL.
+
+    Several workers can share one database: `add` is an atomic INSERT OR IGNORE, so exactly one
+    worker "claims" each URL. Use `in` as a cheap hint and the return value of `add` as the
+    authoritative answer.
+
+    Args:
+        path (str): SQLite database file (defaults to the master store's database).
+        bloom_path (str): Optional memory-mapped Bloom filter placed in front of SQLite.
+    """
+
+    def __init__(self, path=storage.DB_FILE, bloom_path=None, busy_timeout=30.0):
+        self.conn = sqlite3.connect(path, timeout=busy_timeout)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS seen_urls (url TEXT PRIMARY KEY, first_seen TEXT NOT NULL) WITHOUT ROWID"
+            )
+        self.bloom = None
+        if bloom_path:
+            self.bloom = BloomFilter(bloom_path)
+            if self.bloom.created:
+                # One-off warm-up when the filter file is first created.
+                for (url,) in self.conn.execute("SELECT url FROM seen_urls"):
+                    self.bloom.add(url)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __contains__(self, url):
+        key = canonicalize_url(url)
+        if self.bloom is not None and key not in self.bloom:
+            return False
+        return self.conn.execute("SELECT 1 FROM seen_urls WHERE url = ?", (key,)).fetchone() is not None
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM seen_urls").fetchone()[0]
+
+    def add(self, url):
+        """Marks a URL as processed. Returns True if this call claimed it, False if it was already seen."""
+        key = canonicalize_url(url)
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO seen_urls (url, first_seen) VALUES (?, ?)",
+                (key, datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')),
+            )
+        if self.bloom is not None:
+            self.bloom.add(key)
+        return cursor.rowcount == 1
+
+    def discard(self, url):
+        key = canonicalize_url(url)
+        with self.conn:
+            self.conn.execute("DELETE FROM seen_urls WHERE url = ?", (key,))
+
+    def import_log(self, filename=LEGACY_LOG_FILE):
+        """Loads a legacy one-URL-per-line log file. Returns the number of new URLs."""
+        if not os.path.exists(filename):
+            return 0
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+        with open(filename, 'r', encoding='utf-8') as f:
+            keys = [canonicalize_url(line.strip()) for line in f if line.strip()]
+        with self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany("INSERT OR IGNORE INTO seen_urls (url, first_seen) VALUES (?, ?)",
+                                  ((key, now) for key in keys))
+            added = self.conn.total_changes - before
+        if self.bloom is not None:
+            for key in keys:
+                self.bloom.add(key)
+        return added
+
+    def close(self):
+        if self.bloom is not None:
+            self.bloom.close()
+        self.conn.close()
+
+
+def open_seen_index(path=storage.DB_FILE, legacy_log=LEGACY_LOG_FILE, **kwargs):
+    """Opens the index, importing the old processed_urls.log the first time."""
+    index = SeenUrlIndex(path, **kwargs)
+    if legacy_log and index.conn.execute("SELECT 1 FROM seen_urls LIMIT 1").fetchone() is None:
+        added = index.import_log(legacy_log)
+        if added:
+            print(f"✅ Imported {added} URLs from {legacy_log}.")
+    return index